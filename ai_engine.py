@@ -1,8 +1,11 @@
 import anthropic
 import json
 import os
+import time
 from dotenv import load_dotenv
 
+import metrics
+
 # Load environment variables
 load_dotenv()
 
@@ -18,6 +21,45 @@ def get_client():
         return None
     return anthropic.Anthropic(api_key=api_key)
 
+def create_message(client, call, **kwargs):
+    """
+    client.messages.create(**kwargs), recording latency, input/output tokens,
+    SDK retries (429 / 5xx) and errors under the label call=<call>.
+    """
+    if not metrics.enabled():
+        return client.messages.create(**kwargs)
+
+    started = time.perf_counter()
+    try:
+        raw = client.messages.with_raw_response.create(**kwargs)
+        message = raw.parse()
+    except Exception as e:
+        metrics.inc("ecc_llm_errors_total", call=call, error=type(e).__name__)
+        raise
+    finally:
+        metrics.observe("ecc_llm_request_seconds", time.perf_counter() - started, call=call)
+
+    metrics.inc("ecc_llm_requests_total", call=call)
+    retries = getattr(raw, "retries_taken", 0)  # anthropic >= 0.34
+    if retries:
+        metrics.inc("ecc_llm_retries_total", retries, call=call)
+    usage = getattr(message, "usage", None)
+    if usage is not None:
+        metrics.inc("ecc_llm_tokens_total", usage.input_tokens, call=call, direction="input")
+        metrics.inc("ecc_llm_tokens_total", usage.output_tokens, call=call, direction="output")
+    return message
+
+def is_retryable_error(error):
+    """True for failures a later retry can fix: rate limits, 5xx / overloaded and network errors."""
+    if isinstance(error, (anthropic.RateLimitError, anthropic.InternalServerError, anthropic.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+def _fallback_analysis(subject):
+    """Default analysis when Claude is unavailable (no API key) or its answer can't be parsed."""
+    return {"summary": subject, "tag": "Normal", "action": "Review", "type": "Single", "priority": 3, "confidence": 3, "source": "fallback"}
+
 def _normalize(value, default=""):
     if value is None:
         return default
@@ -31,7 +73,7 @@ def _normalize(value, default=""):
 def analyze_email_with_ai(sender, subject, body, force_summary_only=False):
     client = get_client()
     if not client:
-        return {"summary": subject, "tag": "Normal", "action": "Review"}
+        return _fallback_analysis(subject)
 
     # --- SUMMARY MODE ---
     if force_summary_only:
@@ -45,7 +87,8 @@ Body: {body}
 Return ONLY the summary text.
 """
         try:
-            message = client.messages.create(
+            message = create_message(
+                client, "summary",
                 model=MODEL_NAME,
                 max_tokens=300,
                 messages=[{"role": "user", "content": prompt}]
@@ -69,12 +112,17 @@ Return ONLY valid JSON with these keys:
 Do not include any explanation, just the JSON.
 """
     try:
-        message = client.messages.create(
+        message = create_message(
+            client, "analyze",
             model=MODEL_NAME,
             max_tokens=1000,
             messages=[{"role": "user", "content": prompt}]
         )
-        
+    except Exception as e:
+        print(f"AI Error: {e}")
+        return {**_fallback_analysis(subject), "error": str(e), "retryable": is_retryable_error(e)}
+
+    try:
         raw_content = message.content[0].text.strip()
         if "```json" in raw_content:
             raw_content = raw_content.split("```json")[1].split("```")[0].strip()
@@ -90,10 +138,12 @@ Do not include any explanation, just the JSON.
             "type": _normalize(data.get("type"), "Single"),
             "priority": int(data.get("priority", 3)),
             "confidence": int(data.get("confidence", 3)),
+            "source": "claude",
         }
     except Exception as e:
-        print(f"AI Error: {e}")
-        return {"summary": subject, "tag": "Normal", "action": "Review", "type": "Single", "priority": 3, "confidence": 3}
+        # Claude answered, just not with usable JSON; asking again would pay for the same answer
+        print(f"AI Parse Error: {e}")
+        return _fallback_analysis(subject)
 
 
 # =================================================
@@ -124,7 +174,8 @@ Draft the email body now:
 """
 
     try:
-        message = client.messages.create(
+        message = create_message(
+            client, "reply",
             model=MODEL_NAME,
             max_tokens=1000,
             messages=[{"role": "user", "content": prompt}]
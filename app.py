@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-import threading
-import json
 import uuid
 import os
-import streamlit.components.v1 as components
+import html
+import json
+import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
@@ -12,7 +12,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import our backend services
+import metrics
 from backend import EmailService
+from ingest_daemon import read_ingest_status, request_sync, read_ingest_metrics
 from ai_engine import analyze_email_with_ai, generate_reply
 from classifier import classify_urgency_and_action
 
@@ -20,124 +22,89 @@ from classifier import classify_urgency_and_action
 st.set_page_config(page_title="Executive Command Center", layout="wide", initial_sidebar_state="expanded")
 
 # --- 🧠 TRAINING SERVICE ---
+# Sender rules live in the sender_rules table (one indexed row per sender);
+# saving one re-buckets only that sender's emails.
 class TrainingService:
-    def __init__(self, filename="training_data.json"):
-        self.filename = filename
-        self.data = self._load_data()
-
-    def _load_data(self):
-        if not os.path.exists(self.filename):
-            return {"confidential": [], "urgent": [], "deadlines": [], "normal": []}
-        try:
-            with open(self.filename, 'r') as f:
-                return json.load(f)
-        except:
-            return {"confidential": [], "urgent": [], "deadlines": [], "normal": []}
+    def __init__(self, email_service, on_rule_saved=None):
+        self.email_service = email_service
+        self.on_rule_saved = on_rule_saved
+
+    @property
+    def data(self):
+        return self.email_service.get_sender_rules()
 
     def save_rule(self, sender, category):
-        for cat in self.data:
-            if sender in self.data[cat]:
-                self.data[cat].remove(sender)
-        
-        if category not in self.data:
-            self.data[category] = []
-            
-        if sender not in self.data[category]:
-            self.data[category].append(sender)
-        
-        with open(self.filename, 'w') as f:
-            json.dump(self.data, f)
+        self.email_service.set_sender_rule(sender, category)
+
+        # Feed the correction to the local triage model as well
+        if self.on_rule_saved:
+            self.on_rule_saved(sender, category)
 
     def get_trained_category(self, sender):
-        for category, senders in self.data.items():
-            if sender in senders:
-                return category
-        return None
-
-# Initialize Services
-trainer = TrainingService()
-service = EmailService()
-
-# --- HELPER: CLASSIFY DASHBOARD ITEMS ---
-def classify_dashboard_items(items):
-    buckets = {
-        "urgent": [],
-        "confidential": [],
-        "deadlines": [],
-        "normal": [] 
-    }
-    
-    # Standard Keywords
-    confidential_keywords = ['hdfc', 'chase', 'bank', 'credit card', 'otp', 'salary', 'tax', 'password']
-    deadline_keywords = ['deadline', 'due by', 'due date', 'schedule', 'meeting', 'urgent coordination']
-    emergency_keywords = ['urgent', 'emergency', 'immediate', 'crisis', 'action required']
-
-    for item in items:
-        sender = item.get('sender', '').strip()
-        subject = item.get('subject', '').lower()
-        tag = item.get('tag', '') 
-        combined_text = f"{subject} {sender.lower()}"
-
-        trained_cat = trainer.get_trained_category(sender)
-        
-        if trained_cat == 'confidential':
-            buckets['confidential'].append(item); continue
-        elif trained_cat == 'urgent':
-            buckets['urgent'].append(item); continue
-        elif trained_cat == 'deadlines':
-            buckets['deadlines'].append(item); continue
-        elif trained_cat == 'normal':
-            if any(k in subject for k in emergency_keywords):
-                buckets['urgent'].append(item); continue
-            if any(k in subject for k in deadline_keywords):
-                buckets['deadlines'].append(item); continue
-            buckets['normal'].append(item); continue
-
-        if 'Confidential' in tag or any(k in combined_text for k in confidential_keywords):
-            buckets['confidential'].append(item); continue 
-
-        if any(k in subject for k in deadline_keywords):
-            buckets['deadlines'].append(item); continue
-            
-        if 'Urgent' in tag:
-            buckets['urgent'].append(item); continue
-            
-        buckets['normal'].append(item)
-            
-    return buckets
-
-# --- HELPER: GET NEWSLETTERS ---
-def get_dynamic_newsletters(df):
-    news_keywords = ['digest', 'newsletter', 'weekly', 'trends', 'market report']
-    news_senders = ['news', 'info', 'update', 'linkedin', 'digest', 'alert', 'netflix']
-    news_items = []
-    
-    for idx, row in df.iterrows():
-        subject = str(row.get('Subject', '')).lower()
-        sender = str(row.get('Sender', '')).lower()
-        if 'deadline' in subject or 'urgent' in subject: continue
-
-        is_news = any(k in subject for k in news_keywords) or any(s in sender for s in news_senders)
-        if is_news:
-            news_items.append({
-                "sender": row.get('Sender'),
-                "subject": row.get('Subject'),
-                "action": row.get('Action', 'Read')
-            })
-    return news_items
-
-# --- HELPER: GET ACTION SUMMARY ---
-def get_action_summary(df):
-    summary = {"Approvals": [], "Responses": [], "Reviews": [], "Strategic": []}
-    for idx, row in df.iterrows():
-        action_text = str(row.get('Action', '')).lower()
-        subject = row.get('Subject', 'No Subject')
-        
-        if any(x in action_text for x in ['approve', 'sign', 'authorize']): summary['Approvals'].append(subject)
-        elif any(x in action_text for x in ['reply', 'respond', 'answer']): summary['Responses'].append(subject)
-        elif any(x in action_text for x in ['review', 'read', 'check']): summary['Reviews'].append(subject)
-        elif any(x in str(row.get('Subject', '')).lower() for x in ['strategy', 'plan']): summary['Strategic'].append(subject)
-    return summary
+        return self.email_service.get_sender_rule(sender)
+
+# Initialize Services (once per server process, not on every rerun)
+@st.cache_resource(show_spinner=False)
+def get_services():
+    email_service = EmailService()
+    return email_service, TrainingService(email_service, on_rule_saved=email_service.record_sender_feedback)
+
+service, trainer = get_services()
+
+# --- HELPER: SEARCH HIGHLIGHTS ---
+def render_highlight(text):
+    """Escapes search output, then turns the backend's \x02/\x03 markers into <mark> tags."""
+    return html.escape(text or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+# --- HELPER: NEAR-DUPLICATE BADGE ---
+def duplicate_badge(item):
+    count = item.get('duplicate_count') or 0
+    return f"<div class='dup-count'>🔁 +{count} similar</div>" if count else ""
+
+# --- HELPER: ACTION CENTER BUCKETS ---
+# Buckets are computed at ingest (backend.add_email_record); the "action" snapshot
+# section holds the first page of each, and "Load more" pulls the next page of just that bucket.
+def bucket_items(section, bucket):
+    if st.session_state.get("action_revision") != section["revision"]:
+        st.session_state["action_revision"] = section["revision"]
+        st.session_state["action_pages"] = {
+            name: {"items": list(page["items"]), "cursor": page["cursor"]}
+            for name, page in section["action_buckets"].items()
+        }
+    return st.session_state["action_pages"][bucket]["items"]
+
+def load_more_button(section, bucket):
+    pages = st.session_state["action_pages"][bucket]
+    if not pages["cursor"]:
+        return
+    st.caption(f"Showing {len(pages['items'])} of {section['action_buckets'][bucket]['count']}.")
+    if st.button("⬇️ Load more", key=f"more_{bucket}"):
+        page, cursor = service.get_action_items_page(cursor=pages["cursor"], bucket=bucket)
+        pages["items"] = pages["items"] + page
+        pages["cursor"] = cursor
+        st.rerun(scope="fragment")
+
+# --- HELPER: INGEST DAEMON STATUS ---
+def render_ingest_status():
+    ingest = read_ingest_status()
+    if ingest["running"]:
+        state = ingest.get("state", "idle")
+        st.success(f"Ingest daemon {'syncing…' if state == 'syncing' else 'running'} ✅")
+        if ingest.get("last_run_at"): st.caption(f"Last sync: {ingest['last_run_at'][:19].replace('T', ' ')} UTC · {ingest.get('last_result') or ''}")
+        if ingest.get("last_error"): st.error(f"Last error: {ingest['last_error']}")
+        if ingest.get("next_run_at"): st.caption(f"Next sync: {ingest['next_run_at'][:19].replace('T', ' ')} UTC")
+        queue = ingest.get("queue") or {}
+        pending = sum(queue.get(k, 0) for k in ("fetched", "analyzed", "classified"))
+        if pending or queue.get("dead"):
+            st.caption(f"Queue: {pending} pending · {queue.get('dead', 0)} failed (retry with --requeue-dead)")
+        if st.button("🔄 Sync now", disabled=state == "syncing"):
+            request_sync()
+            st.toast("Sync requested.")
+    else:
+        st.warning("Ingest daemon is not running.")
+        if ingest.get("last_run_at"): st.caption(f"Last sync: {ingest['last_run_at'][:19].replace('T', ' ')} UTC")
+        st.caption("Set GMAIL_USER / GMAIL_APP_PASSWORD in .env, then run:")
+        st.code("python ingest_daemon.py --idle", language="bash")
 
 # --- CSS ---
 st.markdown("""
@@ -158,6 +125,10 @@ st.markdown("""
     div[data-testid="stMetricValue"] { font-size: 1.8rem !important; }
     .header-row { display:flex; align-items:center; gap:12px; }
     .header-title { font-size: 1.6rem; font-weight:700; }
+    .search-hit { border-left: 4px solid #8e44ad; background-color: #faf5fc; padding: 10px 14px; border-radius: 6px; margin-bottom: 10px; color: #333; }
+    .search-hit mark { background: #ffe082; padding: 0 2px; border-radius: 2px; }
+    .search-meta { color: #777; font-size: 0.8em; }
+    .dup-count { display:inline-block; margin-top:6px; padding:2px 8px; border-radius:10px; background:#eceff1; color:#455a64; font-size:0.8em; font-weight:600; }
 </style>
 """, unsafe_allow_html=True)
 
@@ -165,6 +136,9 @@ st.markdown("""
 # --- SESSION STATE ---
 if "auto_refresh" not in st.session_state: st.session_state["auto_refresh"] = 0 
 if "new_expanded" not in st.session_state: st.session_state["new_expanded"] = True
+SENDERS_PAGE_SIZE = 25
+SENDER_ROWS_LIMIT = 20
+NEWS_PAGE_SIZE = 30
 
 # --- SIDEBAR ---
 with st.sidebar:
@@ -181,22 +155,9 @@ with st.sidebar:
         if api_key_input:
             os.environ["ANTHROPIC_API_KEY"] = api_key_input
     
-    # --- 1. SYNC ---
-    with st.expander("📧 Sync Gmail (Background)"):
-        gmail_user = st.text_input("Gmail Address")
-        gmail_pass = st.text_input("App Password", type="password")
-        if st.button("🔄 Start Sync"):
-            if gmail_user and gmail_pass and os.environ.get("ANTHROPIC_API_KEY"):
-                def run_sync_task(u, p):
-                    try:
-                        print("Sync started..."); service.sync_with_gmail(u, p); print("Sync finished")
-                    except Exception as e: print(f"Sync error: {e}")
-                t = threading.Thread(target=run_sync_task, args=(gmail_user, gmail_pass))
-                t.start()
-                st.success("Sync started!")
-            elif not os.environ.get("ANTHROPIC_API_KEY"):
-                 st.error("Missing API Key configuration.")
-            else: st.error("Enter credentials.")
+    # --- 1. SYNC (runs in ingest_daemon.py, not in this process) ---
+    with st.expander("📧 Gmail Sync", expanded=True):
+        st.fragment(render_ingest_status, run_every=st.session_state["auto_refresh"] or None)()
 
     # --- 2. MANUAL FEED ---
     with st.expander("📝 Manual Feed (Add Data)"):
@@ -236,48 +197,67 @@ with st.sidebar:
     auto_val = st.number_input("Seconds", min_value=0, max_value=3600, value=st.session_state["auto_refresh"], step=5)
     if auto_val != st.session_state["auto_refresh"]: st.session_state["auto_refresh"] = int(auto_val)
 
-if st.session_state["auto_refresh"] > 0:
-    interval = int(st.session_state["auto_refresh"])
-    components.html(f"<script>setInterval(() => {{ if (!document.hidden) {{ window.location.reload(); }} }}, {interval} * 1000);</script>", height=0)
+# Auto-refresh reruns only the live fragments below (KPIs, Action Center,
+# Action Summary). Each fragment reads only its own snapshot section: KPIs come
+# straight from the counters, and a section is rebuilt only when its change
+# scope moved. The page, session and other tabs are left alone.
+refresh_every = st.session_state["auto_refresh"] or None
+history = service.get_snapshot_section("history")
 
 # --- HEADER & KPI ---
-stats = service.get_kpi_stats()
-new_count = stats.get("new_items", 0)
-action_data = service.get_action_checklist()
-pending_approvals = len([x for x in action_data["Approvals"] if not x["completed"]])
-
-st.markdown(f"""
-<div class="header-row">
-  <div class="header-title">📊 Executive Command Center</div>
-  {"<div class='new-badge'>%d New</div>" % new_count if new_count > 0 else ""}
-</div>
-""", unsafe_allow_html=True)
-st.caption(f"Last Updated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-kpi1, kpi2, kpi3, kpi4 = st.columns(4)
-kpi1.metric("Inbox Load", stats.get("total_unread", 0), delta="Emails")
-kpi2.metric("Active Threads", stats.get("new_threads", 0), delta="Ongoing")
-kpi3.metric("Critical Items", stats.get("urgent_count", 0), delta="Action Req", delta_color="inverse")
-kpi4.metric("Pending Approvals", pending_approvals, delta="Sign-offs Needed", delta_color="inverse")
+def render_kpis():
+    stats = service.get_kpi_stats()
+    new_count = stats.get("new_items", 0)
+    pending_approvals = stats.get("pending_approvals", 0)
+
+    st.markdown(f"""
+    <div class="header-row">
+      <div class="header-title">📊 Executive Command Center</div>
+      {"<div class='new-badge'>%d New</div>" % new_count if new_count > 0 else ""}
+    </div>
+    """, unsafe_allow_html=True)
+    st.caption(f"Last Updated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    kpi1, kpi2, kpi3, kpi4 = st.columns(4)
+    kpi1.metric("Inbox Load", stats.get("total_unread", 0), delta="Emails")
+    kpi2.metric("Active Threads", stats.get("new_threads", 0), delta="Ongoing")
+    kpi3.metric("Critical Items", stats.get("urgent_count", 0), delta="Action Req", delta_color="inverse")
+    kpi4.metric("Pending Approvals", pending_approvals, delta="Sign-offs Needed", delta_color="inverse")
+
+st.fragment(render_kpis, run_every=refresh_every)()
 
 st.markdown("---")
 
+# --- SEARCH ---
+search_query = st.text_input("🔎 Search mail", placeholder='e.g. Q3 budget, "board meeting", finan')
+if search_query:
+    results = service.search_emails(search_query)
+    with st.expander(f"🔎 {len(results)} results for “{search_query}”", expanded=True):
+        if not results: st.info("No matching emails.")
+        for hit in results:
+            st.markdown(f"""
+            <div class="search-hit">
+                <div><b>{render_highlight(hit.get('subject_highlight'))}</b></div>
+                <div class="search-meta">{html.escape(hit.get('sender') or '')} · {(hit.get('received_at') or '')[:10]} · {html.escape(hit.get('tag') or '')}</div>
+                <div>{render_highlight(hit.get('snippet'))}</div>
+            </div>
+            """, unsafe_allow_html=True)
+
 # --- MAIN TABS ---
-tab_action, tab_thread, tab_news, tab_summary = st.tabs([
-    "🔥 Action Center", "🧵 Deep Dive", "📰 Newsletters", "✅ Action Summary"
+tab_action, tab_thread, tab_news, tab_summary, tab_perf = st.tabs([
+    "🔥 Action Center", "🧵 Deep Dive", "📰 Newsletters", "✅ Action Summary", "⏱️ Performance"
 ])
 
 # --- TAB 1: ACTION CENTER ---
-with tab_action:
-    all_items = service.get_urgent_items() + service.get_new_items()
-    unique_map = {item['id']: item for item in all_items}
-    unique_items = list(unique_map.values())
-    buckets = classify_dashboard_items(unique_items)
+def render_action_center():
+    section = service.get_snapshot_section("action")
+    buckets = {name: bucket_items(section, name) for name in section["action_buckets"]}
+    counts = {name: page["count"] for name, page in section["action_buckets"].items()}
     
     st.subheader("⚠️ Executive Attention Required")
 
     # --- URGENT ---
-    urgent_count = len(buckets['urgent'])
+    urgent_count = counts['urgent']
     if urgent_count > 0:
         with st.expander(f"❗ Urgent Emails ({urgent_count})", expanded=True):
             for item in buckets['urgent']:
@@ -286,6 +266,7 @@ with tab_action:
                     <div class="urgent-title">{item.get('sender')}</div>
                     <div>{item.get('subject')}</div>
                     <div class="urgent-action">👉 Action: {item.get('action', 'Review')}</div>
+                    {duplicate_badge(item)}
                 </div>
                 """, unsafe_allow_html=True)
                 
@@ -293,19 +274,20 @@ with tab_action:
                 with c1:
                     with st.popover("🚩 Train"):
                         if st.button("Confidential", key=f"t_conf_{item['id']}"):
-                            trainer.save_rule(item['sender'], 'confidential'); st.rerun()
+                            trainer.save_rule(item['sender'], 'confidential'); st.rerun(scope="fragment")
                         if st.button("Deadline", key=f"t_dead_{item['id']}"):
-                            trainer.save_rule(item['sender'], 'deadlines'); st.rerun()
+                            trainer.save_rule(item['sender'], 'deadlines'); st.rerun(scope="fragment")
                         if st.button("Normal", key=f"t_norm_{item['id']}"):
-                            trainer.save_rule(item['sender'], 'normal'); st.rerun()
+                            trainer.save_rule(item['sender'], 'normal'); st.rerun(scope="fragment")
                 with c2:
                     if st.button("Draft Reply", key=f"urg_btn_{item.get('id')}"):
                         with st.spinner("Writing..."):
                             draft = generate_reply(item.get('sender'), item.get('subject'), item.get('action'), item.get('body'))
                             st.text_area("Draft:", value=draft, height=100)
+            load_more_button(section, 'urgent')
 
     # --- CONFIDENTIAL ---
-    conf_count = len(buckets['confidential'])
+    conf_count = counts['confidential']
     if conf_count > 0:
         with st.expander(f"🕵️ Confidential ({conf_count})", expanded=False):
             for item in buckets['confidential']:
@@ -314,16 +296,18 @@ with tab_action:
                     <div class="urgent-title">{item.get('sender')}</div>
                     <div>{item.get('subject')}</div>
                     <div class="urgent-action" style="color: #444;">👉 Action: {item.get('action', 'Review')}</div>
+                    {duplicate_badge(item)}
                 </div>
                 """, unsafe_allow_html=True)
                 with st.popover("🚩 Mistake?"):
                     if st.button("Mark Urgent", key=f"t_urg_c_{item['id']}"):
-                        trainer.save_rule(item['sender'], 'urgent'); st.rerun()
+                        trainer.save_rule(item['sender'], 'urgent'); st.rerun(scope="fragment")
                     if st.button("Mark Normal", key=f"t_norm_c_{item['id']}"):
-                        trainer.save_rule(item['sender'], 'normal'); st.rerun()
+                        trainer.save_rule(item['sender'], 'normal'); st.rerun(scope="fragment")
+            load_more_button(section, 'confidential')
 
     # --- DEADLINES ---
-    deadline_count = len(buckets['deadlines'])
+    deadline_count = counts['deadlines']
     if deadline_count > 0:
         with st.expander(f"⏰ Deadlines ({deadline_count})", expanded=False):
             for item in buckets['deadlines']:
@@ -334,13 +318,14 @@ with tab_action:
                 with d_col2:
                     with st.popover("🚩 Train"):
                         if st.button("Not a Deadline?", key=f"t_no_dead_{item['id']}"):
-                            trainer.save_rule(item['sender'], 'normal'); st.rerun()
+                            trainer.save_rule(item['sender'], 'normal'); st.rerun(scope="fragment")
                     if st.button("Ack", key=f"dl_{item.get('id')}"):
                         st.toast("Marked as acknowledged.")
                 st.divider()
+            load_more_button(section, 'deadlines')
 
     # --- 📥 NEW / NORMAL EMAILS ---
-    normal_count = len(buckets['normal'])
+    normal_count = counts['normal']
     if normal_count > 0:
         with st.expander(f"📥 New Emails ({normal_count})", expanded=True):
             for item in buckets['normal']:
@@ -349,6 +334,7 @@ with tab_action:
                     <div class="new-title">{item.get('sender')}</div>
                     <div>{item.get('subject')}</div>
                     <div style="margin-top:5px; color:#555;">👉 Action: {item.get('action', 'Review')}</div>
+                    {duplicate_badge(item)}
                 </div>
                 """, unsafe_allow_html=True)
                 
@@ -356,49 +342,58 @@ with tab_action:
                 with c1:
                      with st.popover("🚩 Train"):
                         if st.button("Urgent", key=f"t_urg_n_{item['id']}"):
-                            trainer.save_rule(item['sender'], 'urgent'); st.rerun()
+                            trainer.save_rule(item['sender'], 'urgent'); st.rerun(scope="fragment")
                         if st.button("Confidential", key=f"t_conf_n_{item['id']}"):
-                            trainer.save_rule(item['sender'], 'confidential'); st.rerun()
+                            trainer.save_rule(item['sender'], 'confidential'); st.rerun(scope="fragment")
                 with c2:
                      if st.button("Draft Reply", key=f"norm_btn_{item.get('id')}"):
                          with st.spinner("Writing..."):
                              draft = generate_reply(item.get('sender'), item.get('subject'), item.get('action'), item.get('body'))
                              st.text_area("Draft:", value=draft, height=100)
+            load_more_button(section, 'normal')
     
     if urgent_count == 0 and conf_count == 0 and deadline_count == 0 and normal_count == 0:
             st.success("No new emails.")
 
+with tab_action:
+    st.fragment(render_action_center, run_every=refresh_every)()
+
 # --- TAB 2: DEEP DIVE ---
 with tab_thread:
     st.subheader("📨 Deep Dive by Sender")
     try:
-        if os.path.exists("emails.csv"):
-            df_all = pd.read_csv("emails.csv")
-        else:
-            conn = service._get_conn()
-            df_all = pd.read_sql_query("SELECT * FROM emails", conn)
-            conn.close()
-
-        if 'sender' not in df_all.columns: 
-            df_all.rename(columns={'Sender': 'sender', 'Subject': 'subject', 'Action': 'action', 'Tag': 'tag'}, inplace=True)
-
-        sender_counts = df_all['sender'].value_counts()
-        
-        if not sender_counts.empty:
-            for sender_name, count in sender_counts.items():
-                sender_emails = df_all[df_all['sender'] == sender_name]
-                subjects = sender_emails['subject'].dropna().unique().tolist()
-                actions = sender_emails['action'].dropna().unique().tolist()
+        df_all = history["history"]
+        senders = history["senders"]
+        sender_rows = history["sender_rows"]
+
+        if st.session_state.get("senders_revision") != history["revision"]:
+            st.session_state["senders_revision"] = history["revision"]
+            st.session_state["senders_shown"] = SENDERS_PAGE_SIZE
+        shown = st.session_state["senders_shown"]
+
+        if senders:
+            for entry in senders[:shown]:
+                sender_name, count = entry['sender'], entry['count']
+                subjects, actions = entry['topics'], entry['actions']
                 
                 overview = f"Sent **{count}** emails."
-                if subjects: overview += f" Topics: _{', '.join(subjects[:3])}_..."
-                action_text = f"Pending: **{', '.join([str(a) for a in actions if str(a).lower()!='nan'])}**" if actions else ""
+                if subjects: overview += f" Topics: _{', '.join(str(s) for s in subjects)}_..."
+                action_text = f"Pending: **{', '.join([str(a) for a in actions])}**" if actions else ""
                 
                 with st.expander(f"👤 {sender_name} ({count} emails)"):
                     st.info(f"📝 {overview} {action_text}")
                     st.divider()
-                    for idx, row in sender_emails.iterrows():
-                        st.markdown(f"• **{row.get('subject')}** <span style='font-size:0.8em; color:gray'>({row.get('tag')})</span>", unsafe_allow_html=True)
+                    rows = df_all.iloc[sender_rows[sender_name][:SENDER_ROWS_LIMIT]]
+                    for subject, tag in zip(rows['subject'], rows['tag'] if 'tag' in rows else [None] * len(rows)):
+                        st.markdown(f"• **{subject}** <span style='font-size:0.8em; color:gray'>({tag})</span>", unsafe_allow_html=True)
+                    if count > SENDER_ROWS_LIMIT:
+                        st.caption(f"…and {count - SENDER_ROWS_LIMIT} more. Use 🔎 Search to find a specific email.")
+
+            if len(senders) > shown:
+                st.caption(f"Showing {shown} of {len(senders)} senders.")
+                if st.button("⬇️ Load more senders", key="senders_load_more"):
+                    st.session_state["senders_shown"] = shown + SENDERS_PAGE_SIZE
+                    st.rerun()
         else: st.info("No email data found.")
     except Exception as e: st.error(f"Could not load email data: {e}")
 
@@ -406,41 +401,34 @@ with tab_thread:
 with tab_news:
     st.subheader("📰 Industry Pulse")
     try:
-        if os.path.exists("emails.csv"):
-            df_news = pd.read_csv("emails.csv")
-        else:
-             conn = service._get_conn()
-             df_news = pd.read_sql_query("SELECT * FROM emails", conn)
-             conn.close()
-        
-        df_news.rename(columns={'sender': 'Sender', 'subject': 'Subject', 'action': 'Action'}, inplace=True)
-        
-        news_items = get_dynamic_newsletters(df_news)
+        # Detected once per history rebuild (backend.get_dynamic_newsletters); rendered a page at a time
+        news_items = history["newsletters"]
+        if st.session_state.get("news_revision") != history["revision"]:
+            st.session_state["news_revision"] = history["revision"]
+            st.session_state["news_shown"] = NEWS_PAGE_SIZE
+        news_shown = st.session_state["news_shown"]
+
         if news_items:
-            for news in news_items:
+            for news in news_items[:news_shown]:
                 st.markdown(f"""
                 <div class="news-box">
                     <div class="news-title">{news['sender']}</div>
                     <div>{news['subject']}</div>
                     <div class="news-action">👉 Action: {news['action']}</div>
                 </div>""", unsafe_allow_html=True)
+            if len(news_items) > news_shown:
+                st.caption(f"Showing {news_shown} of {len(news_items)} newsletters.")
+                if st.button("⬇️ Load more newsletters", key="news_load_more"):
+                    st.session_state["news_shown"] = news_shown + NEWS_PAGE_SIZE
+                    st.rerun()
         else: st.info("No newsletters found.")
     except Exception as e: st.error(f"Error: {e}")
 
 # --- TAB 4: SUMMARY ---
-with tab_summary:
+def render_action_summary():
     st.subheader("✅ Action Summary")
     try:
-        if os.path.exists("emails.csv"):
-            df_sum = pd.read_csv("emails.csv")
-        else:
-            conn = service._get_conn()
-            df_sum = pd.read_sql_query("SELECT * FROM emails", conn)
-            conn.close()
-            
-        df_sum.rename(columns={'sender': 'Sender', 'subject': 'Subject', 'action': 'Action'}, inplace=True)
-
-        sum_data = get_action_summary(df_sum)
+        sum_data = service.get_snapshot_section("summary")["action_summary"]
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Approvals", len(sum_data['Approvals']))
         if sum_data['Approvals']: c1.markdown("<br>".join([f"• {s[:30]}..." for s in sum_data['Approvals'][:5]]), unsafe_allow_html=True)
@@ -453,4 +441,72 @@ with tab_summary:
 
         c4.metric("Strategic", len(sum_data['Strategic']))
         if sum_data['Strategic']: c4.markdown("<br>".join([f"• {s[:30]}..." for s in sum_data['Strategic'][:5]]), unsafe_allow_html=True)
-    except Exception as e: st.error(f"Error: {e}")
\ No newline at end of file
+    except Exception as e: st.error(f"Error: {e}")
+
+with tab_summary:
+    st.fragment(render_action_summary, run_every=refresh_every)()
+
+# --- TAB 5: PERFORMANCE ---
+# Sync stages run in the ingest daemon (read from its metrics file); dashboard
+# queries and reply drafts are measured in this process.
+PERF_WINDOWS = {"Last 15 minutes": 15 * 60, "Last hour": 3600, "All recent samples": None}
+
+def latency_chart(data, name, since):
+    """Recent samples of one histogram as a time series, one line per label set."""
+    rows = []
+    for series in data.get("histograms", {}).get(name, []):
+        label = ", ".join(f"{k}={v}" for k, v in sorted(series["labels"].items())) or name
+        rows += [{"time": datetime.fromtimestamp(t), "series": label, "ms": v * 1000}
+                 for t, v in series.get("recent", []) if since is None or t >= since]
+    if rows:
+        st.line_chart(pd.DataFrame(rows), x="time", y="ms", color="series")
+
+def render_performance_source(title, data, since):
+    st.markdown(f"**{title}**")
+    if not data or not (data.get("counters") or data.get("histograms")):
+        st.caption("No metrics recorded yet.")
+        return
+    rows = metrics.latency_rows(data, since)
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    else:
+        st.caption("No calls in this window.")
+
+    names = sorted(n for n in data.get("histograms", {}) if n.endswith("_seconds"))
+    if names:
+        default = names.index("ecc_ingest_stage_seconds") if "ecc_ingest_stage_seconds" in names else 0
+        latency_chart(data, st.selectbox("Latency over time", names, index=default, key=f"perf-chart-{title}"), since)
+
+    caches = metrics.cache_rows(data)
+    if caches:
+        st.markdown("Caches (hit rate, latency saved)")
+        st.dataframe(pd.DataFrame(caches), hide_index=True, use_container_width=True)
+
+    counters = metrics.counter_rows(data)
+    if counters:
+        with st.expander("Counters (tokens, retries, cache hits, failures)"):
+            st.dataframe(pd.DataFrame(counters), hide_index=True, use_container_width=True)
+
+    d1, d2 = st.columns(2)
+    d1.download_button("⬇️ Prometheus text", metrics.prometheus_text(data), file_name="metrics.prom",
+                       mime="text/plain", key=f"perf-prom-{title}")
+    d2.download_button("⬇️ JSON snapshot", json.dumps(data), file_name="metrics.json",
+                       mime="application/json", key=f"perf-json-{title}")
+
+def render_performance():
+    st.subheader("⏱️ Performance")
+    window = st.radio("Window", list(PERF_WINDOWS), horizontal=True, key="perf-window")
+    since = time.time() - PERF_WINDOWS[window] if PERF_WINDOWS[window] else None
+
+    ingest = read_ingest_metrics()
+    if ingest:
+        st.caption(f"Ingest daemon snapshot from {datetime.fromtimestamp(ingest['generated_at']).strftime('%H:%M:%S')}")
+    render_performance_source("🛰️ Ingest daemon (IMAP, Claude, classifier, embeddings, index)", ingest, since)
+    st.divider()
+    if metrics.enabled():
+        render_performance_source("🖥️ Dashboard (queries, replies)", metrics.snapshot(), since)
+    else:
+        st.caption("Dashboard metrics are disabled (METRICS_ENABLED=0).")
+
+with tab_perf:
+    st.fragment(render_performance, run_every=refresh_every)()
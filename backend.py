@@ -1,17 +1,31 @@
+import os
+import re
+import json
 import sqlite3
-import uuid
+import threading
 import concurrent.futures
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List
+import numpy as np
 import pandas as pd
 
 # Import modules
+import metrics
 from imap_module import fetch_emails
 from ai_engine import analyze_email_with_ai
 from classifier import classify_urgency_and_action
-from rag_engine import index_emails_to_vector_db
+from rag_engine import index_emails_to_vector_db, INDEX_LAYOUT
+from embedding_store import EmbeddingStore
+from dedupe import NearDuplicateIndex, minhash, to_blob, from_blob, DEDUPE_WINDOW_DAYS
+from triage_model import predict_triage, get_triage_model, retrain_in_background, FEEDBACK_TAGS, USER_LABEL_WEIGHT
+from bucketing import BUCKETS, SENDER_RULE_CATEGORIES, compute_bucket
+from ingest_queue import IngestQueue, STATUS_FETCHED, STATUS_ANALYZED, STATUS_CLASSIFIED, STATUS_INDEXED, STATUS_DEAD
 
 DB_FILE = "emails.db"
+# Demo / imported history shown in the Deep Dive, Newsletter and Summary tabs when present
+HISTORY_CSV = "emails.csv"
+# Sender rules used to live in this file; it is imported once into sender_rules
+LEGACY_RULES_JSON = "training_data.json"
 
 def _now_iso():
     return datetime.now(timezone.utc).isoformat()
@@ -39,62 +53,694 @@ CREATE TABLE IF NOT EXISTS emails (
     is_new INTEGER DEFAULT 1,
     completed INTEGER DEFAULT 0,
     thread_id TEXT,
-    message_id TEXT
+    message_id TEXT,
+    ai_tag TEXT,
+    ai_action TEXT,
+    label_source TEXT,
+    minhash BLOB,
+    duplicate_of TEXT,
+    rag_indexed_at TEXT,
+    bucket TEXT
 );
 """
 
+# Columns added after the first release; ALTERed into older databases on startup.
+EMAIL_COLUMN_MIGRATIONS = [
+    ("ai_tag", "TEXT"),
+    ("ai_action", "TEXT"),
+    ("label_source", "TEXT"),
+    ("minhash", "BLOB"),
+    ("duplicate_of", "TEXT"),
+    ("rag_indexed_at", "TEXT"),
+    ("bucket", "TEXT"),
+]
+
+CREATE_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_emails_duplicate_of ON emails(duplicate_of)",
+    # Keyset pagination walks (received_at, id) newest first
+    "CREATE INDEX IF NOT EXISTS idx_emails_received ON emails(received_at, id)",
+    # Per-bucket Action Center pages, and re-bucketing one sender after a rule change
+    "CREATE INDEX IF NOT EXISTS idx_emails_bucket ON emails(bucket, received_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails(sender)",
+    # Sender rules are keyed by the trimmed sender; re-bucketing looks rows up the same way
+    "CREATE INDEX IF NOT EXISTS idx_emails_sender_key ON emails(TRIM(sender))",
+    # Partial index: finding un-indexed mail costs O(pending), not O(mailbox)
+    "CREATE INDEX IF NOT EXISTS idx_emails_rag_pending ON emails(received_at) WHERE rag_indexed_at IS NULL AND duplicate_of IS NULL",
+]
+
+# Canonical emails only, each with the number of near-duplicates collapsed onto it.
+# The count is a correlated lookup on idx_emails_duplicate_of, so a page of
+# results only costs as much as the page.
+GROUPED_EMAILS_SQL = """
+SELECT e.*, (SELECT COUNT(*) FROM emails d WHERE d.duplicate_of = e.id) AS duplicate_count
+FROM emails e
+WHERE e.duplicate_of IS NULL
+"""
+
+# Full-text search: an external-content FTS5 table over emails, kept in sync by
+# triggers. Only subject/sender/body edits touch the index; flag updates don't.
+CREATE_SEARCH_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+        subject, sender, body, content='emails', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN
+        INSERT INTO emails_fts(rowid, subject, sender, body) VALUES (new.rowid, new.subject, new.sender, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS emails_fts_ad AFTER DELETE ON emails BEGIN
+        INSERT INTO emails_fts(emails_fts, rowid, subject, sender, body) VALUES ('delete', old.rowid, old.subject, old.sender, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF subject, sender, body ON emails BEGIN
+        INSERT INTO emails_fts(emails_fts, rowid, subject, sender, body) VALUES ('delete', old.rowid, old.subject, old.sender, old.body);
+        INSERT INTO emails_fts(rowid, subject, sender, body) VALUES (new.rowid, new.subject, new.sender, new.body);
+    END""",
+]
+
+# bm25 column weights: a hit in the subject counts most, then sender, then body
+SEARCH_SQL = """
+SELECT e.id, e.sender, e.subject, e.tag, e.action, e.received_at,
+       highlight(emails_fts, 0, char(2), char(3)) AS subject_highlight,
+       snippet(emails_fts, 2, char(2), char(3), '…', 16) AS snippet,
+       bm25(emails_fts, 10.0, 5.0, 1.0) AS score
+FROM emails_fts JOIN emails e ON e.rowid = emails_fts.rowid
+WHERE emails_fts MATCH ?
+ORDER BY score
+LIMIT ?
+"""
+
+# =================================================
+# MATERIALIZED KPI COUNTERS
+# =================================================
+# Each counter is "how many rows satisfy this predicate"; triggers add the new
+# row's contribution and subtract the old one, so KPI reads are O(1).
+# {r} is replaced by new/old inside the trigger bodies.
+KPI_COUNTER_PREDICATES = {
+    "total_emails": "1",
+    "total_unread": "{r}.is_new = 1",
+    "urgent_count": "{r}.tag LIKE '%Urgent%'",
+    "pending_approvals": "{r}.action LIKE '%Approve%' AND {r}.completed = 0",
+    "pending_responses": "({r}.action LIKE '%Reply%' OR {r}.action LIKE '%Provide%') AND {r}.completed = 0",
+}
+KPI_COUNTERS = list(KPI_COUNTER_PREDICATES) + ["active_threads"]
+
+def _counter_delta(sign, r):
+    cases = " ".join(
+        f"WHEN '{name}' THEN COALESCE(({pred.format(r=r)}), 0)" for name, pred in KPI_COUNTER_PREDICATES.items()
+    )
+    return f"UPDATE kpi_counters SET value = value {sign} (CASE name {cases} ELSE 0 END);"
+
+# A thread is active while it holds at least one unread email.
+_THREAD_OPEN = "COALESCE({r}.is_new = 1, 0)"
+_THREAD_ID = "COALESCE({r}.thread_id, {r}.id)"
+
+def _thread_add(r):
+    return (f"INSERT INTO thread_activity (thread_id, open_count) VALUES ({_THREAD_ID.format(r=r)}, {_THREAD_OPEN.format(r=r)}) "
+            "ON CONFLICT(thread_id) DO UPDATE SET open_count = open_count + excluded.open_count;")
+
+def _thread_remove(r):
+    return (f"UPDATE thread_activity SET open_count = open_count - {_THREAD_OPEN.format(r=r)} "
+            f"WHERE thread_id = {_THREAD_ID.format(r=r)};")
+
+CREATE_KPI_SQL = [
+    "CREATE TABLE IF NOT EXISTS kpi_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, open_count INTEGER NOT NULL DEFAULT 0)",
+    f"""CREATE TRIGGER IF NOT EXISTS kpi_emails_ai AFTER INSERT ON emails BEGIN
+        {_counter_delta('+', 'new')}
+        {_thread_add('new')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS kpi_emails_ad AFTER DELETE ON emails BEGIN
+        {_counter_delta('-', 'old')}
+        {_thread_remove('old')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS kpi_emails_au AFTER UPDATE OF is_new, tag, action, completed, thread_id ON emails BEGIN
+        {_counter_delta('-', 'old')}
+        {_counter_delta('+', 'new')}
+        {_thread_remove('old')}
+        {_thread_add('new')}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS kpi_threads_ai AFTER INSERT ON thread_activity WHEN new.open_count > 0 BEGIN
+        UPDATE kpi_counters SET value = value + 1 WHERE name = 'active_threads';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS kpi_threads_au AFTER UPDATE OF open_count ON thread_activity
+    WHEN (old.open_count > 0) != (new.open_count > 0) BEGIN
+        UPDATE kpi_counters SET value = value + (CASE WHEN new.open_count > 0 THEN 1 ELSE -1 END) WHERE name = 'active_threads';
+    END""",
+]
+
+# Ground truth used by the consistency check / rebuild
+KPI_RECOUNT_SQL = "SELECT " + ", ".join(
+    f"COALESCE(SUM(COALESCE(({pred.format(r='emails')}), 0)), 0) AS {name}" for name, pred in KPI_COUNTER_PREDICATES.items()
+) + ", (SELECT COUNT(*) FROM (SELECT 1 FROM emails GROUP BY COALESCE(thread_id, id) HAVING SUM(is_new = 1) > 0)) AS active_threads FROM emails"
+
+# =================================================
+# DASHBOARD CHANGE COUNTERS
+# =================================================
+# One version per dashboard scope, bumped by triggers on the tables that scope
+# reads. Queue, embedding, label and bookkeeping commits leave them alone, and
+# so do the index-only email columns (minhash, rag_indexed_at).
+CHANGE_SCOPES = ("actions", "history")
+_ACTION_COLUMNS = "sender, subject, body, tag, action, type, attachment, received_at, is_new, completed, thread_id, ai_tag, ai_action, label_source, duplicate_of, bucket"
+_HISTORY_COLUMNS = "sender, subject, tag, action, received_at, is_new"
+
+def _bump(*scopes):
+    names = ", ".join(f"'{scope}'" for scope in scopes)
+    return f"UPDATE data_changes SET version = version + 1 WHERE scope IN ({names});"
+
+CREATE_CHANGES_SQL = [
+    "CREATE TABLE IF NOT EXISTS data_changes (scope TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_emails_ai AFTER INSERT ON emails BEGIN {_bump(*CHANGE_SCOPES)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_emails_ad AFTER DELETE ON emails BEGIN {_bump(*CHANGE_SCOPES)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_emails_au_actions AFTER UPDATE OF {_ACTION_COLUMNS} ON emails BEGIN {_bump('actions')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_emails_au_history AFTER UPDATE OF {_HISTORY_COLUMNS} ON emails BEGIN {_bump('history')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_rules_ai AFTER INSERT ON sender_rules BEGIN {_bump('actions')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_rules_ad AFTER DELETE ON sender_rules BEGIN {_bump('actions')} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS changes_rules_au AFTER UPDATE ON sender_rules BEGIN {_bump('actions')} END""",
+]
+
+# Action Center stream: new or urgent canonical emails, newest first
+ACTION_ITEMS_FILTER = " AND (e.is_new = 1 OR e.tag LIKE '%Urgent%' OR e.tag LIKE '%Critical%')"
+PAGE_SIZE = 50
+ACTION_BUCKET_COUNTS_SQL = "SELECT e.bucket, COUNT(*) FROM emails e WHERE e.duplicate_of IS NULL" + ACTION_ITEMS_FILTER + " GROUP BY e.bucket"
+SNAPSHOT_CHECKLIST_SQL = """
+SELECT id, subject, completed, action FROM emails
+WHERE action LIKE '%Approve%' OR action LIKE '%Reply%' OR action LIKE '%Provide%'
+"""
+SNAPSHOT_HISTORY_SQL = "SELECT id, sender, subject, tag, action, received_at, is_new FROM emails"
+SNAPSHOT_SUMMARY_SQL = "SELECT subject, action FROM emails"
+# Dashboard sections, each cached on its own: the change scope that invalidates
+# it and the keys compared to decide whether its revision moves (a section can
+# hold more keys than it compares). A fragment fetches only its own section.
+SNAPSHOT_SECTIONS = {
+    "action": ("actions", ("action_buckets",)),
+    "checklist": ("actions", ("checklist",)),
+    "summary": ("history", ("action_summary",)),
+    "history": ("history", ("senders", "newsletters")),
+}
+
+# Small key/value store for app-level bookkeeping (index layout, ...)
+CREATE_META_SQL = "CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value TEXT)"
+
+# TrainingService sender rules: one row per sender, looked up by primary key
+CREATE_SENDER_RULES_SQL = """
+CREATE TABLE IF NOT EXISTS sender_rules (
+    sender TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    updated_at TEXT
+);
+"""
+
+# Training signal for the local triage model (Claude labels + "Train" clicks).
+CREATE_TRIAGE_LABELS_SQL = """
+CREATE TABLE IF NOT EXISTS triage_labels (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    email_id TEXT,
+    tag TEXT,
+    action TEXT,
+    source TEXT,
+    weight REAL DEFAULT 1.0,
+    created_at TEXT
+);
+"""
+
+# At most one "Train" label per email, so repeated clicks replace it instead of
+# stacking weight. Duplicates from before the index existed are dropped first.
+DEDUPE_USER_LABELS_SQL = """
+DELETE FROM triage_labels WHERE source = 'user' AND seq NOT IN (
+    SELECT MAX(seq) FROM triage_labels WHERE source = 'user' GROUP BY email_id
+)
+"""
+CREATE_USER_LABEL_INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS idx_triage_labels_user ON triage_labels(email_id) WHERE source = 'user'"
+
+def build_sender_overview(df, max_topics=3):
+    """
+    One groupby pass over the history: per sender the email count, first few
+    distinct topics and distinct actions, busiest senders first.
+    Also returns {sender: row positions} so a sender's emails can be sliced
+    out without re-filtering the whole frame.
+    """
+    if df is None or df.empty or 'sender' not in df.columns:
+        return [], {}
+    subjects = df['subject'] if 'subject' in df.columns else pd.Series(index=df.index, dtype=object)
+    actions = df['action'] if 'action' in df.columns else pd.Series(index=df.index, dtype=object)
+    frame = pd.DataFrame({'sender': df['sender'], 'subject': subjects, 'action': actions})
+
+    counts = frame.groupby('sender', sort=False).size()
+    topics = (frame.dropna(subset=['subject']).drop_duplicates(['sender', 'subject'])
+              .groupby('sender', sort=False).head(max_topics).groupby('sender', sort=False)['subject'].agg(list))
+    pending = frame.dropna(subset=['action']).drop_duplicates(['sender', 'action']).groupby('sender', sort=False)['action'].agg(list)
+
+    overview = pd.DataFrame({'count': counts, 'topics': topics, 'actions': pending})
+    overview = overview.sort_values('count', ascending=False, kind='stable')
+    senders = overview.rename_axis('sender').reset_index().to_dict('records')
+    for entry in senders:
+        entry['count'] = int(entry['count'])
+        for key in ('topics', 'actions'):
+            if not isinstance(entry[key], list): entry[key] = []
+    return senders, frame.groupby('sender', sort=False).indices
+
+# =================================================
+# HISTORY VIEWS (Newsletters / Action Summary tabs)
+# =================================================
+# Vectorized over the whole history frame: one compiled alternation per
+# keyword list, applied with str.contains and combined as boolean masks.
+NEWS_SUBJECT_KEYWORDS = ['digest', 'newsletter', 'weekly', 'trends', 'market report']
+NEWS_SENDER_KEYWORDS = ['news', 'info', 'update', 'linkedin', 'digest', 'alert', 'netflix']
+NEWS_EXCLUDE_KEYWORDS = ['deadline', 'urgent']
+SUMMARY_CATEGORIES = [
+    # (category, column checked, keywords) - first match wins
+    ("Approvals", "action", ['approve', 'sign', 'authorize']),
+    ("Responses", "action", ['reply', 'respond', 'answer']),
+    ("Reviews", "action", ['review', 'read', 'check']),
+    ("Strategic", "subject", ['strategy', 'plan']),
+]
+
+def _keyword_regex(keywords):
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+_NEWS_SUBJECT_RE = _keyword_regex(NEWS_SUBJECT_KEYWORDS)
+_NEWS_SENDER_RE = _keyword_regex(NEWS_SENDER_KEYWORDS)
+_NEWS_EXCLUDE_RE = _keyword_regex(NEWS_EXCLUDE_KEYWORDS)
+_SUMMARY_RES = [(name, column, _keyword_regex(words)) for name, column, words in SUMMARY_CATEGORIES]
+
+def _contains(df, column, pattern):
+    """
+    Boolean mask: which rows of df[column] contain pattern (case-insensitive).
+    Senders and actions repeat a lot, so the regex runs once per distinct value.
+    """
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+    hits = pd.Series(uniques).astype(str).str.lower().str.contains(pattern).to_numpy(dtype=bool)
+    return hits[codes]
+
+def get_dynamic_newsletters(df):
+    """
+    Rows that look like newsletters (by subject or sender), skipping anything
+    about deadlines or urgent matters. Expects the snapshot history columns
+    (sender, subject, action); returns [{sender, subject, action}].
+    """
+    if df is None or df.empty:
+        return []
+    mask = (_contains(df, 'subject', _NEWS_SUBJECT_RE) | _contains(df, 'sender', _NEWS_SENDER_RE)) & ~_contains(df, 'subject', _NEWS_EXCLUDE_RE)
+    news = df.loc[mask]
+    column = lambda name, default: news[name].tolist() if name in news.columns else [default] * len(news)
+    return [
+        {"sender": s, "subject": subj, "action": a}
+        for s, subj, a in zip(column('sender', None), column('subject', None), column('action', 'Read'))
+    ]
+
+def get_action_summary(df):
+    """Groups subjects by what they ask for: {Approvals|Responses|Reviews|Strategic: [subject, ...]}."""
+    summary = {name: [] for name, _, _ in SUMMARY_CATEGORIES}
+    if df is None or df.empty:
+        return summary
+    conditions = [_contains(df, column, pattern) for _, column, pattern in _SUMMARY_RES]
+    category = np.select(conditions, [name for name, _, _ in SUMMARY_CATEGORIES], default="")
+    subjects = df['subject'].fillna('No Subject') if 'subject' in df.columns else pd.Series('No Subject', index=df.index)
+    for name in summary:
+        summary[name] = subjects[category == name].tolist()
+    return summary
+
 class EmailService:
     def __init__(self):
         self._init_db()
+        self.embeddings = EmbeddingStore(DB_FILE)
+        self.jobs = IngestQueue(DB_FILE)
+        self._dedupe_index = None
+        self._dedupe_version = None  # data_version() the index was last refreshed at
+        self._dedupe_rowid = 0       # highest emails rowid already looked at
+        # Dashboard snapshot cache, invalidated by the data_changes counters
+        self._version_conn = None
+        self._db_version = None  # PRAGMA data_version the counters were last read at
+        self._scope_versions = {}
+        self._version_lock = threading.Lock()
+        self._sections = {}  # section -> {"token", "revision", "data"}
+        self._section_locks = {name: threading.Lock() for name in SNAPSHOT_SECTIONS}
 
     def _init_db(self):
-        """Creates the database table if it doesn't exist."""
+        """Creates the database tables if they don't exist."""
         conn = self._get_conn()
         conn.execute(CREATE_TABLE_SQL)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(emails)")}
+        for column, col_type in EMAIL_COLUMN_MIGRATIONS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE emails ADD COLUMN {column} {col_type}")
+        for sql in CREATE_INDEXES_SQL:
+            conn.execute(sql)
+        conn.execute(CREATE_TRIAGE_LABELS_SQL)
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_triage_labels_user'").fetchone():
+            conn.execute(DEDUPE_USER_LABELS_SQL)
+            conn.execute(CREATE_USER_LABEL_INDEX_SQL)
+        conn.execute(CREATE_META_SQL)
+
+        # Sender rules: import the old JSON file once, then bucket anything unbucketed
+        has_rules = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sender_rules'").fetchone()
+        conn.execute(CREATE_SENDER_RULES_SQL)
+        if not has_rules:
+            self._import_legacy_rules(conn)
+        self._rebucket(conn, "bucket IS NULL")
+
+        # KPI counters: create them, then count existing mail once
+        has_counters = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'kpi_counters'").fetchone()
+        for sql in CREATE_KPI_SQL:
+            conn.execute(sql)
+        if not has_counters:
+            self._rebuild_kpi_counters(conn)
+
+        # Dashboard change counters
+        for sql in CREATE_CHANGES_SQL:
+            conn.execute(sql)
+        conn.executemany("INSERT OR IGNORE INTO data_changes (scope, version) VALUES (?, 0)", [(s,) for s in CHANGE_SCOPES])
+
+        # Search index: create it, then backfill mail that predates the triggers
+        has_search = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'emails_fts'").fetchone()
+        for sql in CREATE_SEARCH_SQL:
+            conn.execute(sql)
+        if not has_search:
+            conn.execute("INSERT INTO emails_fts(emails_fts) VALUES ('rebuild')")
+
+        # A new RAG chunk layout means every email has to be indexed again
+        row = conn.execute("SELECT value FROM app_meta WHERE key = 'rag_layout'").fetchone()
+        if row is None or row[0] != INDEX_LAYOUT:
+            conn.execute("UPDATE emails SET rag_indexed_at = NULL")
+            conn.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('rag_layout', ?)", (INDEX_LAYOUT,))
         conn.commit()
         conn.close()
 
     def _get_conn(self):
         return _get_conn()
 
+    # --- SENDER RULES + BUCKETS ---
+    def _import_legacy_rules(self, conn):
+        """Copies training_data.json into sender_rules (caller commits)."""
+        try:
+            with open(LEGACY_RULES_JSON, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        rules = {sender.strip(): category for category, senders in data.items()
+                 if category in SENDER_RULE_CATEGORIES for sender in senders if sender.strip()}
+        conn.executemany(
+            "INSERT OR REPLACE INTO sender_rules (sender, category, updated_at) VALUES (?, ?, ?)",
+            [(sender, category, _now_iso()) for sender, category in rules.items()]
+        )
+        conn.executemany("UPDATE emails SET bucket = NULL WHERE TRIM(sender) = ?", [(s,) for s in rules])
+        print(f"📚 Imported {len(rules)} sender rules from {LEGACY_RULES_JSON}.")
+
+    @staticmethod
+    def _sender_rule(conn, sender):
+        row = conn.execute("SELECT category FROM sender_rules WHERE sender = ?", ((sender or "").strip(),)).fetchone()
+        return row[0] if row else None
+
+    def _rebucket(self, conn, where, params=()):
+        """Recomputes the bucket of the matching rows (caller commits). Returns how many changed."""
+        rows = conn.execute(f"""
+            SELECT e.id, e.sender, e.subject, e.tag, e.bucket, r.category
+            FROM emails e LEFT JOIN sender_rules r ON r.sender = TRIM(e.sender)
+            WHERE {where}
+        """, params).fetchall()
+        changes = [(compute_bucket(r[1], r[2], r[3], r[5]), r[0]) for r in rows]
+        changes = [(bucket, email_id) for (bucket, email_id), row in zip(changes, rows) if bucket != row[4]]
+        conn.executemany("UPDATE emails SET bucket = ? WHERE id = ?", changes)
+        return len(changes)
+
+    @metrics.timed("ecc_query_seconds", query="get_sender_rule")
+    def get_sender_rule(self, sender):
+        conn = self._get_conn()
+        try:
+            return self._sender_rule(conn, sender)
+        finally:
+            conn.close()
+
+    @metrics.timed("ecc_query_seconds", query="get_sender_rules")
+    def get_sender_rules(self):
+        """{category: [senders]}, the shape training_data.json used to have."""
+        conn = self._get_conn()
+        rules = {category: [] for category in BUCKETS}
+        for sender, category in conn.execute("SELECT sender, category FROM sender_rules ORDER BY sender"):
+            rules.setdefault(category, []).append(sender)
+        conn.close()
+        return rules
+
+    def set_sender_rule(self, sender, category):
+        """
+        Saves (or replaces) a sender's rule and re-buckets only that sender's
+        emails. Returns how many emails moved.
+        """
+        key = (sender or "").strip()
+        if not key or category not in SENDER_RULE_CATEGORIES:
+            raise ValueError(f"Invalid sender rule: {sender!r} -> {category!r}")
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO sender_rules (sender, category, updated_at) VALUES (?, ?, ?)",
+                (key, category, _now_iso())
+            )
+            # Every spelling of the sender that the rule applies to, via idx_emails_sender_key
+            moved = self._rebucket(conn, "TRIM(e.sender) = ?", (key,))
+            conn.commit()
+            return moved
+        finally:
+            conn.close()
+
     # --- ⚡ NEW HELPER FOR PARALLEL PROCESSING ---
-    def _process_single_email_task(self, email):
+    def _get_dedupe_index(self):
+        """
+        Fingerprints of stored canonical emails from the last DEDUPE_WINDOW_DAYS,
+        whichever process stored them. Refreshed whenever the database changed:
+        rows added since the last look are indexed, rows that aged out of the
+        window are evicted.
+        """
+        version = self.data_version()
+        if self._dedupe_index is not None and version == self._dedupe_version:
+            return self._dedupe_index
+        if self._dedupe_index is None:
+            self._dedupe_index, self._dedupe_rowid = NearDuplicateIndex(), 0
+
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=DEDUPE_WINDOW_DAYS)).isoformat()
+        conn = self._get_conn()
+        high = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM emails").fetchone()[0]
+        rows = conn.execute(
+            "SELECT id, minhash, received_at FROM emails WHERE rowid > ? AND rowid <= ? AND minhash IS NOT NULL AND duplicate_of IS NULL AND received_at >= ?",
+            (self._dedupe_rowid, high, cutoff)
+        ).fetchall()
+        conn.close()
+        for row in rows:
+            self._dedupe_index.add(row['id'], from_blob(row['minhash']), row['received_at'])
+        self._dedupe_index.evict_before(cutoff)
+        self._dedupe_rowid, self._dedupe_version = high, version
+        return self._dedupe_index
+
+    @metrics.timed("ecc_ingest_stage_seconds", stage="triage")
+    def _triage_batch(self, jobs):
         """
-        Independent task that runs in a thread.
-        Performs AI Analysis and Classification.
-        Returns the structured record or None if error.
+        Embeds the batch once (vectors are stored right away and reused for
+        RAG), then runs the local triage model over it.
+        Returns a list aligned with `jobs`: a prediction for confident ones,
+        None for anything that must escalate to Claude + zero-shot.
         """
+        if not jobs:
+            return []
         try:
-            # 1. AI Analysis
-            ai_data = analyze_email_with_ai(email['sender'], email['subject'], email['body'])
-            
-            # 2. Classification
-            cls_text = f"{email['subject']} {ai_data.get('summary', '')}"
-            cls_result = classify_urgency_and_action(cls_text)
-            
-            # 3. Create Record (Don't save to DB yet, return data first)
-            return {
-                "id": str(uuid.uuid4()),
-                "sender": email['sender'],
-                "subject": email['subject'],
-                "body": email['body'],
-                "tag": cls_result.get('tag', 'Normal'),
-                "action": cls_result.get('action', 'Review'),
-                "type": "Single",
-                "attachment": "Yes" if "attached" in email.get('body', '').lower() else "",
-                "received_at": _now_iso(),
-                "is_new": 1,
-                "message_id": email.get('message_id'),
-                "thread_id": email.get('message_id')
-            }
+            return predict_triage(self.embeddings.ensure(jobs))
         except Exception as e:
-            print(f"⚠️ Error processing '{email['subject']}': {e}")
-            return None
+            print(f"   ⚠️ Triage model unavailable: {e}")
+            return [None] * len(jobs)
 
+    # --- INGEST STAGES (see ingest_queue.py) ---
+    @metrics.timed("ecc_ingest_stage_seconds", stage="analyze")
+    def _analyze_jobs(self, jobs):
+        """
+        fetched -> analyzed. Near-duplicates point at their canonical email,
+        confident triage predictions skip Claude, and everything else is sent
+        to Claude in parallel. Each result is saved the moment it arrives.
+        """
+        index = self._get_dedupe_index()
+        # Canonicals from this batch aren't stored yet, so they only live here;
+        # if one is dead-lettered its copies fall back to the orphan path
+        batch_index = NearDuplicateIndex()
+        fresh = []
+        for job in jobs:
+            if job['analysis'] and job['analysis'].get('source') != 'orphan':
+                self.jobs.advance([job['id']], STATUS_ANALYZED)  # saved before a crash, just not advanced
+                continue
+            signature = from_blob(job['minhash']) if job['minhash'] else minhash(job['subject'], job['body'])
+            match = (index.find(signature) or batch_index.find(signature)) if not job['analysis'] else None
+            if match and match[0] != job['id']:
+                self.jobs.update(job['id'], minhash=to_blob(signature), analysis={"source": "duplicate", "canonical_id": match[0]})
+                self.jobs.advance([job['id']], STATUS_ANALYZED)
+                metrics.inc("ecc_llm_skipped_total", reason="duplicate")
+                continue
+            batch_index.add(job['id'], signature)
+            self.jobs.update(job['id'], minhash=to_blob(signature))
+            fresh.append(job)
+
+        escalate = []
+        for job, triage in zip(fresh, self._triage_batch(fresh)):
+            if triage:
+                # ⚡ Fast path: the distilled model is sure, skip both expensive models
+                self.jobs.update(job['id'], analysis={"source": "triage", **triage})
+                self.jobs.advance([job['id']], STATUS_ANALYZED)
+                metrics.inc("ecc_llm_skipped_total", reason="triage")
+            else:
+                escalate.append(job)
+        if len(fresh) - len(escalate):
+            print(f"🧪 Triage model handled {len(fresh) - len(escalate)}/{len(fresh)} emails locally.")
+
+        # ⚡ PARALLEL EXECUTION: 4 workers balances speed vs API Rate Limits
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {executor.submit(analyze_email_with_ai, j['sender'], j['subject'], j['body']): j for j in escalate}
+            for i, future in enumerate(concurrent.futures.as_completed(futures)):
+                job = futures[future]
+                try:
+                    ai_data = future.result()
+                    if ai_data.get('error'):
+                        # Only rate limits / 5xx / network errors are worth another paid call
+                        status = self.jobs.fail(job['id'], f"Claude: {ai_data['error']}", permanent=not ai_data.get('retryable'))
+                        print(f"⚠️ Analysis failed for '{job['subject']}' ({status}): {ai_data['error']}")
+                    else:
+                        self.jobs.update(job['id'], analysis={"source": "claude", **ai_data})
+                        self.jobs.advance([job['id']], STATUS_ANALYZED)
+                except Exception as e:
+                    status = self.jobs.fail(job['id'], e)
+                    print(f"⚠️ Analysis failed for '{job['subject']}' ({status}): {e}")
+                print(f"   ↳ [{i+1}/{len(escalate)}] Analyzed")
+
+    @metrics.timed("ecc_ingest_stage_seconds", stage="classify")
+    def _classify_jobs(self, jobs):
+        """
+        analyzed -> classified. Turns each analysis into an emails row
+        (zero-shot classification runs as one batch). Idempotent: a job whose
+        row already exists is just advanced. Returns how many rows were added.
+        """
+        originals = [j for j in jobs if j['analysis'].get('source') != 'duplicate']
+        needs_model = [j for j in originals if j['analysis'].get('source') != 'triage']
+        classified = {}
+        if needs_model:
+            try:
+                results = classify_urgency_and_action([f"{j['subject']} {j['analysis'].get('summary', '')}" for j in needs_model])
+                classified = {j['id']: r for j, r in zip(needs_model, results)}
+            except Exception as e:
+                for job in needs_model:
+                    self.jobs.fail(job['id'], f"classifier: {e}")
+                originals = [j for j in originals if j not in needs_model]
+        added = sum(self._store_job(job, classified.get(job['id'])) for job in originals)
+
+        # Duplicates go last, so a canonical email from this same batch is already stored
+        for job in jobs:
+            if job['analysis'].get('source') != 'duplicate':
+                continue
+            canonical_id = job['analysis']['canonical_id']
+            job['canonical'] = next(iter(self._get_emails_by_ids([canonical_id])), None)
+            if job['canonical']:
+                added += self._store_job(job)
+            elif self.jobs.status_of(canonical_id) not in (None, STATUS_DEAD):
+                self.jobs.fail(job['id'], "waiting for canonical email", count_attempt=False)
+            else:
+                # Canonical was dead-lettered: this copy needs its own analysis
+                self.jobs.update(job['id'], analysis={"source": "orphan"})
+                self.jobs.advance([job['id']], STATUS_FETCHED)
+        return added
+
+    @metrics.timed("ecc_store_email_seconds")
+    def _store_job(self, job, cls_result=None):
+        """Writes one job's emails row (unless a previous run already did) and advances it. Returns 1 if added."""
+        try:
+            added = 0
+            if not self._get_emails_by_ids([job['id']]):
+                self.add_email_record(self._job_to_record(job, cls_result))
+                added = 1
+            self.jobs.advance([job['id']], STATUS_CLASSIFIED)
+            return added
+        except Exception as e:
+            status = self.jobs.fail(job['id'], e)
+            print(f"⚠️ Error processing '{job['subject']}' ({status}): {e}")
+            return 0
+
+    def _job_to_record(self, job, cls_result=None):
+        analysis = job['analysis']
+        ai_tag, ai_action, duplicate_of = None, None, None
+        if analysis.get('source') == 'triage':
+            tag, action = analysis['tag'], analysis['action']
+            label_source = f"triage:v{analysis['version']}"
+        elif analysis.get('source') == 'duplicate':
+            canonical = job['canonical']
+            tag, action, duplicate_of = canonical['tag'], canonical['action'], canonical['id']
+            label_source = "duplicate"
+        else:
+            if analysis.get('source') == 'claude':
+                ai_tag, ai_action = analysis.get('tag'), analysis.get('action')
+            tag, action = cls_result.get('tag', 'Normal'), cls_result.get('action', 'Review')
+            label_source = "zero-shot"
+
+        return {
+            "id": job['id'],
+            "sender": job['sender'],
+            "subject": job['subject'],
+            "body": job['body'],
+            "tag": tag,
+            "action": action,
+            "type": "Single",
+            "attachment": "Yes" if "attached" in (job.get('body') or '').lower() else "",
+            "received_at": job.get('received_at') or job['fetched_at'],
+            "is_new": 1,
+            "message_id": job.get('message_id'),
+            "thread_id": job.get('message_id'),
+            "ai_tag": ai_tag,
+            "ai_action": ai_action,
+            "label_source": label_source,
+            "minhash": job['minhash'],
+            "duplicate_of": duplicate_of,
+        }
+
+    def _finish_indexed_jobs(self):
+        """classified -> indexed, for jobs whose email made it into the RAG index (duplicates never do)."""
+        conn = self._get_conn()
+        ids = [row[0] for row in conn.execute("""
+            SELECT j.id FROM ingest_jobs j JOIN emails e ON e.id = j.id
+            WHERE j.status = ? AND (e.rag_indexed_at IS NOT NULL OR e.duplicate_of IS NOT NULL)
+        """, (STATUS_CLASSIFIED,))]
+        conn.close()
+        self.jobs.advance(ids, STATUS_INDEXED)
+
+    def process_ingest_queue(self, batch_size=64):
+        """
+        Drives every due job as far as it can go: analyze a batch, classify
+        what is ready, index, repeat. Safe to call at any time (e.g. after a
+        restart); completed stages are never redone. Returns rows added.
+        """
+        added = 0
+        while True:
+            analyzing = self.jobs.claim(STATUS_FETCHED, batch_size)
+            if analyzing:
+                print(f"🚀 Analyzing {len(analyzing)} emails...")
+                self._analyze_jobs(analyzing)
+            classifying = self.jobs.claim(STATUS_ANALYZED, batch_size)
+            if classifying:
+                added += self._classify_jobs(classifying)
+            if not analyzing and not classifying:
+                break
+
+            # Update Vector Database (Memory) as we go, so new mail is searchable early
+            try:
+                self.index_pending_emails()
+                self._finish_indexed_jobs()
+            except Exception as e:
+                print(f"   ⚠️ Memory Update Failed: {e}")
+
+        try:
+            self.index_pending_emails()
+            self._finish_indexed_jobs()
+        except Exception as e:
+            print(f"   ⚠️ Memory Update Failed: {e}")
+        return added
+
+    @metrics.timed("ecc_sync_seconds")
     def sync_with_gmail(self, username, password, limit=None):
         """
         Main function to Sync.
         limit=None means fetch ALL unread emails.
+        Fetched emails are queued before any AI runs, so an interrupted sync
+        resumes from the queue next time.
         """
         limit_text = "ALL" if limit is None else str(limit)
         print(f"\n🔵 CONNECTING: Fetching {limit_text} unread emails from Gmail...")
@@ -102,60 +748,54 @@ class EmailService:
         # 1. Fetch from Gmail (Sequential I/O - Cannot be parallelized easily)
         raw_emails = fetch_emails(username, password, limit=limit)
         
+        fetch_error = None
         if isinstance(raw_emails, dict) and "error" in raw_emails:
-            print(f"❌ Error fetching emails: {raw_emails['error']}")
-            return raw_emails['error']
-
-        if not raw_emails:
-            print("✅ No new unread emails found.")
-            return "No new emails."
+            fetch_error = raw_emails['error']
+            print(f"❌ Error fetching emails: {fetch_error}")
+            raw_emails = []
 
-        print(f"📥 Found {len(raw_emails)} candidate emails. Filtering...")
+        # 2. Persist as jobs BEFORE AI (already-synced message ids are skipped)
+        new_jobs = self.jobs.enqueue(raw_emails)
+        if raw_emails:
+            print(f"📥 Found {len(raw_emails)} candidate emails, {len(new_jobs)} new.")
 
-        # 2. Filter duplicates BEFORE AI (Saves Time & Money)
-        emails_to_process = []
-        for email in raw_emails:
-            if not self.email_exists(email['message_id']):
-                emails_to_process.append(email)
-            else:
-                pass # Skipping silently
-
-        if not emails_to_process:
-            print("✅ All emails are already synced.")
+        # 3. Analyze -> classify -> index everything due, including leftovers from earlier runs
+        added = self.process_ingest_queue()
+        if new_jobs and not added:
+            return self._sync_failure_report(new_jobs, fetch_error)
+        if fetch_error and not added:
+            return fetch_error
+        if not added:
+            print("✅ No new emails.")
             return "No new emails."
 
-        print(f"🚀 Processing {len(emails_to_process)} new emails in PARALLEL...")
-        
-        new_records = []
-        
-        # 3. ⚡ PARALLEL EXECUTION (The Speed Boost)
-        # Using 4 workers balances speed vs API Rate Limits
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            # Submit all tasks
-            future_to_email = {executor.submit(self._process_single_email_task, email): email for email in emails_to_process}
-            
-            for i, future in enumerate(concurrent.futures.as_completed(future_to_email)):
-                result = future.result()
-                if result:
-                    new_records.append(result)
-                print(f"   ↳ [{i+1}/{len(emails_to_process)}] Processed")
-
-        # 4. Sequential Write to DB (Safety for SQLite)
-        print(f"💾 Saving {len(new_records)} records to database...")
-        for record in new_records:
-            self.add_email_record(record)
-            
-        # 5. Update Vector Database (Memory)
-        if new_records:
-            print(f"🧠 Updating AI Memory (RAG)...")
-            try:
-                index_emails_to_vector_db(new_records)
-            except Exception as e:
-                print(f"   ⚠️ Memory Update Failed: {e}")
+        # 4. Learn from the fresh Claude labels (non-blocking)
+        self.retrain_triage_model()
+
+        dead = self.jobs.counts()[STATUS_DEAD]
+        print(f"\n🎉 Sync Complete! Added {added} new emails.\n")
+        return f"Synced {added} emails." + (f" {dead} failed permanently." if dead else "")
 
-        print(f"\n🎉 Sync Complete! Added {len(new_records)} new emails.\n")
-        return f"Synced {len(new_records)} emails."
+    def _sync_failure_report(self, new_jobs, fetch_error=None):
+        """Result line for a sync that queued mail but stored none of it."""
+        counts, retrying, errors = self.jobs.outcomes(job['id'] for job in new_jobs)
+        parts = []
+        if counts.get(STATUS_DEAD):
+            parts.append(f"{counts[STATUS_DEAD]} failed permanently")
+        if retrying:
+            parts.append(f"{retrying} failed and will be retried")
+        pending = len(new_jobs) - counts.get(STATUS_DEAD, 0) - retrying
+        if pending > 0:
+            parts.append(f"{pending} still queued")
+        report = f"Fetched {len(new_jobs)} new emails, none added: " + ", ".join(parts) + "."
+        if errors:
+            report += f" Last error: {errors[0]}"
+        if fetch_error:
+            report += f" Fetch error: {fetch_error}"
+        print(f"⚠️ {report}")
+        return report
 
+    @metrics.timed("ecc_query_seconds", query="email_exists")
     def email_exists(self, msg_id):
         if not msg_id: return False
         conn = self._get_conn()
@@ -167,26 +807,179 @@ class EmailService:
 
     def add_email_record(self, record):
         conn = self._get_conn()
+        bucket = compute_bucket(record['sender'], record['subject'], record.get('tag'), self._sender_rule(conn, record['sender']))
         conn.execute("""
-            INSERT INTO emails (id, sender, subject, body, tag, action, type, attachment, received_at, is_new, message_id, thread_id)
-            VALUES (:id, :sender, :subject, :body, :tag, :action, :type, :attachment, :received_at, :is_new, :message_id, :thread_id)
-        """, record)
+            INSERT INTO emails (id, sender, subject, body, tag, action, type, attachment, received_at, is_new, message_id, thread_id, ai_tag, ai_action, label_source, minhash, duplicate_of, bucket)
+            VALUES (:id, :sender, :subject, :body, :tag, :action, :type, :attachment, :received_at, :is_new, :message_id, :thread_id, :ai_tag, :ai_action, :label_source, :minhash, :duplicate_of, :bucket)
+        """, {"ai_tag": None, "ai_action": None, "label_source": None, "minhash": None, "duplicate_of": None, **record, "bucket": bucket})
+        if record.get("ai_tag"):
+            conn.execute(
+                "INSERT INTO triage_labels (email_id, tag, action, source, weight, created_at) VALUES (?, ?, ?, 'claude', 1.0, ?)",
+                (record["id"], record["ai_tag"], record.get("ai_action"), _now_iso())
+            )
+        conn.commit()
+        conn.close()
+
+    # --- TRIAGE MODEL TRAINING ---
+    def record_sender_feedback(self, sender, category):
+        """
+        Turns a "Train" click into labelled examples: every stored email from
+        that sender gets the chosen tag (weighted above Claude's labels).
+        Clicking again replaces those labels (with a fresh seq, so the next
+        retrain sees them) rather than adding more. Only the labels are written
+        here; the ingest daemon retrains (update_triage_model), so the dashboard
+        never has to load the embedding model.
+        """
+        tag = FEEDBACK_TAGS.get(category)
+        if not tag or not sender:
+            return
+        conn = self._get_conn()
+        conn.execute("""
+            INSERT OR REPLACE INTO triage_labels (email_id, tag, action, source, weight, created_at)
+            SELECT id, ?, NULL, 'user', ?, ? FROM emails WHERE sender = ?
+        """, (tag, USER_LABEL_WEIGHT, _now_iso(), sender))
+        conn.commit()
+        conn.close()
+
+    def _fetch_triage_labels(self, limit):
+        conn = self._get_conn()
+        rows = conn.execute("""
+            SELECT l.seq, l.tag, l.action, l.weight, e.id, e.sender, e.subject, e.body
+            FROM triage_labels l JOIN emails e ON e.id = l.email_id
+            ORDER BY l.seq DESC LIMIT ?
+        """, (limit,)).fetchall()
+        conn.close()
+        return [dict(r) for r in rows]
+
+    def retrain_triage_model(self):
+        """Kicks off a triage retrain in the background (no-op if one is running)."""
+        return retrain_in_background(self._fetch_triage_labels, self.embeddings.ensure)
+
+    def update_triage_model(self):
+        """
+        Ingest-daemon upkeep: retrains when labels arrived (e.g. "Train" clicks)
+        since the served model was trained. Returns True if a retrain started.
+        """
+        conn = self._get_conn()
+        latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM triage_labels").fetchone()[0]
+        conn.close()
+        model = get_triage_model()
+        if latest <= (model.trained_seq if model else 0):
+            return False
+        return self.retrain_triage_model()
+
+    # --- EMBEDDING MAINTENANCE ---
+    def _get_emails_by_ids(self, ids):
+        conn = self._get_conn()
+        placeholders = ",".join("?" * len(ids))
+        rows = [dict(r) for r in conn.execute(f"SELECT * FROM emails WHERE id IN ({placeholders})", ids)]
+        conn.close()
+        return rows
+
+    def backfill_embeddings(self, batch_size=256):
+        """Computes vectors for stored emails that don't have one yet. Returns how many were added."""
+        added = 0
+        while True:
+            ids = self.embeddings.missing_ids(limit=batch_size)
+            if not ids:
+                return added
+            self.embeddings.ensure(self._get_emails_by_ids(ids))
+            added += len(ids)
+
+    def _mark_rag_indexed(self, ids):
+        conn = self._get_conn()
+        conn.executemany("UPDATE emails SET rag_indexed_at = ? WHERE id = ?", [(_now_iso(), i) for i in ids])
+        conn.commit()
+        conn.close()
+
+    @metrics.timed("ecc_ingest_stage_seconds", stage="index")
+    def index_pending_emails(self, batch_size=256):
+        """
+        Pushes every canonical email not yet in the vector index, oldest first.
+        Progress is committed per chunk, so an interrupted run picks up where it
+        stopped. Stored email and chunk vectors are reused; only what's missing is encoded.
+        """
+        indexed = 0
+        while True:
+            conn = self._get_conn()
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM emails WHERE rag_indexed_at IS NULL AND duplicate_of IS NULL ORDER BY received_at LIMIT ?",
+                (batch_size,)
+            )]
+            conn.close()
+            if not ids:
+                return indexed
+
+            records = self._get_emails_by_ids(ids)
+            for record, vector in zip(records, self.embeddings.ensure(records)):
+                record['embedding'] = vector
+            indexed += index_emails_to_vector_db(records, on_indexed=self._mark_rag_indexed, chunk_store=self.embeddings)
+
+    def reindex_vector_db(self, batch_size=256):
+        """Rebuilds the RAG index from SQLite (e.g. after the Chroma folder was wiped)."""
+        conn = self._get_conn()
+        conn.execute("UPDATE emails SET rag_indexed_at = NULL")
+        conn.commit()
+        conn.close()
+        return self.index_pending_emails(batch_size=batch_size)
+
+    # --- FULL-TEXT SEARCH ---
+    @staticmethod
+    def _fts_query(text, prefix=True):
+        """
+        Turns user input into a safe FTS5 query: "quoted phrases" are kept,
+        other words are ANDed and (optionally) prefix-matched.
+        """
+        terms = []
+        for phrase, word in re.findall(r'"([^"]+)"|(\w+)', text or ""):
+            if phrase.strip():
+                terms.append('"' + phrase.replace('"', '') + '"')
+            elif word:
+                terms.append(f'"{word}"*' if prefix else f'"{word}"')
+        return " ".join(terms)
+
+    @metrics.timed("ecc_query_seconds", query="search_emails")
+    def search_emails(self, query, limit=20, prefix=True):
+        """
+        Ranked full-text search over subject, sender and body.
+        Highlight markers are \x02 ... \x03 (see app.render_highlight) so the
+        caller can escape the text before turning them into <mark> tags.
+        """
+        match = self._fts_query(query, prefix=prefix)
+        if not match:
+            return []
+        conn = self._get_conn()
+        try:
+            return [dict(r) for r in conn.execute(SEARCH_SQL, (match, limit))]
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ Search failed for {query!r}: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def rebuild_search_index(self):
+        """Re-creates the FTS index from the emails table (e.g. after a VACUUM renumbered rowids)."""
+        conn = self._get_conn()
+        conn.execute("INSERT INTO emails_fts(emails_fts) VALUES ('rebuild')")
         conn.commit()
         conn.close()
 
     # --- GETTERS FOR FRONTEND ---
+    @metrics.timed("ecc_query_seconds", query="get_new_items")
     def get_new_items(self):
         conn = self._get_conn()
-        items = [dict(row) for row in conn.execute("SELECT * FROM emails WHERE is_new = 1 AND tag NOT LIKE '%Urgent%' AND tag NOT LIKE '%Critical%' ORDER BY received_at DESC")]
+        items = [dict(row) for row in conn.execute(GROUPED_EMAILS_SQL + " AND e.is_new = 1 AND e.tag NOT LIKE '%Urgent%' AND e.tag NOT LIKE '%Critical%' ORDER BY e.received_at DESC")]
         conn.close()
         return items
 
+    @metrics.timed("ecc_query_seconds", query="get_urgent_items")
     def get_urgent_items(self):
         conn = self._get_conn()
-        items = [dict(row) for row in conn.execute("SELECT * FROM emails WHERE tag LIKE '%Urgent%' OR tag LIKE '%Critical%' ORDER BY received_at DESC")]
+        items = [dict(row) for row in conn.execute(GROUPED_EMAILS_SQL + " AND (e.tag LIKE '%Urgent%' OR e.tag LIKE '%Critical%') ORDER BY e.received_at DESC")]
         conn.close()
         return items
     
+    @metrics.timed("ecc_query_seconds", query="get_sender_data")
     def get_sender_data(self):
         conn = self._get_conn()
         try:
@@ -196,23 +989,82 @@ class EmailService:
         conn.close()
         return df
 
+    # --- PAGINATED GETTERS ---
+    def _action_items_page(self, conn, cursor, limit, bucket=None):
+        sql = GROUPED_EMAILS_SQL + ACTION_ITEMS_FILTER
+        params = []
+        if bucket:
+            sql += " AND e.bucket = ?"
+            params.append(bucket)
+        if cursor:
+            sql += " AND (e.received_at, e.id) < (?, ?)"
+            params += list(cursor)
+        sql += " ORDER BY e.received_at DESC, e.id DESC LIMIT ?"
+        params.append(limit)
+        items = [dict(r) for r in conn.execute(sql, params)]
+        next_cursor = (items[-1]['received_at'], items[-1]['id']) if len(items) == limit else None
+        return items, next_cursor
+
+    @metrics.timed("ecc_query_seconds", query="get_action_items_page")
+    def get_action_items_page(self, cursor=None, limit=PAGE_SIZE, bucket=None):
+        """
+        Keyset-paginated Action Center stream (new or urgent, newest first),
+        optionally restricted to one bucket.
+        cursor is the (received_at, id) of the last item already shown; returns
+        (items, next_cursor), with next_cursor None on the last page.
+        """
+        conn = self._get_conn()
+        try:
+            return self._action_items_page(conn, cursor, limit, bucket)
+        finally:
+            conn.close()
+
+    # --- KPI COUNTERS ---
+    def _read_kpi_counters(self, conn):
+        counters = {name: 0 for name in KPI_COUNTERS}
+        counters.update(dict(conn.execute("SELECT name, value FROM kpi_counters").fetchall()))
+        counters["new_threads"] = counters["active_threads"]  # key the UI has always read
+        return counters
+
+    def _rebuild_kpi_counters(self, conn):
+        """Recounts everything from the emails table (caller commits)."""
+        conn.execute("DELETE FROM thread_activity")
+        conn.execute("""
+            INSERT INTO thread_activity (thread_id, open_count)
+            SELECT COALESCE(thread_id, id), SUM(COALESCE(is_new = 1, 0)) FROM emails GROUP BY COALESCE(thread_id, id)
+        """)
+        truth = dict(conn.execute(KPI_RECOUNT_SQL).fetchone())
+        conn.executemany("INSERT OR REPLACE INTO kpi_counters (name, value) VALUES (?, ?)", truth.items())
+        return truth
+
+    @metrics.timed("ecc_query_seconds", query="check_kpi_counters")
+    def check_kpi_counters(self, repair=True):
+        """
+        Compares the materialized counters with a full recount.
+        Returns {name: (stored, actual)} for every mismatch; with repair=True
+        the counters are rebuilt when anything drifted.
+        """
+        conn = self._get_conn()
+        try:
+            stored = self._read_kpi_counters(conn)
+            truth = dict(conn.execute(KPI_RECOUNT_SQL).fetchone())
+            mismatches = {k: (stored.get(k), v) for k, v in truth.items() if stored.get(k) != v}
+            if mismatches and repair:
+                self._rebuild_kpi_counters(conn)
+                conn.commit()
+            return mismatches
+        finally:
+            conn.close()
+
+    @metrics.timed("ecc_query_seconds", query="get_kpi_stats")
     def get_kpi_stats(self):
         conn = self._get_conn()
         try:
-            total = conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
-            unread = conn.execute("SELECT COUNT(*) FROM emails WHERE is_new = 1").fetchone()[0]
-            urgent = conn.execute("SELECT COUNT(*) FROM emails WHERE tag LIKE '%Urgent%'").fetchone()[0]
-        except:
-            total, unread, urgent = 0, 0, 0
-            
-        conn.close()
-        return {
-            "total_emails": total,
-            "total_unread": unread,
-            "urgent_count": urgent,
-            "new_threads": 0 
-        }
+            return self._read_kpi_counters(conn)
+        finally:
+            conn.close()
 
+    @metrics.timed("ecc_query_seconds", query="get_action_checklist")
     def get_action_checklist(self):
         conn = self._get_conn()
         cur = conn.cursor()
@@ -226,6 +1078,99 @@ class EmailService:
         conn.close()
         return {"Approvals": approvals, "Responses": responses}
 
+    # --- DASHBOARD SNAPSHOT ---
+    def data_version(self):
+        """
+        Cheap change token for everything the dashboard shows:
+        {scope: version} for each CHANGE_SCOPES entry plus the history CSV mtime.
+        PRAGMA data_version on a long-lived connection changes whenever any
+        other connection (any thread or process) commits, so the counters are
+        only re-read after a commit; a commit that touched neither emails nor
+        sender_rules leaves the token as it was.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+            db_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if db_version != self._db_version:
+                self._scope_versions = dict(self._version_conn.execute("SELECT scope, version FROM data_changes").fetchall())
+                self._db_version = db_version
+            token = dict(self._scope_versions)
+        token["history_csv"] = os.path.getmtime(HISTORY_CSV) if os.path.exists(HISTORY_CSV) else None
+        return token
+
+    def _load_history(self, conn, sql=SNAPSHOT_HISTORY_SQL):
+        if os.path.exists(HISTORY_CSV):
+            df = pd.read_csv(HISTORY_CSV)
+            return df.rename(columns={'Sender': 'sender', 'Subject': 'subject', 'Action': 'action', 'Tag': 'tag'})
+        return pd.read_sql_query(sql, conn)
+
+    def _build_action_section(self, conn):
+        counts = dict(conn.execute(ACTION_BUCKET_COUNTS_SQL).fetchall())
+        action_buckets = {}
+        for bucket in BUCKETS:
+            items, cursor = self._action_items_page(conn, None, PAGE_SIZE, bucket) if counts.get(bucket) else ([], None)
+            action_buckets[bucket] = {"items": items, "cursor": cursor, "count": counts.get(bucket, 0)}
+        return {"action_buckets": action_buckets}
+
+    def _build_checklist_section(self, conn):
+        checklist = {"Approvals": [], "Responses": []}
+        for row in conn.execute(SNAPSHOT_CHECKLIST_SQL):
+            item = {"id": row["id"], "subject": row["subject"], "completed": row["completed"]}
+            action = row["action"] or ""
+            if "Approve" in action: checklist["Approvals"].append(item)
+            if "Reply" in action or "Provide" in action: checklist["Responses"].append(item)
+        return {"checklist": checklist}
+
+    def _build_summary_section(self, conn):
+        return {"action_summary": get_action_summary(self._load_history(conn, SNAPSHOT_SUMMARY_SQL))}
+
+    def _build_history_section(self, conn):
+        history = self._load_history(conn)
+        senders, sender_rows = build_sender_overview(history)
+        return {"history": history, "senders": senders, "sender_rows": sender_rows,
+                "newsletters": get_dynamic_newsletters(history)}
+
+    def get_snapshot_section(self, name, token=None):
+        """
+        One SNAPSHOT_SECTIONS entry, cached in process and rebuilt only when its
+        change scope (or the history CSV) moved, so a fragment refresh pays for
+        its own section and nothing else. Returns the section's keys plus
+        "revision", a counter that only moves when the compared keys changed.
+        Treat the returned structures (including the DataFrame) as read-only.
+        """
+        scope, compared = SNAPSHOT_SECTIONS[name]
+        token = token or self.data_version()
+        key = (token[scope], token["history_csv"])
+        with self._section_locks[name]:
+            cached = self._sections.get(name)
+            if cached is None or cached["token"] != key:
+                conn = self._get_conn()
+                try:
+                    with metrics.timer("ecc_snapshot_build_seconds", section=name):
+                        data = getattr(self, f"_build_{name}_section")(conn)
+                finally:
+                    conn.close()
+                changed = cached is None or any(data[k] != cached["data"][k] for k in compared)
+                revision = (cached["revision"] if cached else 0) + (1 if changed else 0)
+                cached = self._sections[name] = {"token": key, "revision": revision, "data": data}
+            return {**cached["data"], "revision": cached["revision"]}
+
+    @metrics.timed("ecc_query_seconds", query="get_dashboard_snapshot")
+    def get_dashboard_snapshot(self):
+        """
+        Everything one full dashboard render needs: the O(1) KPI counters plus
+        every SNAPSHOT_SECTIONS entry (see get_snapshot_section), with
+        snapshot["revisions"] holding each section's revision.
+        """
+        token = self.data_version()
+        snapshot = {"kpis": self.get_kpi_stats(), "revisions": {}, "version": token}
+        for name in SNAPSHOT_SECTIONS:
+            section = self.get_snapshot_section(name, token)
+            snapshot["revisions"][name] = section.pop("revision")
+            snapshot.update(section)
+        return snapshot
+
     def mark_action_completed(self, item_id):
         conn = self._get_conn()
         conn.execute("UPDATE emails SET completed = 1 WHERE id = ?", (item_id,))
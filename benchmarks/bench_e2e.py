@@ -0,0 +1,370 @@
+"""
+Benchmark: offline end-to-end Gmail sync and dashboard query latency.
+
+Serves a synthetic mailbox from a local IMAP stand-in (fake_imap.py), answers
+every Claude call from a mock Messages API (mock_anthropic.py), runs
+EmailService.sync_with_gmail against them in a scratch directory, then times
+the dashboard getters. No Gmail account or API key needed.
+
+    python benchmarks/bench_e2e.py --size 1000
+    python benchmarks/bench_e2e.py --size 100000 --llm-latency-ms 800 --llm-429-rate 0.05
+    python benchmarks/bench_e2e.py --size 1000 --compare benchmarks/results/baseline.json
+
+Results (config, environment, sync throughput, per-stage timings, peak RSS,
+query latencies) are written to benchmarks/results/<timestamp>.json. With
+--compare, throughput, stage timings and p50 latencies are checked against a
+previous result and the script exits with status 1 if any got worse by more
+than --max-regression.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.request
+import multiprocessing
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import fake_imap
+import mock_anthropic
+from synthetic_mailbox import SyntheticMailbox, DEFAULT_MIME_MIX, parse_mime_mix
+
+SEARCH_TERMS = ["budget", "contract", "outage", "digest", "salary", "offsite", "proposal", "hiring"]
+CHAT_QUESTIONS = ["What did the CFO say about the budget?", "Any contracts waiting for a signature?"]
+
+
+# =================================================
+# SERVERS (separate processes, so they don't share our GIL)
+# =================================================
+def start_server(target, options):
+    ctx = multiprocessing.get_context("spawn")
+    port_queue = ctx.Queue()
+    process = ctx.Process(target=target, args=(options, port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
+
+
+def mock_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+# =================================================
+# LIGHTWEIGHT LOCAL MODELS (--stub-local-models)
+# =================================================
+# For measuring the pipeline around the models: a hashing embedder and a
+# keyword classifier replace sentence-transformers and the zero-shot pipeline.
+class HashingEmbedder:
+    dim = 384
+
+    def encode(self, texts, batch_size=None, **_):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in str(text).lower().split():
+                vectors[row, int(hashlib.md5(token.encode()).hexdigest()[:8], 16) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+
+def keyword_classifier(inputs):
+    def one(text):
+        lowered = text.lower()
+        urgency = "Urgent" if any(k in lowered for k in ("urgent", "outage", "deadline")) else "Normal"
+        action = "Approve" if "approv" in lowered or "sign" in lowered else "Review"
+        return {"urgency": urgency, "tag": "Urgent ❗" if urgency == "Urgent" else urgency, "action": action}
+    return one(inputs) if isinstance(inputs, str) else [one(t) for t in inputs]
+
+
+# =================================================
+# MEASUREMENT HELPERS
+# =================================================
+class StageTimer:
+    """Wraps functions in place and accumulates wall time per stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def wrap(self, owner, attribute, stage):
+        original = getattr(owner, attribute)
+        timings = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                timings["seconds"] += time.perf_counter() - start
+                timings["calls"] += 1
+
+        setattr(owner, attribute, timed)
+
+
+def latency_summary(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "p50_ms": round(ms[len(ms) // 2], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def time_calls(fn, repeats, before=None):
+    samples = []
+    for i in range(repeats):
+        if before:
+            before(i)
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# =================================================
+# RUN
+# =================================================
+def run(args):
+    mailbox = SyntheticMailbox(args.size, seed=args.seed, mime_mix=args.mime_mix, attachment_kb=tuple(args.attachment_kb),
+                               thread_depth=args.thread_depth, duplicate_rate=args.duplicate_rate)
+    llm_options = {"latency_ms": args.llm_latency_ms, "jitter_ms": args.llm_jitter_ms,
+                   "rate_429": args.llm_429_rate, "seed": args.seed}
+    imap_process, imap_port = start_server(fake_imap.serve, mailbox.config())
+    llm_process, llm_port = start_server(mock_anthropic.serve, llm_options)
+    print(f"📬 Synthetic IMAP on :{imap_port} ({args.size:,} messages), 🤖 mock Claude on :{llm_port}")
+
+    # Everything below must see these before the app modules are imported
+    os.environ.update({
+        "IMAP_HOST": "127.0.0.1", "IMAP_PORT": str(imap_port), "IMAP_SSL": "0",
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{llm_port}", "ANTHROPIC_API_KEY": "bench-offline",
+    })
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ecc-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # emails.db, the vector index and triage models all use relative paths
+
+    # A SEARCH reply listing every unseen id of a large mailbox is one long line
+    import imaplib
+    imaplib._MAXLINE = max(imaplib._MAXLINE, 8 * args.size + 1024)
+
+    import metrics
+    import backend
+    import rag_engine
+    import triage_model
+    from ingest_queue import IngestQueue
+
+    if args.stub_local_models:
+        rag_engine._embedder = HashingEmbedder()
+        backend.classify_urgency_and_action = keyword_classifier
+
+    timer = StageTimer()
+    timer.wrap(backend, "fetch_emails", "imap_fetch")
+    timer.wrap(IngestQueue, "enqueue", "enqueue")
+    timer.wrap(backend.EmailService, "_analyze_jobs", "analyze")
+    timer.wrap(backend.EmailService, "_classify_jobs", "classify_store")
+    timer.wrap(backend.EmailService, "index_pending_emails", "index")
+
+    service = backend.EmailService()
+    start = time.perf_counter()
+    result = service.sync_with_gmail("bench@synthetic.example", "bench", limit=args.limit)
+    sync_seconds = time.perf_counter() - start
+
+    # The triage retrain runs in a background thread; wait so it doesn't skew query timings
+    start = time.perf_counter()
+    triage_model._train_lock.acquire()
+    triage_model._train_lock.release()
+    retrain_wait = time.perf_counter() - start
+
+    start = time.perf_counter()
+    resync_result = service.sync_with_gmail("bench@synthetic.example", "bench", limit=args.limit)
+    resync_seconds = time.perf_counter() - start
+
+    conn = service._get_conn()
+    stored = conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+    item_ids = [r[0] for r in conn.execute("SELECT id FROM emails ORDER BY received_at DESC LIMIT 50")]
+    conn.close()
+    print(f"⏱️ Sync: {result!r} in {sync_seconds:.1f}s ({stored / sync_seconds:.1f} emails/s)")
+
+    # --- Dashboard queries ---
+    n = args.query_repeats
+    queries = {}
+    start = time.perf_counter()
+    snapshot = service.get_dashboard_snapshot()
+    queries["dashboard_snapshot_cold"] = latency_summary([time.perf_counter() - start])
+    queries["dashboard_snapshot_warm"] = time_calls(lambda i: service.get_dashboard_snapshot(), n)
+    if item_ids:
+        toggle = lambda i: (service.mark_action_completed if i % 2 == 0 else service.mark_action_uncompleted)(item_ids[0])
+        queries["dashboard_snapshot_rebuild"] = time_calls(lambda i: service.get_dashboard_snapshot(), n, before=toggle)
+        queries["action_section_rebuild"] = time_calls(lambda i: service.get_snapshot_section("action"), n, before=toggle)
+    for bucket, page in snapshot["action_buckets"].items():
+        queries[f"action_page_{bucket}"] = time_calls(lambda i: service.get_action_items_page(bucket=bucket), n)
+        if page["cursor"]:
+            queries[f"action_page_{bucket}_next"] = time_calls(
+                lambda i: service.get_action_items_page(cursor=page["cursor"], bucket=bucket), n)
+    queries["search_emails"] = time_calls(lambda i: service.search_emails(SEARCH_TERMS[i % len(SEARCH_TERMS)]), n)
+    queries["get_kpi_stats"] = time_calls(lambda i: service.get_kpi_stats(), n)
+    queries["get_new_items"] = time_calls(lambda i: service.get_new_items(), n)
+    queries["get_urgent_items"] = time_calls(lambda i: service.get_urgent_items(), n)
+    queries["get_sender_data"] = time_calls(lambda i: service.get_sender_data(), n)
+    queries["get_action_checklist"] = time_calls(lambda i: service.get_action_checklist(), n)
+    if args.chat_repeats:
+        queries["chat_with_inbox"] = time_calls(
+            lambda i: rag_engine.chat_with_inbox(CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]), args.chat_repeats)
+
+    llm = mock_stats(llm_port)
+    imap_process.terminate()
+    llm_process.terminate()
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "mailbox": mailbox.config(), "llm": llm_options, "limit": args.limit,
+            "query_repeats": n, "chat_repeats": args.chat_repeats,
+            "local_models": "stub" if args.stub_local_models else "real",
+            "vector_backend": rag_engine.VECTOR_BACKEND,
+        },
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "git_revision": git_revision(), "workdir": workdir,
+        },
+        "sync": {
+            "result": result, "seconds": round(sync_seconds, 3), "emails_stored": stored,
+            "emails_per_sec": round(stored / sync_seconds, 2) if sync_seconds else None,
+            "resync_seconds": round(resync_seconds, 3), "resync_result": resync_result,
+            "retrain_wait_seconds": round(retrain_wait, 3),
+            "queue": service.jobs.counts(),
+        },
+        "stages": {name: {"seconds": round(t["seconds"], 3), "calls": t["calls"]} for name, t in timer.stages.items()},
+        "llm": llm,
+        "peak_rss_mb": peak_rss_mb(),
+        "queries": queries,
+        "chat_cache": rag_engine.get_chat_cache_stats() if args.chat_repeats else None,
+        "metrics": metrics.snapshot(recent=False),
+    }
+
+
+# =================================================
+# COMPARISON
+# =================================================
+def flatten_metrics(result):
+    """
+    {metric: (value, higher_is_better, noise_floor)} for everything worth
+    tracking across runs. A noise_floor of None means reported, never gated:
+    a p95 over a few dozen samples is mostly one unlucky scheduler tick.
+    """
+    metrics = {"sync.emails_per_sec": (result["sync"]["emails_per_sec"], True, 0),
+               "sync.seconds": (result["sync"]["seconds"], False, 0.05),
+               "peak_rss_mb": (result.get("peak_rss_mb"), False, 1)}
+    for name, stage in result["stages"].items():
+        metrics[f"stage.{name}.seconds"] = (stage["seconds"], False, 0.05)
+    for name, query in result["queries"].items():
+        # Sub-millisecond swings are scheduler noise, not regressions
+        metrics[f"query.{name}.p50_ms"] = (query["p50_ms"], False, 1.0)
+        metrics[f"query.{name}.p95_ms"] = (query["p95_ms"], False, None)
+    return metrics
+
+
+def compare(baseline, current, max_regression):
+    """Prints a delta table and returns the names of metrics that regressed beyond max_regression."""
+    if baseline.get("config") != current.get("config"):
+        print("⚠️ Baseline was recorded with a different config; deltas may not be meaningful.")
+    old, new = flatten_metrics(baseline), flatten_metrics(current)
+    regressions = []
+    print(f"\n{'metric':<44} | {'baseline':>10} | {'current':>10} | {'change':>8}")
+    print("-" * 82)
+    for name, (value, higher_is_better, noise_floor) in new.items():
+        before = old.get(name, (None,))[0]
+        if value is None or not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better else change
+        flag = ""
+        if noise_floor is not None and worse > max_regression and abs(value - before) > noise_floor:
+            regressions.append(name)
+            flag = " ❌"
+        print(f"{name:<44} | {before:>10.3f} | {value:>10.3f} | {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000, help="messages in the synthetic mailbox (1k - 1M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mime-mix", type=parse_mime_mix, default=dict(DEFAULT_MIME_MIX),
+                        help="weights, e.g. plain=50,html=15,alternative=25,attachment=10")
+    parser.add_argument("--attachment-kb", type=int, nargs=2, default=[4, 256], metavar=("MIN", "MAX"))
+    parser.add_argument("--thread-depth", type=int, default=4, help="messages per conversation")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="share of forwarded duplicates")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-429-rate", type=float, default=0.0)
+    parser.add_argument("--limit", type=int, default=None, help="max emails per sync (default: all)")
+    parser.add_argument("--query-repeats", type=int, default=20)
+    parser.add_argument("--chat-repeats", type=int, default=0, help="also time chat_with_inbox this many times")
+    parser.add_argument("--stub-local-models", action="store_true",
+                        help="hashing embedder + keyword classifier instead of sentence-transformers / zero-shot")
+    parser.add_argument("--workdir", default=None, help="scratch directory for the database (default: a new temp dir)")
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="baseline result JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.20, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Resolve output paths before run() changes the working directory
+    out = os.path.abspath(args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"))
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    result = run(args)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n{'stage':<16} | {'seconds':>9} | {'calls':>6}")
+    print("-" * 38)
+    for name, stage in result["stages"].items():
+        print(f"{name:<16} | {stage['seconds']:>9.3f} | {stage['calls']:>6}")
+    print(f"\n{'query':<34} | {'p50 ms':>9} | {'p95 ms':>9} | {'max ms':>9}")
+    print("-" * 70)
+    for name, query in result["queries"].items():
+        print(f"{name:<34} | {query['p50_ms']:>9.2f} | {query['p95_ms']:>9.2f} | {query['max_ms']:>9.2f}")
+    print(f"\n🧠 Peak RSS: {result['peak_rss_mb']} MB · LLM calls: {result['llm']['requests']} "
+          f"({result['llm']['rate_limited']} throttled)")
+    print(f"💾 Saved {out}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(json.load(f), result, args.max_regression)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.max_regression:.0%}.")
+            sys.exit(1)
+        print("\n✅ No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: Newsletters / Action Summary tab helpers, iterrows vs vectorized.
+
+    python benchmarks/bench_history_views.py                 # 10k, 100k, 1M rows
+    python benchmarks/bench_history_views.py --sizes 10000 --legacy-max 10000
+
+The legacy functions below are the pre-vectorization app.py helpers, kept
+here verbatim so both versions run on the same synthetic history and their
+outputs can be compared.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import get_dynamic_newsletters, get_action_summary
+
+
+# =================================================
+# LEGACY (iterrows) IMPLEMENTATIONS
+# =================================================
+def legacy_newsletters(df):
+    news_keywords = ['digest', 'newsletter', 'weekly', 'trends', 'market report']
+    news_senders = ['news', 'info', 'update', 'linkedin', 'digest', 'alert', 'netflix']
+    news_items = []
+
+    for idx, row in df.iterrows():
+        subject = str(row.get('Subject', '')).lower()
+        sender = str(row.get('Sender', '')).lower()
+        if 'deadline' in subject or 'urgent' in subject: continue
+
+        is_news = any(k in subject for k in news_keywords) or any(s in sender for s in news_senders)
+        if is_news:
+            news_items.append({
+                "sender": row.get('Sender'),
+                "subject": row.get('Subject'),
+                "action": row.get('Action', 'Read')
+            })
+    return news_items
+
+
+def legacy_action_summary(df):
+    summary = {"Approvals": [], "Responses": [], "Reviews": [], "Strategic": []}
+    for idx, row in df.iterrows():
+        action_text = str(row.get('Action', '')).lower()
+        subject = row.get('Subject', 'No Subject')
+
+        if any(x in action_text for x in ['approve', 'sign', 'authorize']): summary['Approvals'].append(subject)
+        elif any(x in action_text for x in ['reply', 'respond', 'answer']): summary['Responses'].append(subject)
+        elif any(x in action_text for x in ['review', 'read', 'check']): summary['Reviews'].append(subject)
+        elif any(x in str(row.get('Subject', '')).lower() for x in ['strategy', 'plan']): summary['Strategic'].append(subject)
+    return summary
+
+
+# =================================================
+# SYNTHETIC HISTORY
+# =================================================
+SENDERS = ["Elon Musk", "LinkedIn News", "Netflix", "HDFC Alerts", "Ranga Sai", "Product Updates",
+           "Priya Sharma", "Weekly Digest", "CFO Office", "info@vendor.com"]
+SUBJECTS = ["Weekly digest: AI trends", "Q3 budget approval", "Board meeting schedule", "Market report - October",
+            "Urgent: server outage", "Strategy offsite plan", "Your newsletter is here", "Deadline for tax filing",
+            "Lunch on Friday?", "Contract to sign"]
+ACTIONS = ["Approve", "Reply", "Review", "Read", "No Action", "Sign contract", "Check numbers", "Provide Info"]
+
+
+def make_history(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "sender": np.array(SENDERS, dtype=object)[rng.integers(0, len(SENDERS), rows)],
+        "subject": [f"{s} #{i}" for i, s in enumerate(np.array(SUBJECTS, dtype=object)[rng.integers(0, len(SUBJECTS), rows)])],
+        "action": np.array(ACTIONS, dtype=object)[rng.integers(0, len(ACTIONS), rows)],
+    })
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000,
+                        help="skip the iterrows versions above this many rows (they take minutes at 1M)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'view':<11} | {'iterrows':>10} | {'vectorized':>10} | {'speedup':>8}")
+    print("-" * 62)
+    for rows in args.sizes:
+        df = make_history(rows)
+        legacy_df = df.rename(columns={'sender': 'Sender', 'subject': 'Subject', 'action': 'Action'})
+        cases = [
+            ("newsletters", legacy_newsletters, get_dynamic_newsletters),
+            ("summary", legacy_action_summary, get_action_summary),
+        ]
+        for name, legacy_fn, fast_fn in cases:
+            fast, fast_s = timed(fast_fn, df)
+            if rows <= args.legacy_max:
+                slow, slow_s = timed(legacy_fn, legacy_df)
+                if slow != fast:
+                    raise SystemExit(f"❌ {name}: vectorized result differs from iterrows at {rows} rows")
+                print(f"{rows:>10,} | {name:<11} | {slow_s:>9.3f}s | {fast_s:>9.3f}s | {slow_s / fast_s:>7.1f}x")
+            else:
+                print(f"{rows:>10,} | {name:<11} | {'skipped':>10} | {fast_s:>9.3f}s | {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
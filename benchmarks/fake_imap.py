@@ -0,0 +1,103 @@
+"""
+Minimal plain-TCP IMAP stand-in that serves a SyntheticMailbox.
+
+Implements just what imap_module uses: LOGIN, SELECT, SEARCH (every unseen
+message, criteria ignored), FETCH (RFC822), IDLE, CLOSE, LOGOUT. Fetching a
+message marks it seen, like Gmail, so a second sync finds nothing new.
+
+    python benchmarks/fake_imap.py --size 1000 --port 1143
+    IMAP_HOST=127.0.0.1 IMAP_PORT=1143 IMAP_SSL=0 python ingest_daemon.py --once
+"""
+import os
+import sys
+import argparse
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_mailbox import SyntheticMailbox
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True  # otherwise delayed ACKs add ~40ms to every FETCH
+
+    def _send(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        self._send("* OK [CAPABILITY IMAP4rev1 IDLE] synthetic IMAP ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            parts = raw.decode(errors="replace").strip().split(" ", 2)
+            if len(parts) < 2:
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+
+            if command == "CAPABILITY":
+                self._send("* CAPABILITY IMAP4rev1 IDLE")
+            elif command == "SELECT":
+                self._send(f"* {len(server.mailbox)} EXISTS")
+                self._send("* FLAGS (\\Seen)")
+                self._send(f"{tag} OK [READ-WRITE] SELECT completed")
+                continue
+            elif command == "SEARCH":
+                with server.lock:
+                    unseen = [str(i) for i in range(1, len(server.mailbox) + 1) if i not in server.seen]
+                self._send("* SEARCH " + " ".join(unseen))
+            elif command == "FETCH":
+                for seq in args.split(" ", 1)[0].split(","):
+                    index = int(seq)
+                    data = server.mailbox.message(index)
+                    self.wfile.write(f"* {index} FETCH (RFC822 {{{len(data)}}}\r\n".encode() + data + b")\r\n")
+                    with server.lock:
+                        server.seen.add(index)
+            elif command == "IDLE":
+                self._send("+ idling")
+                while (line := self.rfile.readline()) and line.strip().upper() != b"DONE":
+                    pass
+            elif command == "LOGOUT":
+                self._send("* BYE logging out")
+                self._send(f"{tag} OK LOGOUT completed")
+                return
+            elif command not in ("LOGIN", "CLOSE", "NOOP"):
+                self._send(f"{tag} BAD unsupported command {command}")
+                continue
+            self._send(f"{tag} OK {command} completed")
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.mailbox = mailbox
+        self.seen = set()
+        self.lock = threading.Lock()
+
+
+def serve(mailbox_config, port_queue, host="127.0.0.1", port=0):
+    """Subprocess entry point: builds the mailbox, reports the bound port, serves forever."""
+    server = FakeIMAPServer(SyntheticMailbox(**mailbox_config), host, port)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1143)
+    args = parser.parse_args()
+    server = FakeIMAPServer(SyntheticMailbox(args.size, seed=args.seed), args.host, args.port)
+    print(f"📬 Serving {args.size:,} synthetic messages on {args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
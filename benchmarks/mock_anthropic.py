@@ -0,0 +1,132 @@
+"""
+Mock Anthropic Messages API for offline benchmarks.
+
+Answers POST /v1/messages in the real response shape (content + usage) after
+a configurable latency, and returns 429s at a configurable rate so the SDK's
+retry path is exercised. Prompts asking for JSON get a plausible analysis,
+everything else gets a short text. GET /stats returns request counters.
+
+    python benchmarks/mock_anthropic.py --port 8089 --latency-ms 300 --rate-429 0.05
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8089 ANTHROPIC_API_KEY=bench streamlit run app.py
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+TAGS = [("urgent", "Urgent ❗"), ("outage", "Urgent ❗"), ("deadline", "Urgent ❗"),
+        ("salary", "Confidential 🕵️"), ("password", "Confidential 🕵️"), ("hdfc", "Confidential 🕵️")]
+ACTIONS = ["Approve", "Reply", "Review"]
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _analysis(prompt):
+    lowered = prompt.lower()
+    tag = next((label for keyword, label in TAGS if keyword in lowered), "Normal")
+    digest = int(hashlib.md5(prompt.encode()).hexdigest(), 16)
+    subject = next((line[len("Subject:"):].strip() for line in prompt.splitlines() if line.startswith("Subject:")), "")
+    return json.dumps({
+        "summary": f"Synthetic summary of '{subject}'.",
+        "tag": tag, "action": ACTIONS[digest % len(ACTIONS)],
+        "type": "Thread" if subject.startswith("Re:") else "Single",
+        "priority": 1 + digest % 5, "confidence": 1 + (digest >> 8) % 5,
+    })
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *_):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.lock:
+                return self._json(200, dict(self.server.stats))
+        self._json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        if not self.path.startswith("/v1/messages"):
+            return self._json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+        with server.lock:
+            server.stats["requests"] += 1
+            throttled = server.rng.random() < server.rate_429
+            delay = max(0.0, server.latency + server.rng.uniform(-server.jitter, server.jitter))
+            if throttled:
+                server.stats["rate_limited"] += 1
+        if throttled:
+            return self._json(429, {"type": "error", "error": {"type": "rate_limit_error", "message": "synthetic 429"}},
+                              headers={"retry-after-ms": str(int(server.retry_after * 1000))})
+
+        time.sleep(delay)
+        prompt = "".join(
+            m["content"] if isinstance(m["content"], str) else "".join(b.get("text", "") for b in m["content"])
+            for m in request.get("messages", [])
+        )
+        text = _analysis(prompt) if "Return ONLY valid JSON" in prompt else "Synthetic reply from the mock model."
+        usage = {"input_tokens": _estimate_tokens(prompt), "output_tokens": _estimate_tokens(text)}
+        with server.lock:
+            server.stats["completed"] += 1
+            server.stats["input_tokens"] += usage["input_tokens"]
+            server.stats["output_tokens"] += usage["output_tokens"]
+        self._json(200, {
+            "id": f"msg_bench_{server.stats['requests']}", "type": "message", "role": "assistant",
+            "model": request.get("model", "mock"), "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None, "usage": usage,
+        })
+
+
+class MockAnthropicServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=300, jitter_ms=100, rate_429=0.0, retry_after_ms=200, seed=0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_429 = rate_429
+        self.retry_after = retry_after_ms / 1000
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "rate_limited": 0, "input_tokens": 0, "output_tokens": 0}
+
+
+def serve(options, port_queue, host="127.0.0.1", port=0):
+    """Subprocess entry point: reports the bound port, then serves forever."""
+    server = MockAnthropicServer(host, port, **options)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after-ms", type=int, default=200)
+    args = parser.parse_args()
+    server = MockAnthropicServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.rate_429, args.retry_after_ms)
+    print(f"🤖 Mock Anthropic API on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
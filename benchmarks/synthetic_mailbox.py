@@ -0,0 +1,166 @@
+"""
+Deterministic synthetic mailbox for the end-to-end benchmark.
+
+Messages are generated lazily from (seed, index), so a 1M-message mailbox
+costs no memory until a message is fetched, and the same seed always yields
+byte-identical mail.
+
+    python benchmarks/synthetic_mailbox.py --size 5 --show 2     # print a sample message
+"""
+import random
+import argparse
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timezone, timedelta
+
+# Weights for the MIME layout of each message
+DEFAULT_MIME_MIX = {"plain": 50, "html": 15, "alternative": 25, "attachment": 10}
+
+SENDERS = [
+    ("Elon Musk", "elon@spacex.example"), ("LinkedIn News", "news@linkedin.example"),
+    ("HDFC Alerts", "alerts@hdfcbank.example"), ("Ranga Sai", "ranga@acme.example"),
+    ("Priya Sharma", "priya@acme.example"), ("CFO Office", "cfo@acme.example"),
+    ("Weekly Digest", "digest@trends.example"), ("Netflix", "info@netflix.example"),
+    ("Legal Team", "legal@acme.example"), ("Product Updates", "update@saas.example"),
+]
+# Subjects deliberately hit every Action Center bucket and the newsletter/summary keywords
+SUBJECTS = [
+    "Q{q} budget approval", "Urgent: production outage in {region}", "Board meeting schedule for {month}",
+    "Weekly digest: AI trends #{n}", "Contract to sign with {vendor}", "Deadline for tax filing",
+    "Your salary slip for {month}", "Strategy offsite plan", "Lunch on Friday?", "Market report - {month}",
+    "Please review the {vendor} proposal", "Action required: password reset", "Hiring plan for {region}",
+]
+WORDS = ("revenue forecast customer launch review approve contract timeline budget risk team hiring "
+         "roadmap quarter pipeline renewal invoice meeting agenda security audit compliance vendor "
+         "migration latency incident postmortem strategy partnership pricing discount signature").split()
+REGIONS = ["EMEA", "APAC", "LATAM", "US-East", "US-West"]
+VENDORS = ["Globex", "Initech", "Umbrella", "Hooli", "Stark Industries"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_mime_mix(text):
+    """'plain=50,html=20' -> {'plain': 50, 'html': 20}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIME_MIX:
+            raise ValueError(f"Unknown MIME kind {name!r}; expected one of {sorted(DEFAULT_MIME_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class SyntheticMailbox:
+    """
+    size:           number of messages (sequence numbers 1..size)
+    mime_mix:       {kind: weight} over plain / html / alternative / attachment
+    attachment_kb:  (min, max) size of the binary attachment, in KiB
+    thread_depth:   messages per conversation; replies carry In-Reply-To/References
+    duplicate_rate: share of messages that forward an earlier message's body verbatim
+    """
+
+    def __init__(self, size, seed=0, mime_mix=None, attachment_kb=(4, 256), thread_depth=4, duplicate_rate=0.05):
+        self.size = size
+        self.seed = seed
+        self.mime_mix = mime_mix or dict(DEFAULT_MIME_MIX)
+        self.attachment_kb = attachment_kb
+        self.thread_depth = max(1, thread_depth)
+        self.duplicate_rate = duplicate_rate
+        self._kinds = list(self.mime_mix)
+        self._weights = [self.mime_mix[k] for k in self._kinds]
+
+    def __len__(self):
+        return self.size
+
+    def config(self):
+        return {"size": self.size, "seed": self.seed, "mime_mix": self.mime_mix,
+                "attachment_kb": list(self.attachment_kb), "thread_depth": self.thread_depth,
+                "duplicate_rate": self.duplicate_rate}
+
+    def _rng(self, index, salt=0):
+        return random.Random((self.seed * 1_000_003 + index) * 31 + salt)
+
+    def message_id(self, index):
+        return f"<bench.{self.seed}.{index}@synthetic.example>"
+
+    @staticmethod
+    def _sentences(rng):
+        sentences = []
+        for _ in range(rng.randint(2, 12)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18)))
+            sentences.append(sentence.capitalize() + ".")
+        return " ".join(sentences)
+
+    def _topic(self, index):
+        """Sender, subject and body of a thread root (replies reuse the subject, forwards the body)."""
+        rng = self._rng(index, salt=1)
+        name, address = SENDERS[rng.randrange(len(SENDERS))]
+        subject = rng.choice(SUBJECTS).format(
+            q=rng.randint(1, 4), region=rng.choice(REGIONS), month=rng.choice(MONTHS),
+            n=rng.randint(1, 99), vendor=rng.choice(VENDORS),
+        )
+        return f"{name} <{address}>", subject, self._sentences(rng)
+
+    def _headers_and_body(self, index):
+        rng = self._rng(index)
+        position = (index - 1) % self.thread_depth
+        root = index - position
+        sender, subject, body = self._topic(root)
+        headers = {}
+
+        if index > 1 and rng.random() < self.duplicate_rate:
+            # A forward of some earlier message: same body, so dedupe should catch it
+            original = rng.randint(1, index - 1)
+            _, original_subject, body = self._topic(original - (original - 1) % self.thread_depth)
+            subject = f"Fwd: {original_subject}"
+            sender = "Assistant <assistant@acme.example>"
+        elif position:
+            parents = [self.message_id(i) for i in range(root, index)]
+            headers["In-Reply-To"] = parents[-1]
+            headers["References"] = " ".join(parents)
+            subject = f"Re: {subject}"
+            sender = self._topic(root + position)[0]
+            body = f"Following up on this ({position}). " + self._sentences(rng)
+
+        headers.update({
+            "From": sender, "To": "jim@acme.example", "Subject": subject,
+            "Message-ID": self.message_id(index),
+            "Date": format_datetime(EPOCH + timedelta(minutes=7 * index)),
+        })
+        return rng, headers, body
+
+    def message(self, index):
+        """RFC 822 bytes of message `index` (1-based, like IMAP sequence numbers)."""
+        rng, headers, body = self._headers_and_body(index)
+        kind = rng.choices(self._kinds, weights=self._weights)[0]
+
+        msg = EmailMessage()
+        for name, value in headers.items():
+            msg[name] = value
+        html = f"<html><body><p>{body}</p><p><a href='https://acme.example'>Open</a></p></body></html>"
+        if kind == "html":
+            msg.set_content(html, subtype="html")
+        else:
+            msg.set_content(body)
+            if kind == "alternative":
+                msg.add_alternative(html, subtype="html")
+            elif kind == "attachment":
+                low, high = self.attachment_kb
+                payload = rng.randbytes(1024 * rng.randint(low, max(low, high)))
+                msg.add_attachment(payload, maintype="application", subtype="pdf", filename=f"report-{index}.pdf")
+        return msg.as_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--show", type=int, default=1, help="sequence number to print")
+    args = parser.parse_args()
+    print(SyntheticMailbox(args.size, seed=args.seed).message(args.show).decode(errors="replace"))
+
+
+if __name__ == "__main__":
+    main()
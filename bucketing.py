@@ -0,0 +1,85 @@
+import re
+
+# =================================================
+# ACTION CENTER BUCKETS
+# =================================================
+# Every email lands in exactly one Action Center bucket. The bucket is decided
+# once, when the email is stored (and again only when its sender's rule
+# changes), so rendering the dashboard just reads a column.
+BUCKETS = ["urgent", "confidential", "deadlines", "normal"]
+SENDER_RULE_CATEGORIES = set(BUCKETS)
+
+CONFIDENTIAL_KEYWORDS = ['hdfc', 'chase', 'bank', 'credit card', 'otp', 'salary', 'tax', 'password']
+DEADLINE_KEYWORDS = ['deadline', 'due by', 'due date', 'schedule', 'meeting', 'urgent coordination']
+EMERGENCY_KEYWORDS = ['urgent', 'emergency', 'immediate', 'crisis', 'action required']
+
+_KEYWORD_GROUPS = {
+    "confidential": CONFIDENTIAL_KEYWORDS,
+    "deadlines": DEADLINE_KEYWORDS,
+    "emergency": EMERGENCY_KEYWORDS,
+}
+
+
+def _compile_keywords(groups):
+    """
+    One alternation over every keyword, longest first, plus a map from each
+    keyword to all groups it satisfies. The scan is a zero-width lookahead
+    tried at every position, so overlapping keywords ('schedulemergency') are
+    all found; at each position the longest keyword wins and the map credits
+    the shorter ones inside it ('urgent coordination' / 'urgent'), matching
+    the old per-list substring checks with a single scan.
+    """
+    keywords = sorted({k for words in groups.values() for k in words}, key=len, reverse=True)
+    hits = {
+        keyword: frozenset(group for group, words in groups.items() if any(w in keyword for w in words))
+        for keyword in keywords
+    }
+    alternation = "|".join(re.escape(k) for k in keywords)
+    return re.compile(f"(?=({alternation}))"), re.compile(alternation), hits
+
+
+_KEYWORD_SCAN, _KEYWORD_RE, _KEYWORD_HITS = _compile_keywords(_KEYWORD_GROUPS)
+
+
+def keyword_groups(subject, sender=""):
+    """
+    Scans 'subject sender' once. Returns (subject_groups, any_groups): groups
+    matched inside the subject alone, and groups matched anywhere.
+    """
+    subject = (subject or "").lower()
+    text = f"{subject} {(sender or '').lower()}"
+    in_subject, anywhere = set(), set()
+    for match in _KEYWORD_SCAN.finditer(text):
+        start, keyword = match.start(), match.group(1)
+        groups = _KEYWORD_HITS[keyword]
+        anywhere |= groups
+        if start + len(keyword) <= len(subject):
+            in_subject |= groups
+        elif start < len(subject):
+            # Runs on into the sender: credit the longest keyword that ends inside the subject
+            inside = _KEYWORD_RE.match(subject, start)
+            if inside:
+                in_subject |= _KEYWORD_HITS[inside.group(0)]
+    return in_subject, anywhere
+
+
+def compute_bucket(sender, subject, tag, rule=None):
+    """
+    Decides the Action Center bucket for one email.
+    rule is the sender's trained category (TrainingService), or None.
+    """
+    sender = (sender or "").strip()
+    tag = tag or ""
+    in_subject, anywhere = keyword_groups(subject, sender)
+
+    if rule in ("confidential", "urgent", "deadlines"):
+        return rule
+    if rule == "normal":
+        if "emergency" in in_subject: return "urgent"
+        if "deadlines" in in_subject: return "deadlines"
+        return "normal"
+
+    if 'Confidential' in tag or "confidential" in anywhere: return "confidential"
+    if "deadlines" in in_subject: return "deadlines"
+    if 'Urgent' in tag: return "urgent"
+    return "normal"
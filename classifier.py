@@ -2,6 +2,8 @@ import streamlit as st
 import torch
 from transformers import pipeline
 
+import metrics
+
 # Global variable fallback
 _classifier = None
 
@@ -42,8 +44,10 @@ def classify_urgency_and_action(inputs):
     texts = [inputs] if is_single else inputs
 
     # Batch Process
-    urgency_results = classifier(texts, URGENCY_LABELS)
-    action_results = classifier(texts, ACTION_LABELS)
+    with metrics.timer("ecc_classifier_batch_seconds"):
+        urgency_results = classifier(texts, URGENCY_LABELS)
+        action_results = classifier(texts, ACTION_LABELS)
+    metrics.observe("ecc_classifier_batch_size", len(texts), buckets=metrics.SIZE_BUCKETS)
 
     # Ensure results are always lists
     if isinstance(urgency_results, dict): urgency_results = [urgency_results]
@@ -0,0 +1,157 @@
+import os
+import re
+import heapq
+import hashlib
+import threading
+import numpy as np
+
+# =================================================
+# NEAR-DUPLICATE CONFIGURATION
+# =================================================
+# Broadcasts, CC storms and forwards arrive as separate messages with almost
+# identical text. Each email gets a MinHash signature over word 3-shingles;
+# an LSH band index (16 bands x 4 rows) turns "find similar recent mail" into
+# a few dict lookups, and candidates are confirmed by estimated Jaccard
+# similarity against DEDUPE_THRESHOLD.
+DEDUPE_THRESHOLD = float(os.environ.get("DEDUPE_THRESHOLD", 0.75))
+DEDUPE_WINDOW_DAYS = int(os.environ.get("DEDUPE_WINDOW_DAYS", 14))
+MIN_TOKENS = 8
+SHINGLE_SIZE = 3
+MAX_CHARS = 5000
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(1337)  # fixed seed: signatures must be stable across runs
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+_SUBJECT_PREFIX = re.compile(r"^\s*((re|fw|fwd)\s*:\s*)+", re.IGNORECASE)
+_FORWARD_MARKER = re.compile(r"-{2,}\s*(forwarded|original) message\s*-{2,}", re.IGNORECASE)
+# Quoted history in a reply: everything from the "On ... wrote:" header or an
+# Outlook "Original Message" banner down, plus any "> " quoted lines.
+_REPLY_HEADER = re.compile(
+    r"^[ \t]*(on\b.{0,300}?\bwrote:[ \t]*$|-{2,}\s*original message\s*-{2,})",
+    re.IGNORECASE | re.MULTILINE | re.DOTALL
+)
+_QUOTED_LINE = re.compile(r"^[ \t]*>.*$", re.MULTILINE)
+_ADDRESS = re.compile(r"\S+@\S+")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def strip_quoted(body):
+    """The new text of a reply: drops the quoted history below it."""
+    body = body or ""
+    header = _REPLY_HEADER.search(body)
+    if header:
+        body = body[:header.start()]
+    return _QUOTED_LINE.sub("", body)
+
+
+def normalize_text(subject, body):
+    """
+    Drops reply/forward prefixes, quoted reply history, forward banners and
+    addresses so copies look alike. A short reply is compared on its own
+    text, not on the original it quotes.
+    """
+    subject = _SUBJECT_PREFIX.sub("", subject or "")
+    body = _ADDRESS.sub(" ", _FORWARD_MARKER.sub(" ", strip_quoted(body)))
+    return f"{subject} {body}"[:MAX_CHARS].lower()
+
+
+def minhash(subject, body):
+    """
+    Returns the MinHash signature (uint32 array of NUM_PERM) of an email,
+    or None if it is too short to compare safely.
+    """
+    tokens = _TOKEN.findall(normalize_text(subject, body))
+    if len(tokens) < MIN_TOKENS:
+        return None
+
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # (a * h + b) mod p stays below 2^64 because a, h < 2^32 and b < 2^31
+    permuted = (hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def to_blob(signature):
+    return None if signature is None else np.asarray(signature, dtype=np.uint32).tobytes()
+
+
+def from_blob(blob):
+    return None if blob is None else np.frombuffer(blob, dtype=np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH index of recent signatures: {(band, band_bytes): [email_id, ...]}.
+    Lookups are BANDS dict hits plus a vectorized compare per candidate,
+    well under a millisecond.
+    """
+
+    def __init__(self, threshold=DEDUPE_THRESHOLD):
+        self.threshold = threshold
+        self._bands = {}
+        self._signatures = {}
+        self._expiry = []  # heap of (received_at, email_id) for evict_before()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @staticmethod
+    def _keys(signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def add(self, email_id, signature, received_at=None):
+        if signature is None:
+            return
+        with self._lock:
+            if email_id in self._signatures:
+                return
+            self._signatures[email_id] = signature
+            for key in self._keys(signature):
+                self._bands.setdefault(key, []).append(email_id)
+            if received_at:
+                heapq.heappush(self._expiry, (received_at, email_id))
+
+    def evict_before(self, cutoff):
+        """Drops entries received before `cutoff` (same format as received_at). Returns how many."""
+        evicted = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < cutoff:
+                _, email_id = heapq.heappop(self._expiry)
+                signature = self._signatures.pop(email_id, None)
+                if signature is None:
+                    continue
+                for key in self._keys(signature):
+                    bucket = self._bands[key]
+                    bucket.remove(email_id)
+                    if not bucket:
+                        del self._bands[key]
+                evicted += 1
+        return evicted
+
+    def find(self, signature):
+        """Returns (email_id, similarity) of the closest earlier email above the threshold, or None."""
+        if signature is None:
+            return None
+        best = None
+        with self._lock:
+            candidates = {eid for key in self._keys(signature) for eid in self._bands.get(key, ())}
+            for email_id in candidates:
+                score = similarity(signature, self._signatures[email_id])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (email_id, score)
+        return best
@@ -0,0 +1,167 @@
+import sqlite3
+import hashlib
+import numpy as np
+
+from rag_engine import EMBEDDING_MODEL_NAME, email_to_document, embed_texts
+
+# =================================================
+# EMBEDDING STORE
+# =================================================
+# One vector per email, computed once at ingest and shared by the RAG index,
+# the triage model and the near-duplicate detector. Stored as float16 blobs
+# (768 bytes for MiniLM) keyed by email id, tagged with the model name so a
+# model switch never mixes incompatible vectors.
+CREATE_EMBEDDINGS_SQL = """
+CREATE TABLE IF NOT EXISTS email_embeddings (
+    email_id TEXT PRIMARY KEY,
+    model TEXT,
+    dim INTEGER,
+    vector BLOB
+);
+"""
+
+# Long emails are indexed as several chunks, each with its own vector. Those are
+# kept too, keyed by chunk id ("<email_id>#<n>") and model, with a digest of the
+# chunk text so a chunk whose text changed (new layout, edited body) is re-encoded.
+CREATE_CHUNK_EMBEDDINGS_SQL = [
+    """CREATE TABLE IF NOT EXISTS chunk_embeddings (
+        chunk_id TEXT PRIMARY KEY,
+        email_id TEXT,
+        model TEXT,
+        digest TEXT,
+        dim INTEGER,
+        vector BLOB
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_chunk_embeddings_email ON chunk_embeddings(email_id)",
+]
+
+
+def _digest(text):
+    return hashlib.blake2b((text or "").encode(), digest_size=8).hexdigest()
+
+
+def _to_blob(vector):
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def _from_blob(blob):
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+
+
+class EmbeddingStore:
+    def __init__(self, db_file, model_name=EMBEDDING_MODEL_NAME):
+        self.db_file = db_file
+        self.model_name = model_name
+        conn = self._get_conn()
+        conn.execute(CREATE_EMBEDDINGS_SQL)
+        for sql in CREATE_CHUNK_EMBEDDINGS_SQL:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def _get_conn(self):
+        return sqlite3.connect(self.db_file, check_same_thread=False)
+
+    def get_many(self, email_ids):
+        """Returns {email_id: float32 vector} for the ids we already have."""
+        found = {}
+        ids = list(email_ids)
+        conn = self._get_conn()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT email_id, vector FROM email_embeddings WHERE model = ? AND email_id IN ({placeholders})",
+                [self.model_name, *chunk]
+            )
+            for email_id, blob in rows:
+                found[email_id] = _from_blob(blob)
+        conn.close()
+        return found
+
+    def put_many(self, vectors):
+        """Stores {email_id: vector}; existing entries are overwritten."""
+        if not vectors:
+            return
+        conn = self._get_conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO email_embeddings (email_id, model, dim, vector) VALUES (?, ?, ?, ?)",
+            [(eid, self.model_name, len(vec), _to_blob(vec)) for eid, vec in vectors.items()]
+        )
+        conn.commit()
+        conn.close()
+
+    def get_chunks(self, chunks):
+        """
+        Returns {chunk_id: float32 vector} for the given {chunk_id: text} whose
+        stored vector was encoded from that same text with this model.
+        """
+        found = {}
+        ids = list(chunks)
+        conn = self._get_conn()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT chunk_id, digest, vector FROM chunk_embeddings WHERE model = ? AND chunk_id IN ({placeholders})",
+                [self.model_name, *chunk]
+            )
+            for chunk_id, digest, blob in rows:
+                if digest == _digest(chunks[chunk_id]):
+                    found[chunk_id] = _from_blob(blob)
+        conn.close()
+        return found
+
+    def put_chunks(self, chunks):
+        """Stores {chunk_id: (email_id, text, vector)}; existing entries are overwritten."""
+        if not chunks:
+            return
+        conn = self._get_conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunk_embeddings (chunk_id, email_id, model, digest, dim, vector) VALUES (?, ?, ?, ?, ?, ?)",
+            [(cid, eid, self.model_name, _digest(text), len(vec), _to_blob(vec)) for cid, (eid, text, vec) in chunks.items()]
+        )
+        conn.commit()
+        conn.close()
+
+    def ensure(self, emails):
+        """
+        Returns a float32 matrix aligned with `emails` (dicts with an 'id').
+        Vectors we already have are read from disk; only the missing ones are
+        encoded, in one batch, and saved for next time.
+        """
+        if not emails:
+            return np.zeros((0, 0), dtype=np.float32)
+        known = self.get_many(e["id"] for e in emails)
+        missing = [e for e in emails if e["id"] not in known]
+        if missing:
+            encoded = embed_texts([email_to_document(e) for e in missing])
+            fresh = {e["id"]: np.asarray(v, dtype=np.float32) for e, v in zip(missing, encoded)}
+            self.put_many(fresh)
+            known.update(fresh)
+        return np.stack([known[e["id"]] for e in emails])
+
+    def missing_ids(self, limit=None):
+        """Email ids without a vector for the current model (for backfills)."""
+        conn = self._get_conn()
+        sql = """
+            SELECT e.id FROM emails e
+            LEFT JOIN email_embeddings v ON v.email_id = e.id AND v.model = ?
+            WHERE v.email_id IS NULL
+        """
+        params = [self.model_name]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        ids = [row[0] for row in conn.execute(sql, params)]
+        conn.close()
+        return ids
+
+    def delete(self, email_ids):
+        conn = self._get_conn()
+        email_ids = list(email_ids)
+        conn.executemany("DELETE FROM email_embeddings WHERE email_id = ?", [(eid,) for eid in email_ids])
+        conn.executemany("DELETE FROM chunk_embeddings WHERE email_id = ?", [(eid,) for eid in email_ids])
+        conn.commit()
+        conn.close()
@@ -1,7 +1,24 @@
+import os
 import imaplib
 import email
+import select
+import ssl
+import time
 from email.header import decode_header
-from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+
+import metrics
+
+# Overridable so benchmarks can point the fetcher at a local IMAP stand-in
+IMAP_HOST = os.environ.get("IMAP_HOST", "imap.gmail.com")
+IMAP_PORT = int(os.environ.get("IMAP_PORT", 993))
+IMAP_SSL = os.environ.get("IMAP_SSL", "1") != "0"
+
+def _connect():
+    if IMAP_SSL:
+        return imaplib.IMAP4_SSL(IMAP_HOST, IMAP_PORT)
+    return imaplib.IMAP4(IMAP_HOST, IMAP_PORT)
 
 def clean_text(text):
     """Removes messy newlines and extra spaces."""
@@ -9,11 +26,24 @@ def clean_text(text):
         return ""
     return " ".join(text.split())
 
+def parse_date(value):
+    """RFC 2822 Date header -> UTC ISO timestamp, or None if missing/unparseable."""
+    if not value:
+        return None
+    try:
+        sent = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if sent.tzinfo is None:
+        sent = sent.replace(tzinfo=timezone.utc)
+    return sent.astimezone(timezone.utc).isoformat()
+
+@metrics.timed("ecc_imap_fetch_seconds")
 def fetch_emails(username, password, limit=None, days=3):
     """
     Connects to Gmail and fetches unread emails from the last 'days' (default 3).
     """
-    mail = imaplib.IMAP4_SSL("imap.gmail.com")
+    mail = _connect()
 
     try:
         mail.login(username, password)
@@ -44,7 +74,8 @@ def fetch_emails(username, password, limit=None, days=3):
 
         for e_id in target_ids:
             # Fetch the email body (RFC822)
-            res, msg_data = mail.fetch(e_id, "(RFC822)")
+            with metrics.timer("ecc_imap_message_fetch_seconds"):
+                res, msg_data = mail.fetch(e_id, "(RFC822)")
 
             for response_part in msg_data:
                 if not isinstance(response_part, tuple):
@@ -61,6 +92,7 @@ def fetch_emails(username, password, limit=None, days=3):
                 message_id = msg.get("Message-ID")
                 in_reply_to = msg.get("In-Reply-To")
                 references = msg.get("References")
+                sent_at = parse_date(msg.get("Date"))
 
                 # ---- BODY ----
                 body = ""
@@ -86,12 +118,79 @@ def fetch_emails(username, password, limit=None, days=3):
                     "body": clean_text(body),
                     "message_id": message_id,
                     "in_reply_to": in_reply_to,
-                    "references": references
+                    "references": references,
+                    "date": sent_at
                 })
 
         mail.close()
         mail.logout()
+        metrics.inc("ecc_imap_fetched_emails_total", len(fetched_data))
         return fetched_data
 
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        metrics.inc("ecc_imap_errors_total", error=type(e).__name__)
+        return {"error": str(e)}
+
+
+def _readable_now(mail):
+    """
+    True if a response line can be read without waiting on the socket:
+    decrypted TLS bytes not yet read, or bytes imaplib already buffered in
+    mail.file (e.g. an EXISTS that arrived in the same packet as the IDLE
+    continuation). select() on the socket sees neither.
+    """
+    if getattr(mail.sock, "pending", lambda: 0)():
+        return True
+    timeout = mail.sock.gettimeout()
+    mail.sock.settimeout(0)  # peek() must not block when the buffer is empty
+    try:
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        mail.sock.settimeout(timeout)
+
+def wait_for_new_mail(username, password, timeout=25 * 60, poll=5, interrupted=None):
+    """
+    Blocks in IMAP IDLE until the server pushes new mail, `timeout` seconds
+    pass, or interrupted() returns True (checked every `poll` seconds).
+    Returns True if new mail arrived, False on timeout / interruption, and
+    None if the connection, login or IDLE itself failed (callers should back
+    off before retrying). Gmail drops IDLE after ~29 minutes, so callers
+    should loop with a timeout below that.
+    """
+    mail = None
+    try:
+        mail = _connect()
+        mail.login(username, password)
+        mail.select("inbox")
+        mail.send(mail._new_tag() + b" IDLE\r\n")
+        if not mail.readline().startswith(b"+"):
+            print("⚠️ IMAP server refused IDLE")
+            return None
+
+        try:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                # select() rather than a socket timeout: a timed-out socket file can't be read again
+                if not _readable_now(mail) and not select.select([mail.sock], [], [], poll)[0]:
+                    if interrupted and interrupted():
+                        return False
+                    continue
+                line = mail.readline()
+                if not line:
+                    return None  # server closed the connection
+                if b"EXISTS" in line or b"RECENT" in line:
+                    return True
+            return False
+        finally:
+            mail.send(b"DONE\r\n")
+    except Exception as e:
+        print(f"⚠️ IMAP IDLE failed: {e}")
+        return None
+    finally:
+        if mail is not None:
+            try:
+                mail.logout()
+            except Exception:
+                pass
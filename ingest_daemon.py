@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import threading
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+import metrics
+
+# =================================================
+# HEADLESS INGEST DAEMON
+# =================================================
+# Runs Gmail sync (fetch, triage, Claude, embeddings, RAG) outside the
+# Streamlit server, so the dashboard process only reads the shared database.
+#
+#   python ingest_daemon.py                 # sync every INGEST_INTERVAL seconds
+#   python ingest_daemon.py --idle          # sync when IMAP IDLE reports new mail
+#   python ingest_daemon.py --once          # one sync, then exit (cron / systemd timer)
+#
+# Credentials come from GMAIL_USER / GMAIL_APP_PASSWORD (.env is loaded), never
+# from the UI. A lock file keeps it to one daemon per database, and a small
+# status file tells the dashboard what the daemon is doing. Its metrics are
+# written next to it for the dashboard's Performance tab (--metrics-port also
+# serves them to Prometheus).
+INGEST_LOCK_FILE = os.environ.get("INGEST_LOCK_FILE", "ingest.lock")
+INGEST_STATUS_FILE = os.environ.get("INGEST_STATUS_FILE", "ingest_status.json")
+INGEST_REQUEST_FILE = os.environ.get("INGEST_REQUEST_FILE", "ingest_sync.request")
+INGEST_METRICS_FILE = os.environ.get("INGEST_METRICS_FILE", "ingest_metrics.json")
+DEFAULT_INTERVAL = int(os.environ.get("INGEST_INTERVAL", 300))
+HEARTBEAT_SECONDS = 30
+IDLE_TIMEOUT = 25 * 60  # Gmail drops IDLE connections after ~29 minutes
+IDLE_RETRY_BASE_SECONDS = 5  # after an IDLE failure: 5s, 10s, 20s ... capped at --interval
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# =================================================
+# STATUS (shared with the dashboard)
+# =================================================
+# Kept in a JSON file rather than the database: heartbeats would otherwise
+# be a database write every few seconds, contending with ingest for the lock.
+_status_lock = threading.Lock()
+
+def _write_status(**fields):
+    with _status_lock:
+        status = read_ingest_status(raw=True)
+        status.update(fields, heartbeat_at=_now_iso())
+        tmp_path = INGEST_STATUS_FILE + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp_path, INGEST_STATUS_FILE)
+
+
+def read_ingest_status(raw=False):
+    """
+    Returns the daemon's last reported status (state, last_run_at,
+    last_result, last_error, next_run_at, ...). Unless raw=True, also sets
+    'running': whether a live daemon has sent a heartbeat recently.
+    """
+    try:
+        with open(INGEST_STATUS_FILE, "r") as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        status = {}
+    if raw:
+        return status
+
+    status["running"] = False
+    if status.get("state") not in (None, "stopped") and status.get("heartbeat_at"):
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(status["heartbeat_at"])).total_seconds()
+        status["running"] = age < 3 * HEARTBEAT_SECONDS
+    return status
+
+
+def _write_metrics():
+    if not metrics.enabled():
+        return
+    try:
+        with _status_lock:  # heartbeat thread and sync loop share the .tmp file
+            metrics.write_snapshot(INGEST_METRICS_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not write {INGEST_METRICS_FILE}: {e}")
+
+
+def read_ingest_metrics():
+    """The daemon's last metrics snapshot (see metrics.snapshot), or None."""
+    return metrics.read_snapshot(INGEST_METRICS_FILE)
+
+
+def request_sync():
+    """Asks a running daemon to sync now (used by the dashboard's "Sync now" button)."""
+    with open(INGEST_REQUEST_FILE, "w") as f:
+        f.write(_now_iso())
+
+
+def _take_sync_request():
+    try:
+        os.remove(INGEST_REQUEST_FILE)
+        return True
+    except OSError:
+        return False
+
+
+# =================================================
+# SINGLE-INSTANCE LOCK
+# =================================================
+class InstanceLock:
+    """
+    OS-level exclusive lock on INGEST_LOCK_FILE. The OS releases it when the
+    process dies, so a crashed daemon never leaves a stale lock behind.
+    """
+
+    def __init__(self, path=INGEST_LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        self._file = open(self.path, "a+")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(f"{os.getpid()}@{socket.gethostname()}\n")
+        self._file.flush()
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # closing the descriptor drops the lock
+            self._file = None
+
+
+# =================================================
+# MAIN LOOP
+# =================================================
+class IngestDaemon:
+    def __init__(self, username, password, interval=DEFAULT_INTERVAL, idle=False, limit=None, requeue_dead=False):
+        self.username = username
+        self.password = password
+        self.interval = interval
+        self.idle = idle
+        self.limit = limit
+        self.requeue_dead = requeue_dead
+        self._stop = threading.Event()
+        self._idle_failures = 0
+        self.service = None
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def _heartbeat_loop(self):
+        # Separate thread, so the dashboard still sees us alive during a long sync
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            _write_status()
+            _write_metrics()
+
+    def _interrupted(self):
+        return self._stop.is_set() or os.path.exists(INGEST_REQUEST_FILE)
+
+    def sync_once(self):
+        _take_sync_request()
+        started = _now_iso()
+        _write_status(state="syncing", sync_started_at=started)
+        try:
+            result = self.service.sync_with_gmail(self.username, self.password, limit=self.limit)
+            # Labels written by the dashboard ("Train" clicks) are learned here
+            self.service.update_triage_model()
+            _write_status(state="idle", last_run_at=started, last_success_at=_now_iso(), last_result=result, last_error=None,
+                          queue=self.service.jobs.counts())
+        except Exception as e:
+            print(f"❌ Sync failed: {e}")
+            _write_status(state="error", last_run_at=started, last_error=str(e))
+        _write_metrics()
+
+    def wait_for_next(self):
+        """Sleeps until the next scheduled run, new mail (IDLE), a "Sync now" request or a stop signal."""
+        if self.idle:
+            _write_status(next_run_at=None, waiting_on="imap-idle")
+            from imap_module import wait_for_new_mail
+            if wait_for_new_mail(self.username, self.password, timeout=IDLE_TIMEOUT, interrupted=self._interrupted) is None:
+                # IMAP is down or rejecting us: back off rather than reconnect in a tight loop
+                self._idle_failures += 1
+                self._sleep(min(IDLE_RETRY_BASE_SECONDS * 2 ** (self._idle_failures - 1), self.interval), "imap-retry")
+            else:
+                self._idle_failures = 0
+            return
+
+        self._sleep(self.interval, "schedule")
+
+    def _sleep(self, seconds, waiting_on):
+        """Waits `seconds`, cut short by a stop signal or a "Sync now" request."""
+        deadline = time.monotonic() + seconds
+        _write_status(next_run_at=datetime.fromtimestamp(time.time() + seconds, timezone.utc).isoformat(), waiting_on=waiting_on)
+        while time.monotonic() < deadline and not self._interrupted():
+            time.sleep(1)
+
+    def run(self, once=False):
+        # Heavy imports (torch, sentence-transformers, Claude client) happen here, not in the UI
+        from backend import EmailService
+        self.service = EmailService()
+        # We hold the instance lock, so any claimed job belongs to a crashed predecessor
+        self.service.jobs.release_claims()
+        if self.requeue_dead:
+            print(f"♻️ Requeued {self.service.jobs.requeue_dead()} dead-lettered jobs.")
+        # The dashboard trusts the trigger-maintained KPI counters; recount once per start
+        drifted = self.service.check_kpi_counters()
+        if drifted:
+            print(f"🧮 Rebuilt drifted KPI counters: {drifted}")
+        # Vectors for mail stored without one (duplicates, Manual Feed), so the
+        # triage retrains after each sync never have to encode a backlog
+        backfilled = self.service.backfill_embeddings()
+        if backfilled:
+            print(f"🧬 Backfilled {backfilled} email embeddings.")
+        _write_status(state="idle", pid=os.getpid(), host=socket.gethostname(), started_at=_now_iso(),
+                      mode="once" if once else ("idle" if self.idle else "interval"), interval=self.interval)
+        print(f"🛰️ Ingest daemon started (pid {os.getpid()}).")
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                self.sync_once()
+                if once:
+                    break
+                self.wait_for_next()
+        finally:
+            self._stop.set()
+            _write_status(state="stopped", next_run_at=None, stopped_at=_now_iso())
+            print("🛑 Ingest daemon stopped.")
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Headless Gmail ingest worker for the Executive Command Center.")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="seconds between scheduled syncs")
+    parser.add_argument("--idle", action="store_true", help="wait on IMAP IDLE push instead of a fixed schedule")
+    parser.add_argument("--once", action="store_true", help="run a single sync and exit")
+    parser.add_argument("--limit", type=int, default=None, help="max unread emails per sync (default: all)")
+    parser.add_argument("--requeue-dead", action="store_true", help="retry dead-lettered ingest jobs on startup")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port (/metrics)")
+    args = parser.parse_args(argv)
+
+    username, password = os.environ.get("GMAIL_USER"), os.environ.get("GMAIL_APP_PASSWORD")
+    if not username or not password:
+        print("❌ Set GMAIL_USER and GMAIL_APP_PASSWORD (environment or .env).")
+        return 2
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        print("❌ Missing ANTHROPIC_API_KEY.")
+        return 2
+
+    lock = InstanceLock()
+    if not lock.acquire():
+        print(f"⚠️ Another ingest daemon holds {INGEST_LOCK_FILE}; exiting.")
+        return 1
+
+    if args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port)
+        print(f"📈 Prometheus metrics on :{args.metrics_port}/metrics")
+
+    daemon = IngestDaemon(username, password, interval=args.interval, idle=args.idle, limit=args.limit,
+                          requeue_dead=args.requeue_dead)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    try:
+        daemon.run(once=args.once)
+    finally:
+        lock.release()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
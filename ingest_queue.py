@@ -0,0 +1,274 @@
+import json
+import sqlite3
+import uuid
+from datetime import datetime, timezone, timedelta
+
+import metrics
+
+# =================================================
+# INGEST JOB QUEUE
+# =================================================
+# Every fetched email is written here before any model runs, then moves
+# through the stages one committed step at a time:
+#
+#   fetched -> analyzed -> classified -> indexed
+#                   \-> (retry with backoff) -> dead
+#
+# Each stage's output (MinHash, triage prediction, Claude's JSON) is stored
+# on the job, so a crash or restart resumes at the first unfinished stage
+# and never pays for a completed LLM call twice.
+STATUS_FETCHED = "fetched"
+STATUS_ANALYZED = "analyzed"
+STATUS_CLASSIFIED = "classified"
+STATUS_INDEXED = "indexed"
+STATUS_DEAD = "dead"
+JOB_STATUSES = [STATUS_FETCHED, STATUS_ANALYZED, STATUS_CLASSIFIED, STATUS_INDEXED, STATUS_DEAD]
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+CLAIM_LEASE_SECONDS = 600  # a claim older than this belongs to a dead worker
+
+CREATE_JOBS_SQL = [
+    """CREATE TABLE IF NOT EXISTS ingest_jobs (
+        id TEXT PRIMARY KEY,
+        message_id TEXT UNIQUE,
+        sender TEXT,
+        subject TEXT,
+        body TEXT,
+        fetched_at TEXT,
+        received_at TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TEXT,
+        last_error TEXT,
+        claimed_by TEXT,
+        claimed_at TEXT,
+        minhash BLOB,
+        analysis TEXT,
+        updated_at TEXT
+    )""",
+    # Claims scan one status in fetch order
+    "CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, fetched_at)",
+]
+
+# Columns added after the first release; ALTERed into older databases on startup.
+JOB_COLUMN_MIGRATIONS = [
+    ("received_at", "TEXT"),  # the message's Date header; fetched_at is when we saw it
+]
+
+# Payload columns are dropped once a job is fully indexed; the row stays as a receipt
+_PAYLOAD_COLUMNS = ("body", "analysis", "minhash")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def backoff_seconds(attempts):
+    """30s, 1m, 2m, 4m ... capped at an hour."""
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+
+class IngestQueue:
+    def __init__(self, db_file):
+        self.db_file = db_file
+        conn = self._get_conn()
+        for sql in CREATE_JOBS_SQL:
+            conn.execute(sql)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(ingest_jobs)")}
+        for column, col_type in JOB_COLUMN_MIGRATIONS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE ingest_jobs ADD COLUMN {column} {col_type}")
+        conn.commit()
+        conn.close()
+
+    def _get_conn(self):
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, emails):
+        """
+        Persists freshly fetched emails as 'fetched' jobs and returns the new
+        job dicts (id, sender, subject, body, message_id, received_at). Emails whose
+        message_id is already queued or stored are skipped.
+        """
+        now = _now().isoformat()
+        jobs = []
+        conn = self._get_conn()
+        for email in emails:
+            message_id = email.get('message_id')
+            if message_id and conn.execute(
+                "SELECT 1 FROM ingest_jobs WHERE message_id = ? UNION ALL SELECT 1 FROM emails WHERE message_id = ? LIMIT 1",
+                (message_id, message_id)
+            ).fetchone():
+                continue
+            job = {"id": str(uuid.uuid4()), "sender": email['sender'], "subject": email['subject'],
+                   "body": email['body'], "message_id": message_id, "received_at": email.get('date') or now}
+            cursor = conn.execute("""
+                INSERT OR IGNORE INTO ingest_jobs (id, message_id, sender, subject, body, fetched_at, received_at, status, updated_at)
+                VALUES (:id, :message_id, :sender, :subject, :body, :fetched_at, :received_at, :status, :fetched_at)
+            """, {**job, "fetched_at": now, "status": STATUS_FETCHED})
+            # Another process may have queued the same message since the check above
+            if cursor.rowcount == 1:
+                jobs.append(job)
+        conn.commit()
+        conn.close()
+        metrics.inc("ecc_ingest_jobs_enqueued_total", len(jobs))
+        return jobs
+
+    def claim(self, status, limit=64):
+        """
+        Atomically claims up to `limit` due jobs in `status` (oldest first)
+        and returns them as dicts, with 'analysis' decoded.
+        """
+        token = str(uuid.uuid4())
+        now = _now()
+        lease_cutoff = (now - timedelta(seconds=CLAIM_LEASE_SECONDS)).isoformat()
+        conn = self._get_conn()
+        conn.execute("""
+            UPDATE ingest_jobs SET claimed_by = ?, claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM ingest_jobs
+                WHERE status = ? AND (claimed_by IS NULL OR claimed_at < ?)
+                  AND (next_attempt_at IS NULL OR next_attempt_at <= ?)
+                ORDER BY fetched_at, rowid LIMIT ?
+            )
+        """, (token, now.isoformat(), status, lease_cutoff, now.isoformat(), limit))
+        conn.commit()
+        rows = conn.execute(
+            "SELECT * FROM ingest_jobs WHERE claimed_by = ? ORDER BY fetched_at, rowid", (token,)
+        ).fetchall()
+        conn.close()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job['analysis'] = json.loads(job['analysis']) if job['analysis'] else None
+            jobs.append(job)
+        return jobs
+
+    def update(self, job_id, **fields):
+        """Stores stage output on a job without changing its status or claim."""
+        if 'analysis' in fields and fields['analysis'] is not None:
+            fields['analysis'] = json.dumps(fields['analysis'])
+        fields['updated_at'] = _now().isoformat()
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        conn = self._get_conn()
+        conn.execute(f"UPDATE ingest_jobs SET {assignments} WHERE id = :job_id", {**fields, "job_id": job_id})
+        conn.commit()
+        conn.close()
+
+    def advance(self, job_ids, status, conn=None):
+        """
+        Moves jobs to the next status and releases their claim. Pass `conn`
+        to make the move part of the caller's transaction (caller commits).
+        """
+        if not job_ids:
+            return
+        own_conn = conn is None
+        conn = conn or self._get_conn()
+        payload = ", " + ", ".join(f"{c} = NULL" for c in _PAYLOAD_COLUMNS) if status == STATUS_INDEXED else ""
+        conn.executemany(
+            f"""UPDATE ingest_jobs SET status = ?, attempts = 0, next_attempt_at = NULL, last_error = NULL,
+                claimed_by = NULL, claimed_at = NULL, updated_at = ?{payload} WHERE id = ?""",
+            [(status, _now().isoformat(), job_id) for job_id in job_ids]
+        )
+        if own_conn:
+            conn.commit()
+            conn.close()
+
+    def fail(self, job_id, error, count_attempt=True, permanent=False):
+        """
+        Records a failed stage run: the job is retried after an exponential
+        backoff, or dead-lettered after MAX_ATTEMPTS. A `permanent` error
+        (one a retry would only repeat) dead-letters it at once. Returns the
+        new status.
+        """
+        conn = self._get_conn()
+        row = conn.execute("SELECT attempts, status FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            conn.close()
+            return None
+        attempts = row['attempts'] + (1 if count_attempt else 0)
+        status = STATUS_DEAD if permanent or attempts >= MAX_ATTEMPTS else row['status']
+        next_attempt = (_now() + timedelta(seconds=backoff_seconds(max(attempts, 1)))).isoformat()
+        conn.execute("""
+            UPDATE ingest_jobs SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?,
+                claimed_by = NULL, claimed_at = NULL, updated_at = ?
+            WHERE id = ?
+        """, (status, attempts, next_attempt, str(error)[:1000], _now().isoformat(), job_id))
+        conn.commit()
+        conn.close()
+        outcome = "dead" if status == STATUS_DEAD else ("retry" if count_attempt else "deferred")
+        metrics.inc("ecc_ingest_job_failures_total", outcome=outcome)
+        return status
+
+    def status_of(self, job_id):
+        conn = self._get_conn()
+        row = conn.execute("SELECT status FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def outcomes(self, job_ids):
+        """
+        Where these jobs stand: ({status: n}, n still retrying after an error,
+        [distinct last errors, newest first]).
+        """
+        ids = list(job_ids)
+        counts, retrying, errors = {}, 0, []
+        conn = self._get_conn()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT status, last_error FROM ingest_jobs WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY updated_at DESC",
+                chunk
+            )
+            for status, error in rows:
+                counts[status] = counts.get(status, 0) + 1
+                if error and status not in (STATUS_DEAD, STATUS_INDEXED):
+                    retrying += 1
+                if error and error not in errors:
+                    errors.append(error)
+        conn.close()
+        return counts, retrying, errors
+
+    def release_claims(self):
+        """Frees every claim; only safe while no other worker is running (daemon startup)."""
+        conn = self._get_conn()
+        conn.execute("UPDATE ingest_jobs SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by IS NOT NULL")
+        conn.commit()
+        conn.close()
+
+    def requeue_dead(self):
+        """
+        Gives dead-lettered jobs a fresh set of attempts. Jobs whose analysis
+        was saved resume at classification, the rest start over at analysis.
+        Returns how many were requeued.
+        """
+        conn = self._get_conn()
+        count = conn.execute("""
+            UPDATE ingest_jobs
+            SET status = CASE WHEN analysis IS NOT NULL THEN ? ELSE ? END,
+                attempts = 0, next_attempt_at = NULL, claimed_by = NULL, claimed_at = NULL
+            WHERE status = ?
+        """, (STATUS_ANALYZED, STATUS_FETCHED, STATUS_DEAD)).rowcount
+        conn.commit()
+        conn.close()
+        return count
+
+    def counts(self):
+        """{status: number of jobs} for every status (zeros included)."""
+        conn = self._get_conn()
+        found = dict(conn.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status").fetchall())
+        conn.close()
+        return {status: found.get(status, 0) for status in JOB_STATUSES}
+
+    def dead_jobs(self, limit=50):
+        conn = self._get_conn()
+        rows = [dict(r) for r in conn.execute(
+            "SELECT id, sender, subject, attempts, last_error, updated_at FROM ingest_jobs WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+            (STATUS_DEAD, limit)
+        )]
+        conn.close()
+        return rows
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+from collections import deque
+
+# =================================================
+# METRICS
+# =================================================
+# In-process counters and histograms for the slow parts of the app: IMAP,
+# Claude, the zero-shot classifier, embeddings / vector index and SQLite.
+#
+#   with metrics.timer("ecc_imap_fetch_seconds"): ...
+#   @metrics.timed("ecc_query_seconds", query="get_kpi_stats")
+#   metrics.inc("ecc_llm_tokens_total", n, call="analyze", direction="input")
+#
+# Exported as Prometheus text (prometheus_text) or a JSON snapshot (snapshot).
+# With METRICS_ENABLED=0, @timed functions are left unwrapped and every other
+# entry point returns after one flag check.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+RECENT_SAMPLES = int(os.environ.get("METRICS_RECENT_SAMPLES", 200))  # per series, for the dashboard
+
+# Seconds; the classifier and Claude live at the top, SQLite at the bottom
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+_enabled = METRICS_ENABLED
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "recent")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append((time.time(), value))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {label_key: value}
+        self._histograms = {}  # name -> {label_key: _Histogram}
+
+    def inc(self, name, value=1, key=()):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, key=(), buckets=LATENCY_BUCKETS):
+        """key is a _label_key() tuple."""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self, recent=True):
+        """
+        JSON-serializable copy of every series:
+        {"generated_at", "counters": {name: [{labels, value}]},
+         "histograms": {name: [{labels, count, sum, buckets, recent}]}}
+        where buckets is [[upper_bound, cumulative_count], ...] ending in "+Inf".
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {}
+            for name, series in self._histograms.items():
+                histograms[name] = []
+                for key, h in series.items():
+                    cumulative, running = [], 0
+                    for bound, count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        running += count
+                        cumulative.append([bound, running])
+                    entry = {"labels": dict(key), "count": h.count, "sum": h.sum, "buckets": cumulative}
+                    if recent:
+                        entry["recent"] = [list(sample) for sample in h.recent]
+                    histograms[name].append(entry)
+        return {"generated_at": time.time(), "pid": os.getpid(), "counters": counters, "histograms": histograms}
+
+
+REGISTRY = MetricsRegistry()
+
+
+# =================================================
+# RECORDING
+# =================================================
+def inc(name, value=1, **labels):
+    if _enabled:
+        REGISTRY.inc(name, value, _label_key(labels) if labels else ())
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    if _enabled:
+        REGISTRY.observe(name, value, _label_key(labels) if labels else (), buckets)
+
+
+class _NullTimer:
+    seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("name", "key", "start", "seconds")
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        REGISTRY.observe(self.name, self.seconds, self.key)
+        return False
+
+
+def timer(name, **labels):
+    """Context manager recording the block's wall time (also on error) in histogram `name`."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, _label_key(labels) if labels else ())
+
+
+def timed(name, **labels):
+    """
+    Decorator form of timer(). With METRICS_ENABLED=0 at import time the
+    function is returned unwrapped, so disabled metrics cost nothing at all.
+    """
+    key = _label_key(labels)
+
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - start, key)
+        return wrapper
+    return decorator
+
+
+# =================================================
+# EXPORT
+# =================================================
+def snapshot(recent=True):
+    return REGISTRY.snapshot(recent=recent)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def prometheus_text(data=None):
+    """Prometheus text exposition (format 0.0.4) of a snapshot (default: this process)."""
+    data = data or snapshot(recent=False)
+    lines = []
+    for name, series in sorted(data["counters"].items()):
+        lines.append(f"# TYPE {name} counter")
+        for s in series:
+            lines.append(f"{name}{_format_labels(s['labels'])} {s['value']}")
+    for name, series in sorted(data["histograms"].items()):
+        lines.append(f"# TYPE {name} histogram")
+        for s in series:
+            for bound, count in s["buckets"]:
+                lines.append(f"{name}_bucket{_format_labels(s['labels'], {'le': bound})} {count}")
+            lines.append(f"{name}_sum{_format_labels(s['labels'])} {s['sum']}")
+            lines.append(f"{name}_count{_format_labels(s['labels'])} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path):
+    """Atomically writes snapshot() as JSON, for another process (the dashboard) to read."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def serve_prometheus(port, host="0.0.0.0"):
+    """Serves GET /metrics from a daemon thread. Returns the server."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *_):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =================================================
+# DASHBOARD SUMMARIES
+# =================================================
+def latency_rows(data, since=None):
+    """
+    One row per histogram series with the recent-sample latency profile
+    (last / p50 / p95 / max in ms) for the Performance tab. `since` is an
+    epoch time; older samples are ignored.
+    """
+    rows = []
+    for name, series in sorted(data.get("histograms", {}).items()):
+        if not name.endswith("_seconds"):
+            continue
+        for s in series:
+            values = sorted(v for t, v in s.get("recent", []) if since is None or t >= since)
+            if not values:
+                continue
+            last = s["recent"][-1][1]
+            rows.append({
+                "metric": name,
+                "labels": ", ".join(f"{k}={v}" for k, v in sorted(s["labels"].items())),
+                "calls": s["count"],
+                "last_ms": round(last * 1000, 2),
+                "p50_ms": round(values[len(values) // 2] * 1000, 2),
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+                "avg_ms": round(s["sum"] / s["count"] * 1000, 2) if s["count"] else 0.0,
+            })
+    return rows
+
+
+# Caches shown in the Performance tab: (hits counter, misses counter, labels, seconds-saved counter)
+CACHE_COUNTERS = {
+    "chat answers": ("ecc_llm_cache_hits_total", "ecc_llm_cache_misses_total", {"call": "chat"},
+                     "ecc_chat_cache_seconds_saved_total"),
+    "query embeddings": ("ecc_query_embedding_cache_hits_total", "ecc_query_embedding_cache_misses_total", {}, None),
+}
+
+
+def _counter_total(data, name, labels=None):
+    return sum(
+        s["value"] for s in data.get("counters", {}).get(name, [])
+        if all(s["labels"].get(k) == v for k, v in (labels or {}).items())
+    )
+
+
+def cache_rows(data):
+    """One row per CACHE_COUNTERS entry that saw a lookup: hits, misses, hit rate and seconds saved."""
+    rows = []
+    for cache, (hits_name, misses_name, labels, saved_name) in CACHE_COUNTERS.items():
+        hits, misses = _counter_total(data, hits_name, labels), _counter_total(data, misses_name, labels)
+        if not hits + misses:
+            continue
+        rows.append({
+            "cache": cache,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3),
+            "seconds_saved": round(_counter_total(data, saved_name), 2) if saved_name else None,
+        })
+    return rows
+
+
+def counter_rows(data):
+    return [
+        {"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in sorted(s["labels"].items())), "value": s["value"]}
+        for name, series in sorted(data.get("counters", {}).items()) for s in series
+    ]
@@ -1,70 +1,579 @@
-import chromadb
 from sentence_transformers import SentenceTransformer
 import anthropic
 import torch
 import os
+import re
+import sqlite3
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 
+import metrics
+from ai_engine import create_message
+
 load_dotenv()
 
 # Configuration
 EMBEDDING_MODEL_NAME = os.environ.get("EMBED_MODEL", "all-MiniLM-L6-v2")
 VECTOR_DB_PATH = "./inbox_memory_db"
+# "chroma" (default) or "memmap" for the built-in store in vector_store.py
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma").lower()
 GENERATION_MODEL = os.environ.get("CLAUDE_MODEL", "claude-3-5-sonnet-latest")
 TOP_K = int(os.environ.get("TOP_K", 4))
+INDEX_CHUNK_SIZE = int(os.environ.get("INDEX_CHUNK_SIZE", 256))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 32))
+
+# Chunk-level retrieval
+COLLECTION_NAME = "email_chunks"
+INDEX_LAYOUT = f"chunks-v1:{VECTOR_BACKEND}"  # bump (or switch backend) to force a re-index
+LEXICAL_DB_PATH = os.path.join(VECTOR_DB_PATH, "lexical.db")
+CHUNK_CHARS = int(os.environ.get("CHUNK_CHARS", 1000))
+CHUNK_OVERLAP = 150
+MAX_CHUNKS_PER_EMAIL = 2
+CONTEXT_CHAR_BUDGET = int(os.environ.get("CONTEXT_CHAR_BUDGET", 6000))
+CANDIDATE_MULTIPLIER = 5
+RRF_K = 60
+
+# Chat caches
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 512))
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 128))
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0.95))
+
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "were",
+    "what", "which", "who", "when", "where", "how", "did", "do", "does", "any", "my", "me",
+    "i", "we", "our", "about", "with", "from", "that", "this", "it", "be", "have", "has",
+}
 
 _embedder = None
 _client = None
 _collection = None
 
-def get_components():
-    global _embedder, _client, _collection
-    
+def get_embedder():
+    global _embedder
     if _embedder is None:
         device = "cuda" if torch.cuda.is_available() else "cpu"
         _embedder = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+    return _embedder
+
+def email_to_document(email):
+    """The text we embed for an email (shared by RAG and the triage model)."""
+    return f"Subject: {email.get('subject')}\nFrom: {email.get('sender')}\nBody: {email.get('body')}"
+
+def embed_texts(texts):
+    embedder = get_embedder()
+    with metrics.timer("ecc_embed_seconds"):
+        vectors = embedder.encode(texts, batch_size=EMBED_BATCH_SIZE)
+    metrics.inc("ecc_embedded_texts_total", len(texts))
+    return vectors
+
+def get_components():
+    global _client, _collection
+    
+    get_embedder()
         
     if _client is None:
-        _client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
-        _collection = _client.get_or_create_collection(name="emails")
+        if VECTOR_BACKEND == "memmap":
+            from vector_store import MemmapVectorStore
+            _collection = MemmapVectorStore(os.path.join(VECTOR_DB_PATH, "memmap", COLLECTION_NAME))
+            _client = _collection
+        else:
+            # Imported lazily: chromadb is slow to import and unused by the memmap backend
+            import chromadb
+            _client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+            _collection = _client.get_or_create_collection(name=COLLECTION_NAME)
         
     return _embedder, _collection
 
-def index_emails_to_vector_db(emails):
-    embedder, collection = get_components()
-    ids, documents, metadatas = [], [], []
+def _existing_ids(collection, ids):
+    """Asks Chroma about these ids only - never pulls the whole collection."""
+    try:
+        return set(collection.get(ids=ids, include=[])["ids"])
+    except Exception:
+        return set()
+
+# =================================================
+# CHUNKING
+# =================================================
+def chunk_email(email):
+    """
+    Splits an email into overlapping body windows, each carrying the subject/sender
+    header so it embeds well on its own. Short emails stay a single chunk whose
+    text equals email_to_document(), so their stored per-email vector is reused.
+    """
+    body = email.get("body") or ""
+    if len(body) <= CHUNK_CHARS:
+        return [email_to_document(email)]
 
+    chunks, start = [], 0
+    while start < len(body):
+        end = min(len(body), start + CHUNK_CHARS)
+        if end < len(body):
+            # Break on whitespace so words aren't cut in half
+            space = body.rfind(" ", start + CHUNK_CHARS // 2, end)
+            end = space if space > 0 else end
+        chunks.append(email_to_document({**email, "body": body[start:end].strip()}))
+        if end >= len(body):
+            break
+        start = max(end - CHUNK_OVERLAP, start + 1)
+    return chunks
+
+def _received_ts(received_at):
     try:
-        existing_ids = set(collection.get()["ids"])
-    except:
-        existing_ids = set()
+        return datetime.fromisoformat(str(received_at)).timestamp()
+    except ValueError:
+        return 0.0
 
-    for email in emails:
-        eid = email.get("id")
-        if eid in existing_ids: continue
+def _chunk_metadata(email, n):
+    return {
+        "email_id": email.get("id"),
+        "chunk": n,
+        "sender": email.get("sender") or "",
+        "subject": email.get("subject") or "",
+        "tag": email.get("tag") or "",
+        "received_at": email.get("received_at") or "",
+        "received_ts": _received_ts(email.get("received_at")),
+    }
 
-        text = f"Subject: {email.get('subject')}\nFrom: {email.get('sender')}\nBody: {email.get('body')}"
-        ids.append(eid)
-        documents.append(text)
-        metadatas.append({"sender": email.get("sender"), "subject": email.get("subject")})
+# =================================================
+# LEXICAL (BM25) INDEX
+# =================================================
+# SQLite FTS5 table living next to the Chroma files, holding the same chunks.
+LEXICAL_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+        text, chunk_id UNINDEXED, email_id UNINDEXED, sender UNINDEXED,
+        tag UNINDEXED, received_ts UNINDEXED, tokenize='porter unicode61'
+    )""",
+    # email_id is UNINDEXED inside FTS5 (filtering on it scans every chunk), so
+    # this maps each email to its chunk rowids for replace-on-reindex
+    "CREATE TABLE IF NOT EXISTS chunk_rows (rowid INTEGER PRIMARY KEY, email_id TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_chunk_rows_email ON chunk_rows(email_id)",
+    "CREATE TABLE IF NOT EXISTS indexed_senders (sender TEXT PRIMARY KEY)",
+    "CREATE TABLE IF NOT EXISTS indexed_tags (tag TEXT PRIMARY KEY)",
+    # Bumped whenever new chunks land; shared across processes (UI, ingest worker)
+    "CREATE TABLE IF NOT EXISTS index_state (key TEXT PRIMARY KEY, value INTEGER)",
+]
 
-    if not documents: return 0
-    
-    embeddings = embedder.encode(documents).tolist()
-    collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-    return len(documents)
+def _lexical_conn():
+    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
+    conn = sqlite3.connect(LEXICAL_DB_PATH, check_same_thread=False)
+    has_chunk_rows = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunk_rows'").fetchone()
+    for sql in LEXICAL_SCHEMA:
+        conn.execute(sql)
+    if not has_chunk_rows:
+        # Index built before chunk_rows existed: map its chunks once
+        conn.execute("INSERT OR IGNORE INTO chunk_rows (rowid, email_id) SELECT rowid, email_id FROM chunks_fts")
+        conn.commit()
+    return conn
 
-def chat_with_inbox(user_query):
+@metrics.timed("ecc_index_write_seconds", store="lexical")
+def _lexical_upsert(rows):
+    """rows: (chunk_id, text, metadata) tuples. Replaces all chunks of the emails involved."""
+    conn = _lexical_conn()
+    email_ids = list({meta["email_id"] for _, _, meta in rows})
+    placeholders = ",".join("?" * len(email_ids))
+    stale = conn.execute(f"SELECT rowid FROM chunk_rows WHERE email_id IN ({placeholders})", email_ids).fetchall()
+    conn.executemany("DELETE FROM chunks_fts WHERE rowid = ?", stale)
+    conn.execute(f"DELETE FROM chunk_rows WHERE email_id IN ({placeholders})", email_ids)
+    for cid, text, m in rows:
+        rowid = conn.execute(
+            "INSERT INTO chunks_fts (text, chunk_id, email_id, sender, tag, received_ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (text, cid, m["email_id"], m["sender"], m["tag"], m["received_ts"])
+        ).lastrowid
+        conn.execute("INSERT INTO chunk_rows (rowid, email_id) VALUES (?, ?)", (rowid, m["email_id"]))
+    conn.executemany("INSERT OR IGNORE INTO indexed_senders (sender) VALUES (?)", {(m["sender"],) for _, _, m in rows})
+    conn.executemany("INSERT OR IGNORE INTO indexed_tags (tag) VALUES (?)", {(m["tag"],) for _, _, m in rows})
+    conn.execute("""
+        INSERT INTO index_state (key, value) VALUES ('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """)
+    conn.commit()
+    conn.close()
+
+def index_generation():
+    """Changes every time new mail is indexed (by any process)."""
+    conn = _lexical_conn()
+    try:
+        row = conn.execute("SELECT value FROM index_state WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+def _fts_query(text):
+    """Turns free text into a safe FTS5 OR-query of quoted terms."""
+    terms = [t for t in re.findall(r"\w+", text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+@metrics.timed("ecc_rag_search_seconds", index="lexical")
+def _lexical_search(query, filters, n_results):
+    match = _fts_query(query)
+    if not match:
+        return []
+    sql = "SELECT chunk_id FROM chunks_fts WHERE chunks_fts MATCH ?"
+    params = [match]
+    if filters.get("senders"):
+        sql += f" AND sender IN ({','.join('?' * len(filters['senders']))})"
+        params += filters["senders"]
+    if filters.get("tags"):
+        sql += f" AND tag IN ({','.join('?' * len(filters['tags']))})"
+        params += filters["tags"]
+    if filters.get("since"):
+        sql += " AND received_ts >= ?"
+        params.append(filters["since"])
+    if filters.get("until"):
+        sql += " AND received_ts < ?"
+        params.append(filters["until"])
+    sql += " ORDER BY bm25(chunks_fts) LIMIT ?"
+    params.append(n_results)
+
+    conn = _lexical_conn()
+    try:
+        return [row[0] for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def _resolve_values(table, column, needle):
+    """Expands a fuzzy filter ('finance') to the exact stored values that contain it."""
+    conn = _lexical_conn()
+    try:
+        escaped = needle.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = conn.execute(f"SELECT {column} FROM {table} WHERE lower({column}) LIKE ? ESCAPE '\\'", (f"%{escaped}%",))
+        return [row[0] for row in rows]
+    finally:
+        conn.close()
+
+# =================================================
+# INDEXING
+# =================================================
+def index_emails_to_vector_db(emails, on_indexed=None, chunk_store=None):
+    """
+    Adds emails to the chunk index (Chroma + BM25) in batches of INDEX_CHUNK_SIZE emails.
+    Single-chunk emails carrying a precomputed 'embedding' (see embedding_store)
+    are stored as-is. Chunks of longer emails are looked up in chunk_store (an
+    EmbeddingStore) and only the ones it doesn't have are encoded,
+    EMBED_BATCH_SIZE at a time, and saved back to it.
+    on_indexed(ids) is called after every committed batch so callers can
+    record progress and resume an interrupted run.
+    """
     embedder, collection = get_components()
-    
+    total = 0
+
+    for start in range(0, len(emails), INDEX_CHUNK_SIZE):
+        batch = emails[start:start + INDEX_CHUNK_SIZE]
+        chunked = [(email, chunk_email(email)) for email in batch]
+        existing_ids = _existing_ids(collection, [f"{e.get('id')}#{n}" for e, chunks in chunked for n in range(len(chunks))])
+        ids, documents, metadatas, vectors = [], [], [], []
+
+        for email, chunks in chunked:
+            chunk_ids = [f"{email.get('id')}#{n}" for n in range(len(chunks))]
+            if all(cid in existing_ids for cid in chunk_ids): continue
+
+            reuse = email.get("embedding") if len(chunks) == 1 else None
+            for n, (cid, text) in enumerate(zip(chunk_ids, chunks)):
+                ids.append(cid)
+                documents.append(text)
+                metadatas.append(_chunk_metadata(email, n))
+                vectors.append(reuse)
+
+        if documents:
+            if chunk_store is not None:
+                stored = chunk_store.get_chunks({ids[i]: documents[i] for i, v in enumerate(vectors) if v is None})
+                vectors = [stored.get(cid) if v is None else v for cid, v in zip(ids, vectors)]
+            todo = [i for i, v in enumerate(vectors) if v is None]
+            if todo:
+                with metrics.timer("ecc_embed_seconds"):
+                    encoded = embedder.encode([documents[i] for i in todo], batch_size=EMBED_BATCH_SIZE)
+                metrics.inc("ecc_embedded_texts_total", len(todo))
+                for i, v in zip(todo, encoded):
+                    vectors[i] = v
+                if chunk_store is not None:
+                    chunk_store.put_chunks({ids[i]: (metadatas[i]["email_id"], documents[i], vectors[i]) for i in todo})
+            metrics.inc("ecc_embeddings_reused_total", len(vectors) - len(todo))
+            embeddings = [[float(x) for x in v] for v in vectors]
+            with metrics.timer("ecc_index_write_seconds", store="vector"):
+                collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            _lexical_upsert(list(zip(ids, documents, metadatas)))
+            total += len({m["email_id"] for m in metadatas})
+            metrics.inc("ecc_indexed_chunks_total", len(ids))
+
+        if on_indexed:
+            on_indexed([e.get("id") for e in batch])
+
+    return total
+
+# =================================================
+# RETRIEVAL
+# =================================================
+# Date phrases are matched first and swallow a leading "from", so "from last
+# week" is a date range rather than a sender called "last"
+_DATE_WORDS = r"(?:today|yesterday|last|past|this)\b"
+_DATE_LEAD = r"(?:\bfrom\s+(?:the\s+)?)?"
+_FROM_FILTER = re.compile(rf"\bfrom\s+(?:the\s+|my\s+|our\s+)?(?!{_DATE_WORDS})([\w.@-]+)", re.IGNORECASE)
+_LAST_N_DAYS = re.compile(rf"{_DATE_LEAD}\b(?:last|past)\s+(\d+)\s+days?\b", re.IGNORECASE)
+_RELATIVE_DATES = [
+    (re.compile(rf"{_DATE_LEAD}\btoday\b", re.IGNORECASE), 0),
+    (re.compile(rf"{_DATE_LEAD}\byesterday\b", re.IGNORECASE), 1),
+    (re.compile(rf"{_DATE_LEAD}\b(?:last|past|this)\s+week\b", re.IGNORECASE), 7),
+    (re.compile(rf"{_DATE_LEAD}\b(?:last|past|this)\s+month\b", re.IGNORECASE), 30),
+]
+
+def parse_query_filters(user_query, now=None):
+    """
+    Pulls simple filters out of a natural question:
+    'what did I get from finance last week?' -> sender 'finance', since 7 days ago.
+    Returns (remaining_query, filters).
+    """
+    now = now or datetime.now(timezone.utc)
+    filters, query = {}, user_query
+
+    match = _LAST_N_DAYS.search(query)
+    if match:
+        filters["since"] = (now - timedelta(days=int(match.group(1)))).timestamp()
+        query = query.replace(match.group(0), " ")
+    else:
+        for pattern, days in _RELATIVE_DATES:
+            match = pattern.search(query)
+            if not match: continue
+            day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            filters["since"] = (day_start - timedelta(days=days)).timestamp()
+            if days == 1:
+                filters["until"] = day_start.timestamp()
+            query = query.replace(match.group(0), " ")
+            break
+
+    match = _FROM_FILTER.search(query)
+    if match:
+        filters["sender"] = match.group(1)
+        query = query.replace(match.group(0), " ")
+
+    query = " ".join(query.split())
+    return (query or user_query), filters
+
+def _resolve_filters(sender=None, tag=None, since=None, until=None):
+    """Maps user-facing filters to exact metadata values. Unknown senders/tags are dropped."""
+    resolved = {}
+    if sender:
+        resolved["senders"] = _resolve_values("indexed_senders", "sender", sender)
+    if tag:
+        resolved["tags"] = _resolve_values("indexed_tags", "tag", tag)
+    if since:
+        resolved["since"] = float(since)
+    if until:
+        resolved["until"] = float(until)
+    return {k: v for k, v in resolved.items() if v}
+
+def _chroma_where(filters):
+    clauses = []
+    if filters.get("senders"): clauses.append({"sender": {"$in": filters["senders"]}})
+    if filters.get("tags"): clauses.append({"tag": {"$in": filters["tags"]}})
+    if filters.get("since"): clauses.append({"received_ts": {"$gte": filters["since"]}})
+    if filters.get("until"): clauses.append({"received_ts": {"$lt": filters["until"]}})
+    if not clauses: return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+@metrics.timed("ecc_rag_search_seconds", index="vector")
+def _vector_search(query_vector, filters, n_results):
+    _, collection = get_components()
+    try:
+        results = collection.query(query_embeddings=[query_vector], n_results=n_results, where=_chroma_where(filters), include=[])
+        return results["ids"][0] if results["ids"] else []
+    except Exception:
+        return []
+
+def _fuse(rankings, k=RRF_K):
+    """Reciprocal Rank Fusion: robust to the very different score scales of BM25 and cosine."""
+    scores = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking):
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def _pack_context(chunk_ids, top_k=TOP_K):
+    """
+    Groups the ranked chunks by parent email: at most MAX_CHUNKS_PER_EMAIL per
+    email, TOP_K emails, and CONTEXT_CHAR_BUDGET characters in total.
+    Returns (context_text, email_ids).
+    """
+    if not chunk_ids:
+        return "", []
+    _, collection = get_components()
+    got = collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+    by_id = {cid: (doc, meta) for cid, doc, meta in zip(got["ids"], got["documents"], got["metadatas"])}
+
+    emails, order = {}, []
+    for cid in chunk_ids:
+        if cid not in by_id: continue
+        doc, meta = by_id[cid]
+        eid = meta.get("email_id")
+        if eid not in emails:
+            if len(order) >= top_k: continue
+            emails[eid] = {"meta": meta, "bodies": []}
+            order.append(eid)
+        if len(emails[eid]["bodies"]) < MAX_CHUNKS_PER_EMAIL:
+            emails[eid]["bodies"].append(doc.split("\nBody: ", 1)[-1])
+
+    blocks, used = [], 0
+    for eid in order:
+        meta, bodies = emails[eid]["meta"], emails[eid]["bodies"]
+        block = f"Subject: {meta.get('subject')}\nFrom: {meta.get('sender')}\nDate: {meta.get('received_at')}\nBody: " + "\n[...]\n".join(bodies)
+        if blocks and used + len(block) > CONTEXT_CHAR_BUDGET: break
+        blocks.append(block[:CONTEXT_CHAR_BUDGET])
+        used += len(block)
+    return "\n---\n".join(blocks), order[:len(blocks)]
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _embed_query_cached(query):
+    return tuple(float(x) for x in embed_texts([query])[0])
+
+def embed_query(query):
+    """Query embeddings are LRU-cached: repeated questions skip the encoder."""
+    hits = _embed_query_cached.cache_info().hits
+    vector = _embed_query_cached(" ".join(query.lower().split()))
+    hit = _embed_query_cached.cache_info().hits > hits
+    metrics.inc("ecc_query_embedding_cache_hits_total" if hit else "ecc_query_embedding_cache_misses_total")
+    return list(vector)
+
+def _prepare_query(user_query, sender=None, tag=None, since=None, until=None):
+    """Returns (query without filter phrases, resolved filters, requested filters)."""
+    query, parsed = parse_query_filters(user_query)
+    requested = {
+        "sender": sender or parsed.get("sender"),
+        "tag": tag,
+        "since": since or parsed.get("since"),
+        "until": until or parsed.get("until"),
+    }
+    return query, _resolve_filters(**requested), requested
+
+def _retrieve(query, query_vector, filters, top_k=TOP_K):
+    n_candidates = top_k * CANDIDATE_MULTIPLIER
+    vector_hits = _vector_search(query_vector, filters, n_candidates)
+    lexical_hits = _lexical_search(query, filters, n_candidates)
+    return _pack_context(_fuse([vector_hits, lexical_hits]), top_k=top_k)
+
+def retrieve_context(user_query, sender=None, tag=None, since=None, until=None, top_k=TOP_K):
+    """
+    Hybrid retrieval: vector and BM25 candidates (same metadata filters) fused
+    with RRF, then packed per email. Filters not given explicitly are parsed
+    from the question. Returns (context_text, email_ids).
+    """
+    query, filters, _ = _prepare_query(user_query, sender, tag, since, until)
+    return _retrieve(query, embed_query(query), filters, top_k=top_k)
+
+# =================================================
+# SEMANTIC ANSWER CACHE
+# =================================================
+class SemanticAnswerCache:
+    """
+    Reuses a Claude answer only when the new question (as asked, filter
+    phrases included) embeds within ANSWER_CACHE_SIMILARITY of a cached one,
+    asks for the same sender / tag / dates, AND retrieval produced exactly the
+    same emails and context. Everything is dropped when the index generation
+    moves (new mail was indexed).
+    """
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, min_similarity=ANSWER_CACHE_SIMILARITY):
+        self.max_size = max_size
+        self.min_similarity = min_similarity
+        self._entries = OrderedDict()  # (email_ids, context_hash, scope) -> [(unit_vector, answer, latency)]
+        self._generation = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "seconds_saved": 0.0, "answer_seconds": 0.0}
+
+    @staticmethod
+    def _key(email_ids, context, filters):
+        # "from legal" and "from finance" can retrieve the same emails but must not share answers;
+        # dates count to the hour, so "last 3 days" asked twice in a row still hits
+        scope = (
+            str(filters.get("sender") or "").lower(),
+            str(filters.get("tag") or "").lower(),
+            *(int(float(filters[k]) // 3600) if filters.get(k) else None for k in ("since", "until")),
+        )
+        return (tuple(sorted(email_ids)), hashlib.sha1(context.encode()).hexdigest(), scope)
+
+    @staticmethod
+    def _unit(vector):
+        v = np.asarray(vector, dtype=np.float32)
+        return v / (np.linalg.norm(v) or 1.0)
+
+    def sync_generation(self, generation):
+        with self._lock:
+            if generation != self._generation:
+                if self._entries:
+                    self.stats["invalidations"] += 1
+                    metrics.inc("ecc_chat_cache_invalidations_total")
+                self._entries.clear()
+                self._generation = generation
+
+    def lookup(self, query_vector, email_ids, context, filters):
+        """filters: the requested sender / tag / since / until."""
+        key = self._key(email_ids, context, filters)
+        q = self._unit(query_vector)
+        with self._lock:
+            for vector, answer, latency in self._entries.get(key, ()):
+                if float(vector @ q) >= self.min_similarity:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["seconds_saved"] += latency
+                    metrics.inc("ecc_chat_cache_seconds_saved_total", latency)
+                    return answer
+            self.stats["misses"] += 1
+        return None
+
+    def store(self, query_vector, email_ids, context, filters, answer, latency):
+        key = self._key(email_ids, context, filters)
+        with self._lock:
+            self._entries.setdefault(key, []).append((self._unit(query_vector), answer, latency))
+            self._entries.move_to_end(key)
+            self.stats["answer_seconds"] += latency
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+_answer_cache = SemanticAnswerCache()
+
+def get_chat_cache_stats():
+    """
+    Hit rates and latency saved by the query-embedding and answer caches in
+    this process. The same numbers are exported as counters (see
+    metrics.cache_rows) for the Performance tab and the metrics snapshot.
+    """
+    emb = _embed_query_cached.cache_info()
+    ans = dict(_answer_cache.stats)
+    lookups = ans["hits"] + ans["misses"]
+    calls = ans["misses"] or 1
+    return {
+        "embedding_hits": emb.hits,
+        "embedding_misses": emb.misses,
+        "embedding_hit_rate": emb.hits / ((emb.hits + emb.misses) or 1),
+        "answer_hits": ans["hits"],
+        "answer_misses": ans["misses"],
+        "answer_hit_rate": ans["hits"] / (lookups or 1),
+        "answer_invalidations": ans["invalidations"],
+        "avg_answer_seconds": ans["answer_seconds"] / calls,
+        "seconds_saved": ans["seconds_saved"],
+    }
+
+@metrics.timed("ecc_chat_seconds")
+def chat_with_inbox(user_query, sender=None, tag=None, since=None, until=None):
     # 1. Retrieve relevant emails
-    query_vector = embedder.encode([user_query]).tolist()
-    results = collection.query(query_embeddings=query_vector, n_results=TOP_K)
-    
-    docs = results['documents'][0] if results['documents'] else []
-    if not docs: return "I haven't learned anything from your inbox yet. Hit Sync!"
-    
-    context = "\n---\n".join(docs)
+    query, filters, requested = _prepare_query(user_query, sender, tag, since, until)
+    query_vector = embed_query(query)
+    context, email_ids = _retrieve(query, query_vector, filters)
+    if not context: return "I haven't learned anything from your inbox yet. Hit Sync!"
+
+    # 2. Same question + same supporting emails since the last index update? Reuse the answer.
+    # Claude sees the question as asked, so that (not the filter-stripped query) is what gets compared.
+    question_vector = query_vector if query == user_query else embed_query(user_query)
+    _answer_cache.sync_generation(index_generation())
+    cached = _answer_cache.lookup(question_vector, email_ids, context, requested)
+    if cached is not None:
+        metrics.inc("ecc_llm_cache_hits_total", call="chat")
+        return cached
+    metrics.inc("ecc_llm_cache_misses_total", call="chat")
     
     # 2. Generate Answer using Claude
     api_key = os.environ.get("ANTHROPIC_API_KEY")
@@ -83,11 +592,15 @@ EMAILS (CONTEXT):
 ANSWER:
 """
     try:
-        message = client.messages.create(
+        started = time.perf_counter()
+        message = create_message(
+            client, "chat",
             model=GENERATION_MODEL,
             max_tokens=500,
             messages=[{"role": "user", "content": prompt}]
         )
-        return message.content[0].text
+        answer = message.content[0].text
+        _answer_cache.store(question_vector, email_ids, context, requested, answer, time.perf_counter() - started)
+        return answer
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
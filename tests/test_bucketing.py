@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from bucketing import (BUCKETS, CONFIDENTIAL_KEYWORDS, DEADLINE_KEYWORDS, EMERGENCY_KEYWORDS,
+                       compute_bucket, keyword_groups)
+
+
+def classify_dashboard_items(items, rules):
+    """The dashboard's per-render bucketing before buckets were stored (app.py), kept as the reference."""
+    buckets = {name: [] for name in BUCKETS}
+    for item in items:
+        sender = item.get('sender', '').strip()
+        subject = item.get('subject', '').lower()
+        tag = item.get('tag', '')
+        combined_text = f"{subject} {sender.lower()}"
+
+        trained_cat = rules.get(sender)
+        if trained_cat in ('confidential', 'urgent', 'deadlines'):
+            buckets[trained_cat].append(item); continue
+        elif trained_cat == 'normal':
+            if any(k in subject for k in EMERGENCY_KEYWORDS):
+                buckets['urgent'].append(item); continue
+            if any(k in subject for k in DEADLINE_KEYWORDS):
+                buckets['deadlines'].append(item); continue
+            buckets['normal'].append(item); continue
+
+        if 'Confidential' in tag or any(k in combined_text for k in CONFIDENTIAL_KEYWORDS):
+            buckets['confidential'].append(item); continue
+        if any(k in subject for k in DEADLINE_KEYWORDS):
+            buckets['deadlines'].append(item); continue
+        if 'Urgent' in tag:
+            buckets['urgent'].append(item); continue
+        buckets['normal'].append(item)
+    return buckets
+
+
+FILLER = ["re:", "q3", "board", "update", "please", "x", "coordination", "by", "card", "date", "e", ""]
+KEYWORDS = CONFIDENTIAL_KEYWORDS + DEADLINE_KEYWORDS + EMERGENCY_KEYWORDS
+
+
+def _random_items(n=3000, seed=7):
+    rng = random.Random(seed)
+    senders = ["CFO <cfo@acme.example>", " Bank Alerts <alerts@hdfc.example>", "card@issuer.example",
+               "ops@acme.example ", "Scheduler <cal@acme.example>"]
+    items = []
+    for i in range(n):
+        # Glue words with or without spaces, so keywords overlap and run across the subject/sender boundary
+        words = rng.choices(KEYWORDS + FILLER, k=rng.randint(0, 5))
+        subject = "".join(w + rng.choice(["", " "]) for w in words)
+        if rng.random() < 0.3:
+            subject = subject.upper()
+        items.append({"id": i, "sender": rng.choice(senders), "subject": subject,
+                      "tag": rng.choice(["", "Normal", "Urgent ❗", "Confidential 🕵️"])})
+    return items
+
+
+@pytest.mark.parametrize("rules", [{}, {"CFO <cfo@acme.example>": "normal", "ops@acme.example": "urgent",
+                                       "Scheduler <cal@acme.example>": "confidential"}])
+def test_compute_bucket_matches_the_old_classifier(rules):
+    items = _random_items()
+    expected = {item["id"]: name for name, bucket in classify_dashboard_items(items, rules).items() for item in bucket}
+    for item in items:
+        rule = rules.get(item["sender"].strip())
+        assert compute_bucket(item["sender"], item["subject"], item["tag"], rule) == expected[item["id"]], item
+
+
+@pytest.mark.parametrize("subject, sender, in_subject, anywhere", [
+    ("schedulemergency", "", {"deadlines", "emergency"}, {"deadlines", "emergency"}),
+    ("bankotp", "", {"confidential"}, {"confidential"}),
+    ("call me: urgent", "coordination@acme.example", {"emergency"}, {"emergency", "deadlines"}),
+    ("new credit", "card@issuer.example", set(), {"confidential"}),
+])
+def test_overlapping_and_boundary_keywords(subject, sender, in_subject, anywhere):
+    assert keyword_groups(subject, sender) == (in_subject, anywhere)
@@ -0,0 +1,144 @@
+import pytest
+
+# backend pulls in the full model stack (Claude SDK, transformers, sentence-transformers, Streamlit)
+for _module in ("anthropic", "dotenv", "torch", "transformers", "sentence_transformers", "streamlit"):
+    pytest.importorskip(_module)
+
+import backend
+
+
+def _record(n, **fields):
+    return {"id": f"m{n}", "sender": "Finance <finance@acme.example>", "subject": f"Budget review {n}",
+            "body": "Please approve the Q3 budget.", "tag": "Normal", "action": "Approve", "type": "Email",
+            "attachment": None, "received_at": f"2026-10-{n:02d}T09:00:00+00:00", "is_new": 1,
+            "message_id": f"<m{n}@acme.example>", "thread_id": None, **fields}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DB_FILE / HISTORY_CSV are relative paths
+    return backend.EmailService()
+
+
+def test_queue_and_index_commits_keep_the_token(db):
+    db.add_email_record(_record(1))
+    token = db.data_version()
+
+    db.jobs.enqueue([{"sender": "a@b.example", "subject": "hi", "body": "", "message_id": "<q@b.example>"}])
+    conn = db._get_conn()
+    conn.execute("UPDATE emails SET rag_indexed_at = '2026-10-19' WHERE id = 'm1'")
+    conn.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('probe', '1')")
+    conn.commit()
+    conn.close()
+    assert db.data_version() == token
+
+
+def test_token_scopes(db):
+    db.add_email_record(_record(1))
+    before = db.data_version()
+
+    db.mark_action_completed("m1")
+    after = db.data_version()
+    assert after["actions"] != before["actions"]
+    assert after["history"] == before["history"]
+
+    db.set_sender_rule("Finance <finance@acme.example>", "confidential")
+    assert db.data_version()["actions"] != after["actions"]
+
+    db.add_email_record(_record(2))
+    final = db.data_version()
+    assert final["history"] != before["history"]
+
+
+def test_sections_rebuild_only_on_their_scope(db):
+    db.add_email_record(_record(1))
+    history = db.get_snapshot_section("history")
+    action = db.get_snapshot_section("action")
+
+    db.mark_action_completed("m1")
+    assert db.get_snapshot_section("history")["history"] is history["history"]
+    assert db.get_snapshot_section("action")["revision"] == action["revision"] + 1
+
+    db.add_email_record(_record(2))
+    assert db.get_snapshot_section("action")["revision"] == action["revision"] + 2
+    assert db.get_snapshot_section("history")["revision"] == history["revision"] + 1
+
+    snapshot = db.get_dashboard_snapshot()
+    assert snapshot["kpis"]["total_emails"] == 2
+    assert set(snapshot["revisions"]) == set(backend.SNAPSHOT_SECTIONS)
+    assert len(snapshot["action_summary"]["Approvals"]) == 2
+
+
+def _sql(db, sql, params=()):
+    conn = db._get_conn()
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_kpi_counters_follow_every_kind_of_write(db):
+    def kpis():
+        assert db.check_kpi_counters(repair=False) == {}
+        return db.get_kpi_stats()
+
+    db.add_email_record(_record(1, thread_id="t1"))
+    db.add_email_record(_record(2, thread_id="t1", tag="Urgent ❗", action="Reply"))
+    db.add_email_record(_record(3, is_new=0))
+    stats = kpis()
+    assert (stats["total_emails"], stats["total_unread"], stats["urgent_count"]) == (3, 2, 1)
+    assert (stats["pending_approvals"], stats["pending_responses"], stats["active_threads"]) == (2, 1, 1)
+
+    db.mark_action_completed("m1")
+    assert kpis()["pending_approvals"] == 1
+    db.mark_action_uncompleted("m1")
+    assert kpis()["pending_approvals"] == 2
+
+    _sql(db, "UPDATE emails SET tag = 'Normal', action = 'Approve' WHERE id = 'm2'")
+    stats = kpis()
+    assert (stats["urgent_count"], stats["pending_approvals"], stats["pending_responses"]) == (0, 3, 0)
+
+    # A thread closes once its last unread email is read, and reopens with a new one
+    _sql(db, "UPDATE emails SET is_new = 0 WHERE id = 'm1'")
+    assert kpis()["active_threads"] == 1
+    _sql(db, "UPDATE emails SET is_new = 0 WHERE id = 'm2'")
+    assert kpis()["active_threads"] == 0
+    _sql(db, "UPDATE emails SET is_new = 1 WHERE id = 'm3'")
+    assert kpis()["active_threads"] == 1
+    _sql(db, "UPDATE emails SET thread_id = 't1' WHERE id = 'm3'")
+    assert kpis()["active_threads"] == 1
+
+    _sql(db, "DELETE FROM emails WHERE id = 'm3'")
+    stats = kpis()
+    assert (stats["total_emails"], stats["total_unread"], stats["active_threads"]) == (2, 0, 0)
+
+
+def test_check_kpi_counters_rebuilds_drifted_counters(db):
+    db.add_email_record(_record(1))
+    _sql(db, "UPDATE kpi_counters SET value = 40 WHERE name = 'total_unread'")
+    _sql(db, "DELETE FROM thread_activity")
+
+    assert db.check_kpi_counters(repair=False) == {"total_unread": (40, 1)}
+    assert db.check_kpi_counters() == {"total_unread": (40, 1)}
+    assert db.check_kpi_counters() == {}
+    _sql(db, "UPDATE emails SET is_new = 0 WHERE id = 'm1'")
+    assert db.get_kpi_stats()["active_threads"] == 0  # thread_activity was rebuilt too
+    assert db.check_kpi_counters(repair=False) == {}
+
+
+def test_sender_rule_rebuckets_only_that_sender(db):
+    db.add_email_record(_record(1))
+    db.add_email_record(_record(2, subject="Meeting notes"))
+    db.add_email_record(_record(3, sender="ceo@acme.example", subject="Lunch"))
+    db.add_email_record(_record(4, sender=" ceo@acme.example", subject="Board prep"))
+
+    def buckets():
+        conn = db._get_conn()
+        rows = dict(conn.execute("SELECT id, bucket FROM emails").fetchall())
+        conn.close()
+        return rows
+
+    assert buckets() == {"m1": "normal", "m2": "deadlines", "m3": "normal", "m4": "normal"}
+    assert db.set_sender_rule("ceo@acme.example", "urgent") == 2
+    assert buckets() == {"m1": "normal", "m2": "deadlines", "m3": "urgent", "m4": "urgent"}
+    assert db.set_sender_rule("ceo@acme.example", "urgent") == 0
+    assert db.get_sender_rules()["urgent"] == ["ceo@acme.example"]
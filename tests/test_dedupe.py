@@ -0,0 +1,34 @@
+from dedupe import NearDuplicateIndex, minhash
+
+BODY = "Please review the attached quarterly revenue forecast before the board meeting on Friday morning."
+
+
+def test_evict_before_drops_only_entries_outside_the_window():
+    index = NearDuplicateIndex()
+    index.add("old", minhash("Forecast", BODY), "2026-01-01T00:00:00+00:00")
+    assert index.find(minhash("Fwd: Forecast", BODY))[0] == "old"
+
+    assert index.evict_before("2026-02-01T00:00:00+00:00") == 1
+    assert len(index) == 0
+    assert index.find(minhash("Fwd: Forecast", BODY)) is None
+
+    index.add("new", minhash("Forecast", BODY), "2026-03-01T00:00:00+00:00")
+    assert index.evict_before("2026-02-01T00:00:00+00:00") == 0
+    assert index.find(minhash("Fwd: Forecast", BODY))[0] == "new"
+
+
+def test_short_reply_does_not_match_the_original_it_quotes():
+    original = minhash("Forecast", BODY + " The numbers include the new regional split and the updated hiring plan.")
+    quoted = "\n".join("> " + line for line in (BODY, "The numbers include the new regional split and the updated hiring plan."))
+    gmail = f"Looks good, thanks.\n\nOn Mon, Oct 19, 2026 at 9:00 AM Alice <alice@acme.example>\nwrote:\n{quoted}"
+    outlook = f"Looks good, thanks.\n\n-----Original Message-----\nFrom: Alice\n{BODY}"
+
+    index = NearDuplicateIndex()
+    index.add("original", original, "2026-10-19T09:00:00+00:00")
+    for body in (gmail, outlook, "Looks good, thanks.\n" + quoted):
+        reply = minhash("RE: Forecast", body)
+        assert reply is None or index.find(reply) is None
+
+    forward = minhash("Fwd: Forecast", "---------- Forwarded message ---------\n" + BODY
+                      + " The numbers include the new regional split and the updated hiring plan.")
+    assert index.find(forward)[0] == "original"
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+for _module in ("anthropic", "dotenv", "torch", "sentence_transformers"):
+    pytest.importorskip(_module)
+
+import rag_engine
+from embedding_store import EmbeddingStore
+from vector_store import MemmapVectorStore
+
+DIM = 8
+WORDS = "forecast revenue hiring regional board budget review plan".split()
+
+
+class _CountingEmbedder:
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=None):
+        self.encoded += len(texts)
+        return np.random.default_rng(len(texts)).normal(size=(len(texts), DIM)).astype(np.float32)
+
+
+def _long_email(n, extra=""):
+    body = " ".join(WORDS[i % len(WORDS)] for i in range(3 * rag_engine.CHUNK_CHARS // 6)) + extra
+    return {"id": f"long{n}", "sender": "cfo@acme.example", "subject": "Forecast", "body": body,
+            "tag": "Normal", "received_at": "2026-10-19T09:00:00+00:00"}
+
+
+def test_chunk_vectors_are_stored_and_reused_across_reindexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_engine, "VECTOR_DB_PATH", str(tmp_path / "vectors"))
+    monkeypatch.setattr(rag_engine, "LEXICAL_DB_PATH", str(tmp_path / "lexical.db"))
+    embedder = _CountingEmbedder()
+    collection = {"store": MemmapVectorStore(str(tmp_path / "a"))}
+    monkeypatch.setattr(rag_engine, "get_components", lambda: (embedder, collection["store"]))
+    store = EmbeddingStore(str(tmp_path / "emails.db"))
+
+    email = _long_email(1)
+    chunks = len(rag_engine.chunk_email(email))
+    assert chunks > 1
+    rag_engine.index_emails_to_vector_db([email], chunk_store=store)
+    assert embedder.encoded == chunks
+
+    collection["store"] = MemmapVectorStore(str(tmp_path / "b"))  # wiped index / layout change
+    rag_engine.index_emails_to_vector_db([email], chunk_store=store)
+    assert embedder.encoded == chunks
+
+    collection["store"] = MemmapVectorStore(str(tmp_path / "c"))
+    rag_engine.index_emails_to_vector_db([_long_email(1, extra=" addendum")], chunk_store=store)
+    assert embedder.encoded == chunks + 1  # only the edited last chunk is encoded again
+
+    texts = dict(zip((f"long1#{n}" for n in range(chunks)), rag_engine.chunk_email(email)))
+    assert len(store.get_chunks(texts)) == chunks - 1
+    store.delete(["long1"])
+    assert store.get_chunks(texts) == {}
@@ -0,0 +1,54 @@
+import pytest
+
+# backend pulls in the full model stack (Claude SDK, transformers, sentence-transformers, Streamlit)
+for _module in ("anthropic", "dotenv", "torch", "transformers", "sentence_transformers", "streamlit"):
+    pytest.importorskip(_module)
+
+import backend
+from ingest_queue import STATUS_FETCHED, STATUS_ANALYZED, STATUS_CLASSIFIED, STATUS_DEAD
+
+EMAIL = {"sender": "Legal Team <legal@acme.example>", "subject": "Contract to sign with Globex",
+         "body": "Please sign the attached contract by Friday.", "message_id": "<no-key@acme.example>",
+         "date": "2026-03-02T09:30:00+00:00"}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DB_FILE / HISTORY_CSV are relative paths
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.setattr(backend, "classify_urgency_and_action",
+                        lambda texts: [{"tag": "Normal", "action": "Review"} for _ in texts])
+    instance = backend.EmailService()
+    monkeypatch.setattr(instance, "_triage_batch", lambda jobs: [None] * len(jobs))
+    return instance
+
+
+def test_no_api_key_analysis_is_stored_not_stuck(db):
+    [job] = db.jobs.enqueue([EMAIL])
+    db._analyze_jobs(db.jobs.claim(STATUS_FETCHED))
+    assert db.jobs.status_of(job['id']) == STATUS_ANALYZED
+
+    assert db._classify_jobs(db.jobs.claim(STATUS_ANALYZED)) == 1
+    assert db.jobs.status_of(job['id']) == STATUS_CLASSIFIED
+    [row] = db._get_emails_by_ids([job['id']])
+    assert row['label_source'] == "zero-shot"
+    assert row['ai_tag'] is None  # the fallback is not a Claude label
+    assert row['received_at'] == EMAIL['date']
+
+
+@pytest.mark.parametrize("retryable, expected", [(True, STATUS_FETCHED), (False, STATUS_DEAD)])
+def test_only_transient_claude_errors_are_retried(db, monkeypatch, retryable, expected):
+    monkeypatch.setattr(backend, "analyze_email_with_ai",
+                        lambda *args: {"summary": "", "error": "boom", "retryable": retryable})
+    [job] = db.jobs.enqueue([EMAIL])
+    db._analyze_jobs(db.jobs.claim(STATUS_FETCHED))
+    assert db.jobs.status_of(job['id']) == expected
+
+
+def test_sync_reports_failures_instead_of_no_new_emails(db, monkeypatch):
+    monkeypatch.setattr(backend, "fetch_emails", lambda *args, **kwargs: [EMAIL])
+    monkeypatch.setattr(backend, "analyze_email_with_ai",
+                        lambda *args: {"summary": "", "error": "invalid x-api-key", "retryable": False})
+    result = db.sync_with_gmail("exec@acme.example", "secret")
+    assert "1 failed permanently" in result
+    assert "invalid x-api-key" in result
@@ -0,0 +1,34 @@
+import sqlite3
+
+from ingest_queue import IngestQueue
+
+EMAIL = {"sender": "ops@acme.example", "subject": "Outage report", "body": "All systems are back.",
+         "message_id": "<outage@acme.example>", "date": "2026-10-19T09:00:00+00:00"}
+
+
+class _RacingConn:
+    """Lets another enqueuer commit the same message between our check and our insert."""
+
+    def __init__(self, conn, other):
+        self._conn, self._other = conn, other
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().startswith("INSERT OR IGNORE INTO ingest_jobs"):
+            self._other.enqueue([EMAIL])
+        return self._conn.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_enqueue_returns_only_jobs_it_inserted(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "emails.db")
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE emails (id TEXT PRIMARY KEY, message_id TEXT)")
+    conn.close()
+    queue, other = IngestQueue(db_file), IngestQueue(db_file)
+    real_conn = queue._get_conn
+    monkeypatch.setattr(queue, "_get_conn", lambda: _RacingConn(real_conn(), other))
+
+    assert queue.enqueue([EMAIL]) == []
+    assert sum(queue.counts().values()) == 1
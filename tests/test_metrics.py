@@ -0,0 +1,18 @@
+import metrics
+
+
+def test_cache_rows_report_hit_rate_and_seconds_saved():
+    registry = metrics.MetricsRegistry()
+    registry.inc("ecc_llm_cache_hits_total", 3, metrics._label_key({"call": "chat"}))
+    registry.inc("ecc_llm_cache_misses_total", 1, metrics._label_key({"call": "chat"}))
+    registry.inc("ecc_llm_cache_hits_total", 5, metrics._label_key({"call": "analyze"}))  # another call, not counted
+    registry.inc("ecc_chat_cache_seconds_saved_total", 4.5)
+    registry.inc("ecc_query_embedding_cache_misses_total", 2)
+
+    rows = metrics.cache_rows(registry.snapshot())
+    assert rows == [
+        {"cache": "chat answers", "hits": 3, "misses": 1, "hit_rate": 0.75, "seconds_saved": 4.5},
+        {"cache": "query embeddings", "hits": 0, "misses": 2, "hit_rate": 0.0, "seconds_saved": None},
+    ]
+    assert metrics.cache_rows({"counters": {}}) == []
+    assert "ecc_chat_cache_seconds_saved_total 4.5" in metrics.prometheus_text(registry.snapshot())
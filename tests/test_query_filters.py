@@ -0,0 +1,24 @@
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+for _module in ("anthropic", "dotenv", "torch", "sentence_transformers"):
+    pytest.importorskip(_module)
+
+from rag_engine import parse_query_filters
+
+NOW = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+TODAY = NOW.replace(hour=0)
+
+
+@pytest.mark.parametrize("question, sender, since", [
+    ("emails from last week about budget", None, TODAY - timedelta(days=7)),
+    ("anything from yesterday", None, TODAY - timedelta(days=1)),
+    ("what came in from today", None, TODAY),
+    ("what did I get from finance last week?", "finance", TODAY - timedelta(days=7)),
+    ("invoices from hdfc", "hdfc", None),
+])
+def test_date_words_are_not_parsed_as_senders(question, sender, since):
+    _, filters = parse_query_filters(question, NOW)
+    assert filters.get("sender") == sender
+    assert filters.get("since") == (since.timestamp() if since else None)
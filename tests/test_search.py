@@ -0,0 +1,76 @@
+import pytest
+
+# backend pulls in the full model stack (Claude SDK, transformers, sentence-transformers, Streamlit)
+for _module in ("anthropic", "dotenv", "torch", "transformers", "sentence_transformers", "streamlit"):
+    pytest.importorskip(_module)
+
+from backend import EmailService
+
+
+def _record(email_id, subject, body, sender="Finance <finance@acme.example>"):
+    return {"id": email_id, "sender": sender, "subject": subject, "body": body, "tag": "Normal", "action": "Review",
+            "type": "Email", "attachment": None, "received_at": "2026-10-19T09:00:00+00:00", "is_new": 1,
+            "message_id": f"<{email_id}@acme.example>", "thread_id": None}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DB_FILE is a relative path
+    service = EmailService()
+    service.add_email_record(_record("budget", "Q3 budget approval", "The finance team needs sign-off before the board meeting."))
+    service.add_email_record(_record("offsite", "Team offsite", "Agenda for the meeting of the board and the budget review.",
+                                     sender="ops@acme.example"))
+    return service
+
+
+def _ids(results):
+    return [r["id"] for r in results]
+
+
+def _sql(db, sql, params=()):
+    conn = db._get_conn()
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize("text, prefix, expected", [
+    ("Q3 budget", True, '"Q3"* "budget"*'),
+    ('"board meeting" finan', True, '"board meeting" "finan"*'),
+    ("finan", False, '"finan"'),
+    ('NOT OR ( "unclosed', True, '"NOT"* "OR"* "unclosed"*'),
+    ("   ", True, ""),
+])
+def test_fts_query_quotes_every_term(text, prefix, expected):
+    assert EmailService._fts_query(text, prefix=prefix) == expected
+
+
+def test_prefix_and_phrase_queries(db):
+    assert _ids(db.search_emails("finan")) == ["budget"]
+    assert db.search_emails("finan", prefix=False) == []
+    assert _ids(db.search_emails('"board meeting"')) == ["budget"]
+    assert sorted(_ids(db.search_emails("board meeting"))) == ["budget", "offsite"]
+    assert db.search_emails('NOT OR (') == []
+
+
+def test_subject_hits_rank_first_with_highlights_and_snippets(db):
+    results = db.search_emails("budget")
+    assert _ids(results) == ["budget", "offsite"]
+    assert results[0]["subject_highlight"] == "Q3 \x02budget\x03 approval"
+    assert "\x02budget\x03" in results[1]["snippet"]
+
+
+def test_triggers_keep_the_index_in_sync(db):
+    _sql(db, "UPDATE emails SET subject = 'Q4 forecast approval' WHERE id = 'budget'")
+    assert _ids(db.search_emails("forecast")) == ["budget"]
+    assert _ids(db.search_emails("Q3")) == []
+
+    db.mark_action_completed("budget")  # flag updates leave the index alone
+    assert _ids(db.search_emails("forecast")) == ["budget"]
+
+    _sql(db, "DELETE FROM emails WHERE id = 'offsite'")
+    assert _ids(db.search_emails("offsite")) == []
+    assert _ids(db.search_emails("board")) == ["budget"]
+
+    db.rebuild_search_index()
+    assert _ids(db.search_emails("board")) == ["budget"]
@@ -0,0 +1,39 @@
+import pytest
+
+# backend pulls in the full model stack (Claude SDK, transformers, sentence-transformers, Streamlit)
+for _module in ("anthropic", "dotenv", "torch", "transformers", "sentence_transformers", "streamlit"):
+    pytest.importorskip(_module)
+
+import backend
+
+
+class _Model:
+    trained_seq = 0
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DB_FILE is a relative path
+    service = backend.EmailService()
+    service.add_email_record({"id": "m1", "sender": "ceo@acme.example", "subject": "Board deck", "body": "Need it today.",
+                              "tag": "Normal", "action": "Review", "type": "Email", "attachment": None,
+                              "received_at": "2026-10-19T09:00:00+00:00", "is_new": 1,
+                              "message_id": "<m1@acme.example>", "thread_id": None})
+    return service
+
+
+def test_train_click_only_writes_labels_and_the_daemon_retrains(db, monkeypatch):
+    retrains = []
+    model = _Model()
+    monkeypatch.setattr(backend, "retrain_in_background", lambda *args: retrains.append(args) or True)
+    monkeypatch.setattr(backend, "get_triage_model", lambda: model)
+
+    db.record_sender_feedback("ceo@acme.example", "urgent")
+    assert retrains == []  # nothing trains (or loads the embedder) in the dashboard process
+
+    assert db.update_triage_model() is True
+    assert len(retrains) == 1
+
+    model.trained_seq = 1  # the retrain above finished
+    assert db.update_triage_model() is False
+    assert len(retrains) == 1
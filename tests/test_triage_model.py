@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+import triage_model
+from triage_model import TAG_LABELS, ACTION_LABELS, TriageModelStore
+
+DIM = 32
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = TriageModelStore(str(tmp_path))
+    monkeypatch.setattr(triage_model, "_store", store)
+    monkeypatch.setattr(triage_model, "_model", None)
+    monkeypatch.setattr(triage_model, "_model_stamp", None)
+    return store
+
+
+def _clustered_labels(n=300, seed=0):
+    """n Claude labels in three well-separated clusters, one tag/action per cluster."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(3, DIM))
+    vectors, rows = [], []
+    for i in range(n):
+        k = i % 3
+        v = centers[k] + 0.3 * rng.normal(size=DIM)
+        vectors.append(v / np.linalg.norm(v))
+        rows.append({"seq": i + 1, "id": i, "tag": TAG_LABELS[k], "action": ACTION_LABELS[k], "weight": 1.0})
+    return np.asarray(vectors, dtype=np.float32), rows
+
+
+def _trainer(vectors, labels):
+    fetch_labels = lambda limit: sorted(labels, key=lambda r: r["seq"])[-limit:]
+    embed_rows = lambda rows: vectors[[r["id"] for r in rows]]
+    return fetch_labels, embed_rows
+
+
+def test_small_train_batch_does_not_forget_earlier_labels(store):
+    vectors, rows = _clustered_labels()
+    labels = list(rows)
+    assert triage_model.train_on_labels(*_trainer(vectors, labels)) == 1
+
+    # Three "Train" clicks relabel a few Normal emails as Confidential
+    relabeled = [2, 5, 8]
+    for offset, i in enumerate(relabeled):
+        labels.append({"seq": len(rows) + offset + 1, "id": i, "tag": TAG_LABELS[1], "action": None,
+                       "weight": triage_model.USER_LABEL_WEIGHT})
+    assert triage_model.train_on_labels(*_trainer(vectors, labels)) == 2
+
+    model = triage_model.get_triage_model()
+    kept = [i for i in range(len(rows)) if i not in relabeled]
+    predicted = model.predict(vectors[kept])
+    accuracy = np.mean([p["tag"] == rows[i]["tag"] for p, i in zip(predicted, kept)])
+    assert accuracy >= 0.95
+
+
+def test_no_new_labels_skips_training(store):
+    vectors, rows = _clustered_labels()
+    assert triage_model.train_on_labels(*_trainer(vectors, rows)) == 1
+    assert triage_model.train_on_labels(*_trainer(vectors, rows)) is None
+
+
+def test_processes_sharing_a_model_dir_never_reuse_a_version(store, tmp_path):
+    vectors, rows = _clustered_labels()
+    assert triage_model.train_on_labels(*_trainer(vectors, rows)) == 1
+    assert triage_model.get_triage_model().version == 1
+
+    # Another process (the ingest daemon) with its own, stale in-memory model saves next
+    other = TriageModelStore(str(tmp_path))
+    stale = triage_model.TriageModel.empty(DIM)
+    assert other.save(stale) == 2
+    assert store.save(triage_model.TriageModel.empty(DIM)) == 3
+
+    # ...and this process picks the newest version up without a restart
+    assert triage_model.get_triage_model().version == 3
+
+
+def test_model_serves_only_after_passing_the_held_out_check(store):
+    vectors, rows = _clustered_labels()
+    triage_model.train_on_labels(*_trainer(vectors, rows))
+    model = triage_model.get_triage_model()
+    assert model.validation["samples"] >= triage_model.MIN_VALIDATION_SAMPLES
+    assert model.is_ready
+    assert any(p is not None for p in triage_model.predict_triage(vectors[:30]))
+    assert store.load_latest().validation == model.validation
+
+
+def test_skewed_labels_never_skip_claude_for_urgent_mail(store):
+    # 95% Normal; the urgent mail looks just like it, so only Claude can tell them apart
+    rng = np.random.default_rng(1)
+    center = rng.normal(size=DIM)
+    vectors = center + 0.3 * rng.normal(size=(600, DIM))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    rows = [{"seq": i + 1, "id": i, "tag": TAG_LABELS[0] if i % 20 == 0 else TAG_LABELS[2],
+             "action": ACTION_LABELS[3], "weight": 1.0} for i in range(600)]
+
+    triage_model.train_on_labels(*_trainer(vectors, rows))
+    model = triage_model.get_triage_model()
+    assert model.validation["urgent_miss_rate"] > triage_model.MAX_URGENT_MISS_RATE
+    assert not model.is_ready
+    assert triage_model.predict_triage(vectors[::20]) == [None] * 30
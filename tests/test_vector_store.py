@@ -0,0 +1,45 @@
+import numpy as np
+
+import vector_store
+from vector_store import MemmapVectorStore
+
+DIM = 8
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def test_query_survives_a_compaction_between_search_and_lookup(tmp_path, monkeypatch):
+    store = MemmapVectorStore(str(tmp_path))
+    vectors = _vectors(20)
+    ids = [f"e{i}" for i in range(20)]
+    store.upsert(ids, vectors)
+    store.upsert(ids[:4], vectors[:4])  # tombstones rows 0-3; compacting shifts every row down
+
+    scores = MemmapVectorStore._scores
+    calls = []
+
+    def compact_once(*args):
+        if not calls:
+            MemmapVectorStore(str(tmp_path)).compact()  # e.g. the ingest daemon, mid-query
+        calls.append(1)
+        return scores(*args)
+
+    monkeypatch.setattr(vector_store.MemmapVectorStore, "_scores", staticmethod(compact_once))
+    result = store.query([vectors[10]], n_results=1)
+    assert result["ids"] == [["e10"]]
+    assert len(calls) == 2  # searched again after the row numbers changed
+
+
+def test_upsert_leaves_the_callers_array_alone_and_dedupes_ids(tmp_path):
+    store = MemmapVectorStore(str(tmp_path))
+    vectors = _vectors(3) * 5
+    original = vectors.copy()
+    store.upsert(["a", "b", "a"], vectors, documents=["a1", "b", "a2"])
+
+    assert np.array_equal(vectors, original)
+    assert store.count() == 2
+    assert store.get(ids=["a"])["documents"] == ["a2"]
+    _, count = store._maps()
+    assert count == 2  # no orphaned row for the first "a"
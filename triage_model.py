@@ -0,0 +1,398 @@
+import os
+import re
+import json
+import zlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+# =================================================
+# TRIAGE MODEL CONFIGURATION
+# =================================================
+# A small softmax head over sentence embeddings, distilled from the labels
+# Claude produces during sync plus the executive's "Train" clicks.
+TRIAGE_MODEL_DIR = os.environ.get("TRIAGE_MODEL_DIR", "./triage_models")
+CONFIDENCE_THRESHOLD = float(os.environ.get("TRIAGE_CONFIDENCE", 0.85))
+MIN_TRAINING_SAMPLES = int(os.environ.get("TRIAGE_MIN_SAMPLES", 50))
+KEEP_VERSIONS = 5
+# Each round refits on this many of the newest labels, old and new together
+MAX_TRAINING_LABELS = int(os.environ.get("TRIAGE_MAX_LABELS", 20000))
+
+# Held-out check: a model only answers without Claude once the labels it never
+# saw confirm that its confident answers are right, it isn't more confident than
+# it is accurate (calibration) and urgent mail isn't confidently filed as
+# something else. Underconfidence only sends more mail to Claude, so it passes.
+VALIDATION_FRACTION = 0.2
+MIN_VALIDATION_SAMPLES = int(os.environ.get("TRIAGE_MIN_VALIDATION", 20))
+MIN_VALIDATION_ACCURACY = float(os.environ.get("TRIAGE_MIN_ACCURACY", 0.95))
+MAX_OVERCONFIDENCE = float(os.environ.get("TRIAGE_MAX_OVERCONFIDENCE", 0.05))
+MAX_URGENT_MISS_RATE = float(os.environ.get("TRIAGE_MAX_URGENT_MISS", 0.05))
+CALIBRATION_BINS = 10
+
+LEARNING_RATE = 0.5
+L2_PENALTY = 1e-4
+EPOCHS = 30
+USER_LABEL_WEIGHT = 3.0
+
+# Same vocabulary Claude is prompted with in ai_engine
+TAG_LABELS = ["Urgent ❗", "Confidential 🕵️", "Normal"]
+ACTION_LABELS = ["Approve", "Reply", "Provide Info", "Review", "No Action"]
+
+# TrainingService categories -> tag head labels
+FEEDBACK_TAGS = {
+    "urgent": "Urgent ❗",
+    "confidential": "Confidential 🕵️",
+    "deadlines": "Normal",
+    "normal": "Normal",
+}
+
+
+def tag_index(tag):
+    """Maps a free-form tag ('Urgent', 'Urgent ❗', ...) to a TAG_LABELS index, or -1."""
+    text = str(tag or "").lower()
+    if not text:
+        return -1
+    if "urgent" in text or "critical" in text:
+        return 0
+    if "confidential" in text:
+        return 1
+    return 2
+
+
+def action_index(action):
+    """Maps a free-form action to an ACTION_LABELS index, or -1 if unknown."""
+    text = str(action or "").lower()
+    if not text:
+        return -1
+    for i, label in enumerate(ACTION_LABELS):
+        if label.lower() in text:
+            return i
+    return -1
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class TriageModel:
+    """Two linear softmax heads (tag + action) sharing the same embedding input."""
+
+    def __init__(self, w_tag, b_tag, w_action, b_action, version=0, trained_seq=0, n_samples=0, validation=None):
+        self.w_tag = w_tag
+        self.b_tag = b_tag
+        self.w_action = w_action
+        self.b_action = b_action
+        self.version = version
+        self.trained_seq = trained_seq
+        self.n_samples = n_samples
+        self.validation = validation  # held-out metrics from validate(), None if never checked
+
+    @classmethod
+    def empty(cls, dim):
+        return cls(
+            np.zeros((dim, len(TAG_LABELS)), dtype=np.float32),
+            np.zeros(len(TAG_LABELS), dtype=np.float32),
+            np.zeros((dim, len(ACTION_LABELS)), dtype=np.float32),
+            np.zeros(len(ACTION_LABELS), dtype=np.float32),
+        )
+
+    @property
+    def dim(self):
+        return self.w_tag.shape[0]
+
+    @property
+    def is_ready(self):
+        return self.n_samples >= MIN_TRAINING_SAMPLES and passes_validation(self.validation)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return _softmax(X @ self.w_tag + self.b_tag), _softmax(X @ self.w_action + self.b_action)
+
+    def predict(self, X):
+        """
+        Returns one dict per row: tag, action and a confidence in [0, 1].
+        Confidence is the weaker of the two heads, so both must agree to be 'sure'.
+        """
+        p_tag, p_action = self.predict_proba(X)
+        tag_i, action_i = p_tag.argmax(axis=1), p_action.argmax(axis=1)
+        conf = np.minimum(p_tag.max(axis=1), p_action.max(axis=1))
+        return [
+            {
+                "tag": TAG_LABELS[t],
+                "action": ACTION_LABELS[a],
+                "confidence": float(c),
+                "version": self.version,
+            }
+            for t, a, c in zip(tag_i, action_i, conf)
+        ]
+
+    def partial_fit(self, X, tag_idx, action_idx, weights=None, epochs=EPOCHS, lr=LEARNING_RATE):
+        """
+        Continues training from the current weights on a new batch.
+        Rows with a -1 label only contribute to the other head (user feedback
+        carries a tag but no action). Returns a NEW model, leaving self untouched
+        so in-flight predictions never see half-updated weights.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        tag_idx = np.asarray(tag_idx)
+        action_idx = np.asarray(action_idx)
+        weights = np.ones(len(X), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+
+        w_tag, b_tag = self.w_tag.copy(), self.b_tag.copy()
+        w_action, b_action = self.w_action.copy(), self.b_action.copy()
+
+        for _ in range(epochs):
+            w_tag, b_tag = _sgd_step(X, tag_idx, weights, w_tag, b_tag, lr)
+            w_action, b_action = _sgd_step(X, action_idx, weights, w_action, b_action, lr)
+
+        return TriageModel(
+            w_tag, b_tag, w_action, b_action,
+            version=self.version,
+            trained_seq=self.trained_seq,
+            n_samples=self.n_samples + len(X),
+        )
+
+
+def _is_validation_row(row):
+    """Stable split by email id, so a relabelled email stays on the same side."""
+    return zlib.crc32(str(row.get("id")).encode()) % 100 < VALIDATION_FRACTION * 100
+
+
+def validate(model, X, tag_idx, action_idx):
+    """
+    Scores the fast path on held-out rows: accuracy of the answers at or above
+    CONFIDENCE_THRESHOLD, overconfidence (expected calibration error counting
+    only bins where confidence exceeds accuracy) and the share of urgent mail
+    answered confidently with another tag.
+    """
+    tag_idx, action_idx = np.asarray(tag_idx), np.asarray(action_idx)
+    p_tag, p_action = model.predict_proba(X)
+    conf = np.minimum(p_tag.max(axis=1), p_action.max(axis=1))
+    tag_pred, action_pred = p_tag.argmax(axis=1), p_action.argmax(axis=1)
+    correct = ((tag_idx < 0) | (tag_pred == tag_idx)) & ((action_idx < 0) | (action_pred == action_idx))
+    confident = conf >= CONFIDENCE_THRESHOLD
+
+    bins = np.minimum((conf * CALIBRATION_BINS).astype(int), CALIBRATION_BINS - 1)
+    overconfidence = sum(
+        max(conf[bins == b].mean() - correct[bins == b].mean(), 0.0) * np.mean(bins == b) for b in np.unique(bins)
+    )
+    urgent = tag_idx == 0
+    return {
+        "samples": int(len(X)),
+        "accuracy": float(correct[confident].mean()) if confident.any() else None,
+        "overconfidence": float(overconfidence),
+        "urgent_miss_rate": float(np.mean(confident[urgent] & (tag_pred[urgent] != 0))) if urgent.any() else 0.0,
+    }
+
+
+def passes_validation(validation):
+    return bool(validation) and (
+        validation["samples"] >= MIN_VALIDATION_SAMPLES
+        and validation["accuracy"] is not None and validation["accuracy"] >= MIN_VALIDATION_ACCURACY
+        and validation["overconfidence"] <= MAX_OVERCONFIDENCE
+        and validation["urgent_miss_rate"] <= MAX_URGENT_MISS_RATE
+    )
+
+
+def _sgd_step(X, labels, weights, W, b, lr):
+    mask = labels >= 0
+    if not mask.any():
+        return W, b
+    Xm, ym, wm = X[mask], labels[mask], weights[mask]
+    probs = _softmax(Xm @ W + b)
+    probs[np.arange(len(ym)), ym] -= 1.0
+    probs *= (wm / wm.sum())[:, None]
+    W = W - lr * (Xm.T @ probs + L2_PENALTY * W)
+    b = b - lr * probs.sum(axis=0)
+    return W.astype(np.float32), b.astype(np.float32)
+
+
+# =================================================
+# VERSIONED STORAGE
+# =================================================
+_VERSION_FILE = re.compile(r"^triage_v(\d+)\.npz$")
+
+
+@contextmanager
+def _exclusive_lock(path):
+    """Blocking OS-level lock on `path`, shared by every process using the same model dir."""
+    with open(path, "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield  # closing the file drops the lock
+
+
+class TriageModelStore:
+    """
+    Keeps every trained version as triage_vNNNN.npz and a LATEST pointer.
+    Writes go to a temp file first and are swapped in with os.replace, so a
+    crash mid-save never leaves a corrupt model behind. The dashboard and the
+    ingest daemon both train into the same directory, so version numbers come
+    from the files on disk under a lock, never from memory.
+    """
+
+    def __init__(self, model_dir=TRIAGE_MODEL_DIR):
+        self.model_dir = model_dir
+        self._pointer = os.path.join(model_dir, "LATEST")
+        self._lock_path = os.path.join(model_dir, ".lock")
+
+    def _path(self, version):
+        return os.path.join(self.model_dir, f"triage_v{version:04d}.npz")
+
+    def _versions_on_disk(self):
+        try:
+            names = os.listdir(self.model_dir)
+        except OSError:
+            return []
+        return sorted(int(m.group(1)) for m in map(_VERSION_FILE.match, names) if m)
+
+    def pointer_stamp(self):
+        """Changes whenever LATEST is rewritten (by any process); None if nothing is saved yet."""
+        try:
+            st = os.stat(self._pointer)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load_latest(self):
+        try:
+            with open(self._pointer, "r") as f:
+                meta = json.load(f)
+            with np.load(self._path(meta["version"])) as data:
+                return TriageModel(
+                    data["w_tag"], data["b_tag"], data["w_action"], data["b_action"],
+                    version=int(meta["version"]),
+                    trained_seq=int(meta.get("trained_seq", 0)),
+                    n_samples=int(meta.get("n_samples", 0)),
+                    validation=meta.get("validation"),
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, model):
+        """Writes `model` as the next version and points LATEST at it. Returns the version."""
+        os.makedirs(self.model_dir, exist_ok=True)
+        with _exclusive_lock(self._lock_path):
+            model.version = max(self._versions_on_disk(), default=0) + 1
+            path = self._path(model.version)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, w_tag=model.w_tag, b_tag=model.b_tag, w_action=model.w_action, b_action=model.b_action)
+            os.replace(tmp_path, path)
+
+            meta = {"version": model.version, "trained_seq": model.trained_seq, "n_samples": model.n_samples,
+                    "validation": model.validation}
+            with open(self._pointer + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self._pointer + ".tmp", self._pointer)
+
+            self._prune(model.version)
+        return model.version
+
+    def _prune(self, current_version):
+        for version in self._versions_on_disk():
+            if version <= current_version - KEEP_VERSIONS:
+                try:
+                    os.remove(self._path(version))
+                except OSError:
+                    pass
+
+
+# =================================================
+# SHARED INSTANCE + BACKGROUND RETRAINING
+# =================================================
+_store = TriageModelStore()
+_model = None
+_model_stamp = None  # LATEST's pointer_stamp() when _model was loaded
+_train_lock = threading.Lock()
+
+
+def get_triage_model():
+    """
+    Returns the latest trained model, or None if nothing is trained yet.
+    Reloads when LATEST changes, e.g. after the other process retrained.
+    """
+    global _model, _model_stamp
+    stamp = _store.pointer_stamp()
+    if stamp != _model_stamp:
+        _model = _store.load_latest() or _model
+        _model_stamp = stamp
+    return _model
+
+
+def predict_triage(embeddings):
+    """
+    Predicts tag/action for a batch of embeddings.
+    Returns a list aligned with the input; entries are None when the model is
+    not ready or not confident enough, meaning the caller should escalate.
+    """
+    model = get_triage_model()
+    if model is None or not model.is_ready or len(embeddings) == 0:
+        return [None] * len(embeddings)
+    if np.asarray(embeddings).shape[1] != model.dim:
+        return [None] * len(embeddings)
+    return [p if p["confidence"] >= CONFIDENCE_THRESHOLD else None for p in model.predict(embeddings)]
+
+
+def train_on_labels(fetch_labels, embed_rows):
+    """
+    One training round: refits from scratch on the newest MAX_TRAINING_LABELS
+    labels, so a handful of "Train" clicks refines the model instead of
+    overwriting everything it learned from earlier labels. A VALIDATION_FRACTION
+    of the emails is held out and scored (validate()); the model is saved either
+    way, but only serves predictions once that check passes.
+    fetch_labels(limit) -> the newest `limit` labels, dicts with seq, id, tag, action, weight.
+    embed_rows(rows) -> 2D array of embeddings aligned with rows.
+    Returns the new version number, or None if no label arrived since the last round.
+    """
+    global _model, _model_stamp
+    current = get_triage_model()
+    rows = fetch_labels(MAX_TRAINING_LABELS)
+    if not rows or (current is not None and max(r["seq"] for r in rows) <= current.trained_seq):
+        return None
+
+    X = np.asarray(embed_rows(rows), dtype=np.float32)
+    tags = np.array([tag_index(r.get("tag")) for r in rows])
+    actions = np.array([action_index(r.get("action")) for r in rows])
+    weights = np.array([float(r.get("weight") or 1.0) for r in rows])
+    held_out = np.array([_is_validation_row(r) for r in rows]) & ((tags >= 0) | (actions >= 0))
+    train = ~held_out
+
+    new_model = TriageModel.empty(X.shape[1]).partial_fit(X[train], tags[train], actions[train], weights[train])
+    new_model.trained_seq = max(r["seq"] for r in rows)
+    new_model.validation = validate(new_model, X[held_out], tags[held_out], actions[held_out])
+    version = _store.save(new_model)
+
+    # Serve it now; the next get_triage_model() re-reads LATEST in case another process saved after us
+    _model, _model_stamp = new_model, None
+    v = new_model.validation
+    verdict = "serving" if new_model.is_ready else "not serving, Claude keeps triaging"
+    accuracy = "n/a" if v["accuracy"] is None else f"{v['accuracy']:.0%}"
+    print(f"🧪 Triage model v{version} trained on {new_model.n_samples} labels; held-out {v['samples']}: "
+          f"accuracy {accuracy}, overconfidence {v['overconfidence']:.2f}, "
+          f"urgent missed {v['urgent_miss_rate']:.0%} ({verdict}).")
+    return version
+
+
+def retrain_in_background(fetch_labels, embed_rows):
+    """Starts a training round in a daemon thread unless one is already running."""
+    if not _train_lock.acquire(blocking=False):
+        return False
+
+    def _run():
+        try:
+            train_on_labels(fetch_labels, embed_rows)
+        except Exception as e:
+            print(f"⚠️ Triage retrain failed: {e}")
+        finally:
+            _train_lock.release()
+
+    threading.Thread(target=_run, daemon=True).start()
+    return True
@@ -0,0 +1,315 @@
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+
+# =================================================
+# MEMORY-MAPPED VECTOR STORE
+# =================================================
+# A drop-in for the small part of the Chroma collection API that rag_engine
+# uses (get / upsert / query / count). Built for a single-tenant inbox of up
+# to a few hundred thousand chunks:
+#   - vectors live in an append-only float16 file opened with np.memmap
+#   - filterable metadata (sender, tag, received_ts) lives in sidecar arrays
+#   - ids, documents and full metadata live in a small SQLite file
+# Opening is instant (nothing is read up front) and search is an exact,
+# block-wise NumPy dot product with argpartition for the top-k.
+SEARCH_BLOCK_ROWS = 8192
+SPARSE_FILTER_RATIO = 0.25  # below this selectivity, gather candidate rows instead of scanning all
+COMPACT_DEAD_RATIO = 0.3
+QUERY_ATTEMPTS = 3  # searches to retry when a compaction renumbers rows mid-query
+CATEGORY_COLUMNS = ("sender", "tag")
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS rows (id TEXT PRIMARY KEY, row INTEGER, document TEXT, metadata TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_rows_row ON rows(row)",
+    "CREATE TABLE IF NOT EXISTS vocab (col TEXT, value TEXT, code INTEGER, PRIMARY KEY (col, value))",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)",
+]
+
+
+class MemmapVectorStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mapped = None  # (generation, count) the current maps were opened for
+        self._arrays = {}
+        conn = self._conn()
+        for sql in SCHEMA:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    # --- storage helpers ---
+    def _conn(self):
+        return sqlite3.connect(os.path.join(self.path, "store.db"), check_same_thread=False)
+
+    def _file(self, name, generation):
+        return os.path.join(self.path, f"{name}.g{generation}.bin")
+
+    def _state(self, conn):
+        rows = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        return rows.get("generation", 0), rows.get("count", 0), rows.get("dim", 0), rows.get("dead", 0)
+
+    def _set_state(self, conn, **values):
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(values.items()))
+
+    def _columns(self, dim):
+        return {
+            "vectors": (np.float16, (dim,)),
+            "alive": (np.uint8, ()),
+            "received_ts": (np.float64, ()),
+            "sender": (np.int32, ()),
+            "tag": (np.int32, ()),
+        }
+
+    def _maps(self):
+        """(Re)opens the memmaps when another writer grew or compacted the store."""
+        conn = self._conn()
+        generation, count, dim, _ = self._state(conn)
+        conn.close()
+        if self._mapped != (generation, count):
+            self._arrays = {}
+            if count and dim:
+                for name, (dtype, shape) in self._columns(dim).items():
+                    self._arrays[name] = np.memmap(self._file(name, generation), dtype=dtype, mode="r", shape=(count, *shape))
+            self._mapped = (generation, count)
+        return self._arrays, count
+
+    def _append(self, generation, count, dim, columns):
+        """Appends rows to every column file, first trimming bytes from any crashed write."""
+        for name, (dtype, shape) in self._columns(dim).items():
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(shape or (1,)))
+            path = self._file(name, generation)
+            with open(path, "ab") as f:
+                f.truncate(count * row_bytes)
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+    def _codes(self, conn, col, values):
+        known = dict(conn.execute("SELECT value, code FROM vocab WHERE col = ?", (col,)).fetchall())
+        for value in values:
+            if value not in known:
+                known[value] = len(known)
+                conn.execute("INSERT INTO vocab (col, value, code) VALUES (?, ?, ?)", (col, value, known[value]))
+        return known
+
+    # --- Chroma-compatible API ---
+    def count(self):
+        conn = self._conn()
+        n = conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        conn.close()
+        return n
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        if not ids:
+            return
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        vectors = np.array(embeddings, dtype=np.float32)  # a copy: normalized in place below
+        # An id repeated within one call keeps only its last occurrence (like repeated upserts)
+        last = {i: n for n, i in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids, documents, metadatas = [ids[n] for n in keep], [documents[n] for n in keep], [metadatas[n] for n in keep]
+            vectors = vectors[keep]
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            conn = self._conn()
+            generation, count, dim, dead = self._state(conn)
+            dim = dim or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                conn.close()
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {dim}")
+
+            # Upserts are append-only: the new row is appended, then the old one tombstoned.
+            # In that order a concurrent query sees the id once or twice, never zero times.
+            placeholders = ",".join("?" * len(ids))
+            old_rows = [r[0] for r in conn.execute(f"SELECT row FROM rows WHERE id IN ({placeholders})", ids)]
+
+            columns = {
+                "vectors": vectors.astype(np.float16),
+                "alive": np.ones(len(ids), dtype=np.uint8),
+                "received_ts": np.array([float(m.get("received_ts") or 0.0) for m in metadatas]),
+            }
+            for col in CATEGORY_COLUMNS:
+                values = [str(m.get(col) or "") for m in metadatas]
+                codes = self._codes(conn, col, set(values))
+                columns[col] = np.array([codes[v] for v in values], dtype=np.int32)
+            self._append(generation, count, dim, columns)
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO rows (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [(i, count + n, doc, json.dumps(meta)) for n, (i, doc, meta) in enumerate(zip(ids, documents, metadatas))]
+            )
+            self._set_state(conn, generation=generation, count=count + len(ids), dim=dim, dead=dead + len(old_rows))
+            conn.commit()
+            conn.close()
+
+            if old_rows:
+                alive = np.memmap(self._file("alive", generation), dtype=np.uint8, mode="r+", shape=(count,))
+                alive[old_rows] = 0
+                alive.flush()
+                del alive
+
+        if (dead + len(old_rows)) > COMPACT_DEAD_RATIO * (count + len(ids)):
+            self.compact()
+
+    add = upsert
+
+    def get(self, ids=None, include=("documents", "metadatas"), **_):
+        conn = self._conn()
+        if ids is None:
+            rows = conn.execute("SELECT id, document, metadata FROM rows ORDER BY row").fetchall()
+        else:
+            rows = []
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows += conn.execute(f"SELECT id, document, metadata FROM rows WHERE id IN ({placeholders})", chunk).fetchall()
+        conn.close()
+        result = {"ids": [r[0] for r in rows]}
+        if "documents" in include: result["documents"] = [r[1] for r in rows]
+        if "metadatas" in include: result["metadatas"] = [json.loads(r[2]) for r in rows]
+        return result
+
+    def _mask(self, where, arrays, count):
+        """Evaluates the rag_engine subset of Chroma 'where' ($and, $in, $gte, $lt, equality)."""
+        if not where:
+            return np.ones(count, dtype=bool)
+        if "$and" in where:
+            mask = np.ones(count, dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._mask(clause, arrays, count)
+            return mask
+
+        (field, condition), = where.items()
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        (op, value), = condition.items()
+        if field not in arrays or field == "vectors":
+            raise ValueError(f"Unsupported filter field: {field}")
+        column = np.asarray(arrays[field])
+
+        if field in CATEGORY_COLUMNS:
+            conn = self._conn()
+            codes = dict(conn.execute("SELECT value, code FROM vocab WHERE col = ?", (field,)).fetchall())
+            conn.close()
+            values = value if op == "$in" else [value]
+            return np.isin(column, [codes[v] for v in values if v in codes])
+
+        ops = {"$eq": np.equal, "$gte": np.greater_equal, "$gt": np.greater, "$lte": np.less_equal, "$lt": np.less}
+        if op not in ops:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        return ops[op](column, value)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances"), **_):
+        # Search runs outside the lock, so a compact() (here or in another process)
+        # can renumber rows before they are looked up; then search again
+        for _ in range(QUERY_ATTEMPTS):
+            with self._lock:
+                arrays, count = self._maps()
+                generation = self._mapped[0]
+            if not count:
+                return {k: [[] for _ in query_embeddings] for k in ("ids", "documents", "metadatas", "distances")}
+
+            mask = self._mask(where, arrays, count) & (np.asarray(arrays["alive"]) == 1)
+            candidates = np.flatnonzero(mask)
+            ranked = []
+            for q in np.asarray(query_embeddings, dtype=np.float32):
+                q = q / max(float(np.linalg.norm(q)), 1e-12)
+                scores = self._scores(arrays["vectors"], q, candidates, count)
+                k = min(n_results, len(candidates))
+                top = np.argpartition(-scores, k - 1)[:k] if k else np.array([], dtype=int)
+                top = top[np.argsort(-scores[top])]
+                ranked.append((candidates[top].tolist(), scores[top]))
+
+            found = self._lookup_rows(generation, {r for rows, _ in ranked for r in rows})
+            if found is not None:
+                break
+        else:
+            raise RuntimeError("Vector store was compacted during every query attempt")
+
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for rows, scores in ranked:
+            # A row upserted again since the search has no id any more; skip it
+            hits = [(found[r], s) for r, s in zip(rows, scores) if r in found]
+            out["ids"].append([h[0] for h, _ in hits])
+            out["documents"].append([h[1] for h, _ in hits])
+            out["metadatas"].append([json.loads(h[2]) for h, _ in hits])
+            out["distances"].append([float(1.0 - s) for _, s in hits])
+        return {k: v for k, v in out.items() if k == "ids" or k in include}
+
+    def _lookup_rows(self, generation, rows):
+        """
+        {row: (id, document, metadata)} for the given row numbers, or None if
+        the store is no longer at `generation` (rows were renumbered).
+        """
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN")  # generation check and lookup see one snapshot
+            if self._state(conn)[0] != generation:
+                return None
+            rows, found = list(rows), {}
+            for start in range(0, len(rows), 500):
+                chunk = rows[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update((r[0], r[1:]) for r in conn.execute(
+                    f"SELECT row, id, document, metadata FROM rows WHERE row IN ({placeholders})", chunk))
+            return found
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _scores(vectors, q, candidates, count):
+        """Cosine scores for the candidate rows, converting float16 blocks as we go."""
+        scores = np.empty(len(candidates), dtype=np.float32)
+        if len(candidates) < SPARSE_FILTER_RATIO * count:
+            for start in range(0, len(candidates), SEARCH_BLOCK_ROWS):
+                block = candidates[start:start + SEARCH_BLOCK_ROWS]
+                scores[start:start + len(block)] = vectors[block].astype(np.float32) @ q
+            return scores
+
+        # Dense case: contiguous slices are much cheaper than fancy indexing
+        all_scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = vectors[start:start + SEARCH_BLOCK_ROWS]
+            all_scores[start:start + len(block)] = block.astype(np.float32) @ q
+        return all_scores[candidates]
+
+    def compact(self):
+        """Rewrites the live rows into a fresh generation of files and drops the old one."""
+        with self._lock:
+            conn = self._conn()
+            generation, count, dim, _ = self._state(conn)
+            if not count:
+                conn.close()
+                return
+            old = {name: np.memmap(self._file(name, generation), dtype=dtype, mode="r", shape=(count, *shape))
+                   for name, (dtype, shape) in self._columns(dim).items()}
+            # Live rows some id still points to (an upsert interrupted before its
+            # tombstone write leaves an alive row nothing references)
+            referenced = np.fromiter((r for (r,) in conn.execute("SELECT row FROM rows")), dtype=np.int64)
+            keep = np.intersect1d(np.flatnonzero(np.asarray(old["alive"]) == 1), referenced)
+
+            new_generation = generation + 1
+            self._append(new_generation, 0, dim, {name: np.asarray(arr[keep]) for name, arr in old.items()})
+            del old
+
+            remap = {int(old_row): new_row for new_row, old_row in enumerate(keep)}
+            conn.execute("CREATE TEMP TABLE remap (old INTEGER PRIMARY KEY, new INTEGER)")
+            conn.executemany("INSERT INTO remap VALUES (?, ?)", remap.items())
+            conn.execute("DELETE FROM rows WHERE row NOT IN (SELECT old FROM remap)")
+            conn.execute("UPDATE rows SET row = (SELECT new FROM remap WHERE remap.old = rows.row)")
+            self._set_state(conn, generation=new_generation, count=len(keep), dim=dim, dead=0)
+            conn.commit()
+            conn.close()
+
+            for name in self._columns(dim):
+                try:
+                    os.remove(self._file(name, generation))
+                except OSError:
+                    pass
+            self._mapped = None